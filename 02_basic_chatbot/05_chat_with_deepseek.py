@@ -1,9 +1,14 @@
+# Before the other imports, so --profile / CHATBOT_PROFILE also measures import time
+from profiling import get_profiler
+get_profiler()
+
 import os
-import json
-import requests
 from dotenv import load_dotenv
 import sys
 
+from providers import OpenAICompatibleProvider
+from repl import ChatREPL
+
 load_dotenv()
 
 # Configuration
@@ -33,33 +38,29 @@ def setup_environment():
     
     return api_key
 
-def get_chat_completion(messages, api_key, model=DEFAULT_MODEL, temperature=0.7):
-    """Get chat completion from OpenRouter API"""
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-    }
-    
-    try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(data)
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except requests.exceptions.RequestException as e:
-        print(f"Error making API request: {str(e)}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response: {e.response.text}")
-        return None
-        
+def get_chat_provider(api_key, model=DEEPSEEK_MODELS[DEFAULT_MODEL], temperature=0.7):
+    """Streaming chat provider for the OpenRouter API"""
+    return OpenAICompatibleProvider(
+        api_key=api_key,
+        model=model,
+        base_url="https://openrouter.ai/api/v1",
+        temperature=temperature,
+    )
+
+def choose_model(repl: ChatREPL, argument: str):
+    """'model' command: pick another DeepSeek model, the history is kept"""
+    print("\nAvailable models:")
+    for i, (key, value) in enumerate(DEEPSEEK_MODELS.items(), 1):
+        print(f"{i}. {key} ({value})")
+    model_choice = argument or input(f"\nSelect model [1-{len(DEEPSEEK_MODELS)}] (or press Enter to keep current): ").strip()
+    if model_choice:
+        try:
+            model_idx = int(model_choice) - 1
+            repl.provider.model = list(DEEPSEEK_MODELS.values())[model_idx]
+            print(f"\nSwitched to model: {repl.provider.model}")
+        except (ValueError, IndexError):
+            print("Invalid selection. Keeping current model.")
+
 def chat_with_deepseek():
     """Main chat loop function"""
     # Setup environment
@@ -82,63 +83,10 @@ def chat_with_deepseek():
         model_name = DEEPSEEK_MODELS[DEFAULT_MODEL]
     
     print(f"\nUsing model: {model_name}")
-    
-    # Initialize conversation history
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant."}
-    ]
-    
-    print("\n=== Welcome to the DeepSeek AI Chatbot (via OpenRouter)! ===")
-    print("Type 'exit' to quit, 'clear' to clear history, or 'model' to change models.\n")
-
-    while True:
-        try:
-            # Get user input
-            user_input = input("\nYou: ").strip()
-            
-            # Handle special commands
-            if user_input.lower() == "exit":
-                print("\nGoodbye! Thank you for chatting.")
-                break
-            elif user_input.lower() == "clear":
-                messages = [{"role": "system", "content": "You are a helpful AI assistant."}]
-                print("\nConversation history cleared.")
-                continue
-            elif user_input.lower() == "model":
-                print("\nAvailable models:")
-                for i, (key, value) in enumerate(DEEPSEEK_MODELS.items(), 1):
-                    print(f"{i}. {key} ({value})")
-                model_choice = input(f"\nSelect model [1-{len(DEEPSEEK_MODELS)}] (or press Enter to keep current): ").strip()
-                if model_choice:
-                    try:
-                        model_idx = int(model_choice) - 1
-                        model_name = list(DEEPSEEK_MODELS.values())[model_idx]
-                        print(f"\nSwitched to model: {model_name}")
-                    except (ValueError, IndexError):
-                        print("Invalid selection. Keeping current model.")
-                continue
-            elif not user_input:
-                continue
-
-            # Add user message to history
-            messages.append({"role": "user", "content": user_input})
-
-            # Get AI response
-            response = get_chat_completion(messages, api_key, model=model_name)
-            
-            if response is not None:
-                # Add AI response to history and print it
-                messages.append({"role": "assistant", "content": response})
-                print(f"\nAI: {response}")
-            else:
-                print("\nSorry, I encountered an error. Please try again.")
 
-        except KeyboardInterrupt:
-            print("\n\nExiting gracefully...")
-            break
-        except Exception as e:
-            print(f"\nError: {str(e)}")
-            print("Please try again.")
+    # deepseek-r1 reasons before answering, so its TTFT is much longer than deepseek-chat's
+    provider = get_chat_provider(api_key, model=model_name)
+    ChatREPL(provider, title="the DeepSeek AI Chatbot (via OpenRouter)", commands={"model": choose_model}).run()
 
 def main():
     """Main function to run the chat application"""
@@ -1,17 +1,29 @@
 import streamlit as st
+# Before the other imports, so CHATBOT_PROFILE also measures import time on the first run
+from profiling import get_profiler
+profiler = get_profiler()
+# A run triggered by a submitted message is profiled as one turn (until the rerun after the reply)
+if st.session_state.get("user_input") or st.session_state.get("pending_prompt"):
+    profiler.start_turn("chat turn")
+
 import os
+import copy
 import json
 import html
+import time
+import sqlite3
+import httpx
 import requests
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, AsyncIterator, Callable, List, Tuple, Union
 
-# LangChain imports
-from langchain_openai import ChatOpenAI
-from langchain_community.chat_models import ChatOllama
-from google.generativeai.types import GenerationConfig
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
-import google.generativeai as genai
+from compare import Comparison, ComparisonLog, finish_comparison, start_comparison, to_csv, to_jsonl
+from history_store import ConversationStore, open_store
+from providers import ChatProvider, GeminiProvider, OllamaProvider, OpenAICompatibleProvider, ProviderError
+from speculation import FollowUpSpeculator
+from router import DEFAULT_PROFILES, QUALITY_TIERS, ModelRouter, RouteDecision, estimate_tokens
+from streaming import BackgroundLoop, GenerationTask
+from tools import MCPToolbox, ToolRun, tool_stream
 
 # Load environment variables
 load_dotenv()
@@ -25,12 +37,26 @@ AVAILABLE_MODELS = {
     "DeepSeek": ["deepseek/deepseek-chat", "deepseek/deepseek-coder"]
 }
 
+# API key each provider needs (Ollama runs locally)
+PROVIDER_KEYS = {
+    "OpenAI": "OPENAI_API_KEY",
+    "Gemini": "GOOGLE_API_KEY",
+    "Ollama": None,
+    "Grok": "GROK_API_KEY",
+    "DeepSeek": "OPENROUTER_API_KEY",
+}
+
+# Routing decisions and outcomes, one JSON object per line
+ROUTER_LOG = os.getenv("CHAT_ROUTER_LOG", "chat_routing.jsonl")
+# Side-by-side comparison runs, one JSON object per line
+COMPARE_LOG = os.getenv("CHAT_COMPARE_LOG", "chat_comparisons.jsonl")
+# MCP servers whose tools the models may call, comma-separated (see 05_mcp_server_client)
+MCP_SERVERS = os.getenv("CHAT_MCP_SERVERS", "http://localhost:8050/sse")
+
 # Initialize session state
 def init_session_state():
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "gemini_chat" not in st.session_state:
-        st.session_state.gemini_chat = None
     if "selected_model" not in st.session_state:
         st.session_state.selected_model = "OpenAI"
     if "model_name" not in st.session_state:
@@ -42,6 +68,20 @@ def init_session_state():
             "GROK_API_KEY": os.getenv("GROK_API_KEY", ""),
             "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "")
         }
+    if "ollama_base_url" not in st.session_state:
+        st.session_state.ollama_base_url = "http://localhost:11434"
+    if "router" not in st.session_state:
+        # Measurements from earlier sessions warm up the router's estimates
+        st.session_state.router = ModelRouter(log_path=ROUTER_LOG)
+        st.session_state.router.load()
+    if "comparisons" not in st.session_state:
+        st.session_state.comparisons = []
+    if "conversation_id" not in st.session_state:
+        # Row in the conversation store, created with the first saved turn
+        st.session_state.conversation_id = None
+    if "speculator" not in st.session_state:
+        # Created with the background loop when precomputation is turned on
+        st.session_state.speculator = None
 
 init_session_state()
 
@@ -237,6 +277,19 @@ st.markdown("""
         color: #8b5cf6;
     }
     
+    /* Tool calls of a reply */
+    .message-speculative {
+        font-size: 0.75rem;
+        color: #64748b;
+    }
+    .message-tools {
+        font-family: monospace;
+        font-size: 0.8rem;
+        color: #64748b;
+        border-left: 2px solid #c7d2fe;
+        padding-left: 0.75rem;
+    }
+    
     /* Message content styling */
     .message-content {
         line-height: 1.6;
@@ -359,199 +412,201 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def get_openai_chat():
-    with st.sidebar.form("openai_key_form"):
-        st.session_state.api_keys["OPENAI_API_KEY"] = st.text_input(
-            "OpenAI API Key", 
-            type="password", 
-            value=st.session_state.api_keys["OPENAI_API_KEY"]
-        )
-        st.form_submit_button("Save")
-    
-    if not st.session_state.api_keys["OPENAI_API_KEY"]:
-        st.sidebar.error("Please provide your OpenAI API key!")
-        return None
-    
-    try:
-        return ChatOpenAI(
-            openai_api_key=st.session_state.api_keys["OPENAI_API_KEY"],
-            model_name=st.session_state.model_name
-        )
-    except Exception as e:
-        st.error(f"Error initializing OpenAI: {str(e)}")
-        return None
+# Sidebar form label of each provider's API key
+KEY_LABELS = {
+    "OPENAI_API_KEY": "OpenAI API Key",
+    "GOOGLE_API_KEY": "Google API Key",
+    "GROK_API_KEY": "Grok API Key",
+    "OPENROUTER_API_KEY": "OpenRouter API Key",
+}
 
-def initialize_gemini():
-    with st.sidebar.form("google_key_form"):
-        st.session_state.api_keys["GOOGLE_API_KEY"] = st.text_input(
-            "Google API Key", 
-            type="password", 
-            value=st.session_state.api_keys["GOOGLE_API_KEY"]
-        )
-        st.form_submit_button("Save")
-    
-    if not st.session_state.api_keys["GOOGLE_API_KEY"]:
-        st.sidebar.error("Please provide your Google API key!")
-        return None
-    
+@st.cache_data(ttl=30, show_spinner=False)
+def ollama_models(base_url: str) -> Optional[List[str]]:
+    """Models pulled on the Ollama server (cached briefly), or None if it cannot be reached"""
     try:
-        genai.configure(api_key=st.session_state.api_keys["GOOGLE_API_KEY"])
-        
-        # Get the selected model name
-        model_name = st.session_state.model_name
-        
-        # Create generation config with proper typing
-        generation_config = GenerationConfig(
-            temperature=0.7,
-            top_p=0.8,
-            top_k=40,
-            max_output_tokens=2048,
-        )
-        
-        # Initialize the model with the selected model name
-        model = genai.GenerativeModel(
-            model_name=model_name,
-            generation_config=generation_config
-        )
-        
-        # Initialize chat if not already done
-        if st.session_state.gemini_chat is None:
-            st.session_state.gemini_chat = model.start_chat(history=[])
-        
-        return model
-    except Exception as e:
-        st.error(f"Error initializing Gemini: {str(e)}")
+        response = requests.get(f"{base_url.rstrip('/')}/api/tags", timeout=2.0)
+        response.raise_for_status()
+        # A name without a tag is the :latest tag
+        return [name if ":" in name else f"{name}:latest"
+                for name in (model["name"] for model in response.json().get("models", []))]
+    except (requests.RequestException, ValueError):
         return None
 
-def get_ollama_chat():
-    with st.sidebar.form("ollama_url_form"):
-        ollama_base_url = st.text_input("Ollama Base URL", value="http://localhost:11434")
-        st.form_submit_button("Save")
-    
-    try:
-        from langchain_ollama import ChatOllama as NewChatOllama
-        chat_model = NewChatOllama(
-            base_url=ollama_base_url,
-            model=st.session_state.model_name
-        )
-        
-        # Test if model is available
-        try:
-            chat_model.invoke([HumanMessage(content="test")])
-            return chat_model
-        except Exception as e:
-            if "404" in str(e):
-                st.sidebar.error(f"Model {st.session_state.model_name} not found. Please run:\n```\nollama pull {st.session_state.model_name}\n```")
-            else:
-                st.sidebar.error(f"Error testing Ollama model: {str(e)}")
-            return None
-            
-    except Exception as e:
-        st.sidebar.error(f"Error initializing Ollama: {str(e)}")
-        return None
+def model_ready(provider_name: str) -> bool:
+    """Show the provider's settings form; True if the selected model can be used.
+
+    Only checks settings (no model call): the API key, or for Ollama whether the
+    server has the model, from its cached tag list.
+    """
+    key_name = PROVIDER_KEYS[provider_name]
+    if key_name is None:
+        with st.sidebar.form("ollama_url_form"):
+            ollama_base_url = st.text_input("Ollama Base URL", value=st.session_state.ollama_base_url)
+            st.form_submit_button("Save")
+        st.session_state.ollama_base_url = ollama_base_url
+        models = ollama_models(ollama_base_url)
+        if models is None:
+            st.sidebar.error(f"Cannot reach Ollama at {ollama_base_url}")
+            return False
+        model_name = st.session_state.model_name
+        if (model_name if ":" in model_name else f"{model_name}:latest") not in models:
+            st.sidebar.error(f"Model {st.session_state.model_name} not found. Please run:\n```\nollama pull {st.session_state.model_name}\n```")
+            return False
+        return True
 
-def get_grok_chat():
-    with st.sidebar.form("grok_key_form"):
-        st.session_state.api_keys["GROK_API_KEY"] = st.text_input(
-            "Grok API Key", 
-            type="password", 
-            value=st.session_state.api_keys["GROK_API_KEY"]
+    with st.sidebar.form(f"{key_name.lower()}_form"):
+        st.session_state.api_keys[key_name] = st.text_input(
+            KEY_LABELS[key_name],
+            type="password",
+            value=st.session_state.api_keys[key_name]
         )
         st.form_submit_button("Save")
-    
-    if not st.session_state.api_keys["GROK_API_KEY"]:
-        st.sidebar.error("Please provide your Grok API key!")
-        return None
-    
-    class GrokChat:
-        def __init__(self, api_key: str, model: str = "grok-1"):
-            self.api_key = api_key
-            self.model = model
-            self.base_url = "https://api.groq.com/openai/v1"
-            self.headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-        
-        def invoke(self, messages: List[Dict[str, str]]) -> str:
-            try:
-                response = requests.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "temperature": 0.7
-                    }
-                )
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
-            except Exception as e:
-                st.error(f"Error calling Grok API: {str(e)}")
+    if not st.session_state.api_keys[key_name]:
+        st.sidebar.error(f"Please provide your {KEY_LABELS[key_name]}!")
+        return False
+    return bool(st.session_state.model_name)
+
+def make_provider(provider_name: str, model: str, client: httpx.AsyncClient,
+                  temperature: float = 0.7, max_tokens: Optional[int] = None) -> ChatProvider:
+    """Streaming provider for a routed model, using the keys saved in the session"""
+    options = {"temperature": temperature, "max_tokens": max_tokens, "client": client}
+    keys = st.session_state.api_keys
+    if provider_name == "OpenAI":
+        return OpenAICompatibleProvider(keys["OPENAI_API_KEY"], model, **options)
+    if provider_name == "Grok":
+        return OpenAICompatibleProvider(keys["GROK_API_KEY"], model, base_url="https://api.groq.com/openai/v1", **options)
+    if provider_name == "DeepSeek":
+        return OpenAICompatibleProvider(keys["OPENROUTER_API_KEY"], model, base_url="https://openrouter.ai/api/v1", **options)
+    if provider_name == "Gemini":
+        return GeminiProvider(keys["GOOGLE_API_KEY"], model, generation_config={"topP": 0.8, "topK": 40}, **options)
+    if provider_name == "Ollama":
+        return OllamaProvider(model, host=st.session_state.ollama_base_url, **options)
+    raise ValueError(f"Unknown provider: {provider_name}")
+
+def configured_models() -> List[str]:
+    """Profile keys of the models whose provider has an API key (Ollama needs none)"""
+    return [profile.key for profile in DEFAULT_PROFILES
+            if PROVIDER_KEYS[profile.provider] is None or st.session_state.api_keys.get(PROVIDER_KEYS[profile.provider])]
+
+async def routed_stream(router: ModelRouter, history: List[Dict[str, str]], prompt: str,
+                        candidates: List[str], client: httpx.AsyncClient, temperature: float, max_tokens: int,
+                        route: Dict[str, RouteDecision], attempts: int = 2) -> AsyncIterator[str]:
+    """Stream the answer of the model the router picks (stored in ``route["decision"]``).
+
+    A model that fails before its first token is recorded and the next best one
+    is tried. A cancelled (stopped) call is not recorded as an outcome.
+    """
+    messages = history + [{"role": "user", "content": prompt}]
+    for attempt in range(attempts):
+        decision = route["decision"] = router.choose(prompt, history, candidates)
+        provider = make_provider(decision.profile.provider, decision.profile.model, client, temperature, max_tokens)
+        parts: List[str] = []
+        ttft = None
+        start = time.perf_counter()
+        try:
+            async for delta in provider.stream(messages):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(delta)
+                yield delta
+        except (ProviderError, httpx.HTTPError) as e:
+            router.record(decision, ttft, time.perf_counter() - start, 0, error=type(e).__name__)
+            candidates = [key for key in candidates if key != decision.profile.key]
+            if parts or attempt == attempts - 1 or not candidates:
                 raise
-    
+            continue
+        text = "".join(parts)
+        router.record(decision, ttft, time.perf_counter() - start,
+                      provider.usage.get("output_tokens") or estimate_tokens(text),
+                      provider.usage.get("input_tokens"))
+        return
+
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    """One event loop and HTTP connection pool for all sessions of this server"""
+    return BackgroundLoop()
+
+@st.cache_resource
+def get_conversation_store() -> Optional[ConversationStore]:
+    """The searchable history shared with the CLI bots (None if disabled)"""
+    return open_store()
+
+def save_turn(user_input: str, reply: str, model: str) -> None:
+    store = get_conversation_store()
+    if store is None:
+        return
     try:
-        return GrokChat(api_key=st.session_state.api_keys["GROK_API_KEY"], model=st.session_state.model_name)
-    except Exception as e:
-        st.error(f"Error initializing Grok: {str(e)}")
-        return None
+        if st.session_state.conversation_id is None:
+            st.session_state.conversation_id = store.start_conversation("app", "Chat with LLM")
+        store.add_turn(st.session_state.conversation_id, user_input, reply, model)
+    except sqlite3.Error as e:
+        st.sidebar.warning(f"Could not save the turn to the conversation history: {e}")
 
-def get_deepseek_chat():
-    with st.sidebar.form("openrouter_key_form"):
-        st.session_state.api_keys["OPENROUTER_API_KEY"] = st.text_input(
-            "OpenRouter API Key", 
-            type="password", 
-            value=st.session_state.api_keys["OPENROUTER_API_KEY"]
-        )
-        st.form_submit_button("Save")
-    
-    if not st.session_state.api_keys["OPENROUTER_API_KEY"]:
-        st.sidebar.error("Please provide your OpenRouter API key!")
-        return None
-    
-    class DeepSeekChat:
-        def __init__(self, api_key: str, model: str):
-            self.api_key = api_key
-            self.model = model
-            self.base_url = "https://openrouter.ai/api/v1"
-            self.headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+@st.cache_resource(show_spinner="Connecting to the MCP servers...")
+def get_toolbox(servers: Tuple[str, ...]) -> MCPToolbox:
+    """One persistent session per MCP server, opened on the background loop; tool schemas are cached"""
+    toolbox = MCPToolbox(list(servers))
+    get_background_loop().run(toolbox.connect())
+    return toolbox
+
+def format_message_content(content: str) -> str:
+    """Message text as HTML, with fenced code blocks as <pre>"""
+    # Convert markdown code blocks to HTML with proper formatting
+    if '```' in content:
+        # Split content by code blocks
+        parts = content.split('```')
+        formatted_parts = []
         
-        def invoke(self, messages: List[Dict[str, str]]) -> str:
-            try:
-                # Convert LangChain messages to OpenRouter format
-                openrouter_messages = []
-                for msg in messages:
-                    if isinstance(msg, HumanMessage):
-                        role = "user"
-                    elif isinstance(msg, AIMessage):
-                        role = "assistant"
-                    else:
-                        role = "system"
-                    openrouter_messages.append({"role": role, "content": msg.content})
+        for i, part in enumerate(parts):
+            # Every odd part is a code block
+            if i % 2 == 1:
+                # Get language if specified (first line)
+                lines = part.split('\n', 1)
+                language = lines[0].strip() if len(lines) > 1 and lines[0].strip() else ''
+                code = lines[1] if len(lines) > 1 else lines[0]
                 
-                response = requests.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": self.model,
-                        "messages": openrouter_messages,
-                        "temperature": 0.7
-                    }
-                )
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
-            except Exception as e:
-                st.error(f"Error calling OpenRouter API: {str(e)}")
-                raise
-    
-    try:
-        return DeepSeekChat(api_key=st.session_state.api_keys["OPENROUTER_API_KEY"], model=st.session_state.model_name)
-    except Exception as e:
-        st.error(f"Error initializing DeepSeek: {str(e)}")
-        return None
+                # Format as code block
+                formatted_parts.append(f'<pre><code class="language-{language}">{html.escape(code)}</code></pre>')
+            else:
+                # Format regular text with line breaks
+                formatted_parts.append(html.escape(part).replace('\n', '<br>'))
+        
+        return ''.join(formatted_parts)
+    # Simple text with line breaks
+    return html.escape(content).replace('\n', '<br>')
+
+def render_comparison(comparison: Comparison) -> None:
+    """Answers in parallel columns, then the metrics table"""
+    columns = st.columns(len(comparison.runs))
+    for column, run in zip(columns, comparison.runs):
+        content = run.text or (f"⚠️ {run.error}" if run.error else "…")
+        column.markdown(message_html({"role": "assistant", "content": content, "model": run.model,
+                                      "stopped": run.stopped}, run.model), unsafe_allow_html=True)
+    st.dataframe(comparison.table(), hide_index=True, use_container_width=True)
+
+def message_html(message: Dict[str, Any], default_label: str) -> str:
+    label = "👤 You" if message['role'] == 'user' else f"🤖 {message.get('model', default_label)}"
+    if message.get('stopped'):
+        label += " · stopped"
+    if message.get('speculative'):
+        label += ' <span class="message-speculative">· ⚡ precomputed</span>'
+    tools = ""
+    if message.get('tools'):
+        tools = '<div class="message-tools">' + "<br>".join(
+            f"🔧 {html.escape(run.format())}" for run in message['tools']) + "</div>"
+    return f"""
+        <div class="chat-message {'user-message' if message['role'] == 'user' else 'assistant-message'} animate__animated animate__fadeIn">
+            <div class="message-header">
+                {label}
+            </div>
+            {tools}
+            <div class="message-content">
+                {format_message_content(message['content'])}
+            </div>
+        </div>
+    """
+
+profiler.end_startup()
 
 # Title
 st.markdown('<h1 class="main-title">💬 Chat with LLM</h1>', unsafe_allow_html=True)
@@ -591,28 +646,90 @@ with st.sidebar:
     temperature = st.slider("Temperature", 0.0, 2.0, 0.7, 0.1)
     max_tokens = st.number_input("Max Tokens", 100, 4000, 1000, 100)
     
+    # Auto routing: the router picks provider and model per prompt
+    st.markdown("---")
+    auto_route = st.toggle("Auto-route each prompt", value=False,
+                           help="Pick the fastest model that meets the quality level, based on live latency, error and cost measurements")
+    route_candidates: List[str] = []
+    if auto_route:
+        router: ModelRouter = st.session_state.router
+        routable = configured_models()
+        route_candidates = st.multiselect("Candidate models", routable, default=routable)
+        router.min_tier = st.select_slider("Minimum quality", options=list(QUALITY_TIERS), value=router.min_tier,
+                                           format_func=QUALITY_TIERS.get,
+                                           help="Prompts with code or long prompts need one level more")
+        router.seconds_per_cent = st.slider("Seconds of latency worth one cent", 0.0, 10.0, router.seconds_per_cent, 0.5,
+                                            help="0 ignores cost, higher values prefer cheaper models")
+        with st.expander("Router estimates"):
+            st.json(router.snapshot())
+
+    # Comparison mode: the same prompt goes to several models at once
+    compare_mode = st.toggle("Compare models side by side", value=False, disabled=auto_route,
+                             help="Send each prompt to all selected models concurrently and compare speed and cost")
+    compare_models: List[str] = []
+    if compare_mode:
+        configured = configured_models()
+        compare_models = st.multiselect("Models to compare", configured, default=configured[:3], max_selections=4)
+        comparisons: List[Comparison] = st.session_state.comparisons
+        if comparisons:
+            st.caption(f"{len(comparisons)} comparison(s) this session, all runs are logged to {COMPARE_LOG}")
+            st.download_button("Export comparisons (JSONL)", to_jsonl(comparisons),
+                               file_name="comparisons.jsonl", mime="application/jsonl")
+            st.download_button("Export metrics (CSV)", to_csv(comparisons),
+                               file_name="comparisons.csv", mime="text/csv")
+
+    # MCP tools: the selected model can call the tools of these servers
+    use_tools = st.toggle("Use MCP tools", value=False, disabled=auto_route or compare_mode,
+                          help="Let the model call MCP server tools; independent calls run in parallel")
+    toolbox: Optional[MCPToolbox] = None
+    if use_tools:
+        mcp_servers = st.text_input("MCP servers", value=MCP_SERVERS, help="Comma-separated SSE URLs")
+        servers = tuple(url.strip() for url in mcp_servers.split(",") if url.strip())
+        try:
+            toolbox = get_toolbox(servers)
+            st.caption(f"{len(toolbox.tool_names)} tools from {len(servers) - len(toolbox.errors)} of {len(servers)} server(s)")
+            with st.expander("MCP sessions"):
+                st.json(toolbox.status())
+            if toolbox.errors and st.button("Reconnect MCP servers"):
+                get_toolbox.clear()
+                st.rerun()
+        except Exception as e:
+            st.error(f"MCP tools unavailable: {e}")
+
+    # Follow-up precomputation: likely next questions are answered in the background
+    speculate = st.toggle("Precompute likely follow-ups", value=False, disabled=auto_route or compare_mode or use_tools,
+                          help="After each answer, suggest likely follow-up questions and answer them in the background "
+                               "while you read; picking one shows its answer at once")
+    speculator: Optional[FollowUpSpeculator] = None
+    if speculate:
+        if st.session_state.speculator is None:
+            st.session_state.speculator = FollowUpSpeculator(get_background_loop())
+        speculator = st.session_state.speculator
+        speculator.budget = st.number_input("Precomputation budget (USD per session)", 0.0, 5.0, 0.02, 0.01,
+                                            format="%.2f", help="Speculative requests that could exceed it are skipped")
+        with st.expander("Precomputation stats"):
+            st.json(speculator.snapshot())
+    elif st.session_state.speculator is not None:
+        st.session_state.speculator.discard()
+
+    # Full-text search over past conversations of the app and the CLI bots
+    st.markdown("---")
+    conversation_store = get_conversation_store()
+    if conversation_store is not None:
+        search_query = st.text_input("Search past conversations", placeholder='words, prefix*, "a phrase"')
+        if search_query:
+            search_start = time.perf_counter()
+            hits = conversation_store.search(search_query, limit=20)
+            st.caption(f"{len(hits)} result(s) in {(time.perf_counter() - search_start) * 1000:.1f} ms")
+            for hit in hits:
+                st.markdown(f"<small>{html.escape(hit.format())}</small>", unsafe_allow_html=True)
+
     st.markdown("---")
     st.markdown("### API Keys")
     st.caption("Enter your API keys below. They'll be saved in your session.")
 
-# Get the appropriate chat model
-chat_model = None
-model_functions = {
-    "OpenAI": get_openai_chat,
-    "Gemini": initialize_gemini,
-    "Ollama": get_ollama_chat,
-    "Grok": get_grok_chat,
-    "DeepSeek": get_deepseek_chat
-}
-
-# Only try to initialize the model if we have the required API key
-if model_provider in model_functions:
-    try:
-        chat_model = model_functions[model_provider]()
-    except Exception as e:
-        st.sidebar.error(f"Error initializing {model_provider}: {str(e)}")
-        st.session_state.pop('_error', None)
-        st.session_state['_error'] = f"Failed to initialize {model_provider}. Please check your API key and try again."
+# The selected model is usable once its key (or Ollama model) is configured; requests go through make_provider
+model_configured = model_ready(model_provider)
 
 # Main chat container
 st.markdown('<div class="chat-container">', unsafe_allow_html=True)
@@ -620,44 +737,10 @@ st.markdown('<div class="chat-container">', unsafe_allow_html=True)
 # Display chat messages
 for message in st.session_state.messages:
     with st.container():
-        # Clean and format the message content
-        content = message['content']
-        
-        # Convert markdown code blocks to HTML with proper formatting
-        if '```' in content:
-            # Split content by code blocks
-            parts = content.split('```')
-            formatted_parts = []
-            
-            for i, part in enumerate(parts):
-                # Every odd part is a code block
-                if i % 2 == 1:
-                    # Get language if specified (first line)
-                    lines = part.split('\n', 1)
-                    language = lines[0].strip() if len(lines) > 1 and lines[0].strip() else ''
-                    code = lines[1] if len(lines) > 1 else lines[0]
-                    
-                    # Format as code block
-                    formatted_parts.append(f'<pre><code class="language-{language}">{html.escape(code)}</code></pre>')
-                else:
-                    # Format regular text with line breaks
-                    formatted_parts.append(html.escape(part).replace('\n', '<br>'))
-            
-            formatted_content = ''.join(formatted_parts)
+        if message.get("comparison"):
+            render_comparison(message["comparison"])
         else:
-            # Simple text with line breaks
-            formatted_content = html.escape(content).replace('\n', '<br>')
-        
-        st.markdown(f"""
-            <div class="chat-message {'user-message' if message['role'] == 'user' else 'assistant-message'} animate__animated animate__fadeIn">
-                <div class="message-header">
-                    {"👤 You" if message['role'] == 'user' else f"🤖 {model_provider}"}
-                </div>
-                <div class="message-content">
-                    {formatted_content}
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
+            st.markdown(message_html(message, model_provider), unsafe_allow_html=True)
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -692,80 +775,157 @@ st.markdown("""
     <div class="fixed-input">
 """, unsafe_allow_html=True)
 
+def render_follow_ups(speculator: FollowUpSpeculator) -> None:
+    """Suggested follow-up questions, ⚡ when their answer is ready; picking one sends it"""
+    if not speculator.speculations:
+        return
+    st.caption("Likely follow-ups")
+    for index, speculation in enumerate(speculator.speculations):
+        if st.button(("⚡ " if speculation.ready else "") + speculation.question, key=f"follow_up_{index}"):
+            st.session_state.pending_prompt = speculation.question
+            st.rerun()
+
+# Precomputed follow-ups, refreshed every second while they are being generated
+if speculator is not None:
+    st.fragment(render_follow_ups, run_every=1.0 if speculator.pending else None)(speculator)
+
 # Chat input with improved styling
-prompt = st.chat_input("Message...", key="user_input")
+prompt = st.chat_input("Message...", key="user_input") or st.session_state.pop("pending_prompt", None)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 # Handle user input and AI response
-if prompt:
-    if not chat_model:
-        st.error("⚠️ Please configure the model properly in the sidebar!")
+def stream_response(stream: AsyncIterator[str], label: Callable[[], str],
+                    tool_runs: Optional[List[ToolRun]] = None) -> bool:
+    """Render a streamed reply with a Stop button; a stopped or failed reply keeps its partial text.
+
+    Clicking Stop (or sending another message) makes Streamlit interrupt this
+    script run; the ``finally`` below then cancels the request on the background
+    loop, which closes the HTTP stream and releases its connection.
+    ``tool_runs`` is filled by ``tool_stream`` and shown with the reply.
+    Returns whether the reply was complete.
+    """
+    st.button("⏹ Stop", key="stop_generation", help="Stop generating; the partial answer is kept")
+    placeholder = st.empty()
+    task = GenerationTask(get_background_loop(), stream)
+    if speculator is not None:
+        speculator.foreground(True)
+    try:
+        for text in task.updates():
+            placeholder.markdown(message_html({"role": "assistant", "content": text or "…", "model": label(),
+                                               "tools": tool_runs}, model_provider), unsafe_allow_html=True)
+    finally:
+        if speculator is not None:
+            speculator.foreground(False)
+        stopped = not task.done
+        if stopped:
+            task.cancel()
+        if task.text or tool_runs:
+            message = {"role": "assistant", "content": task.text}
+            if auto_route:
+                message["model"] = label()
+            if tool_runs:
+                message["tools"] = list(tool_runs)
+            save_turn(prompt, task.text, label() if auto_route else f"{model_provider}/{st.session_state.model_name}")
+            if stopped:
+                message["stopped"] = True
+                message["release_ms"] = round((task.release_latency or 0.0) * 1000, 1)
+            st.session_state.messages.append(message)
+    if task.error is not None:
+        raise task.error
+    return not stopped
+
+def stream_comparison(prompt: str, history: List[Dict[str, str]], client: httpx.AsyncClient) -> None:
+    """Stream the answers of all compared models side by side; Stop cancels the unfinished ones.
+
+    The requests run concurrently on the background loop. As in
+    ``stream_response``, the ``finally`` block also runs when Streamlit
+    interrupts the run, so stopped answers keep their partial text.
+    """
+    providers = {key: make_provider(*key.split("/", 1), client, temperature, max_tokens) for key in compare_models}
+    messages = history + [{"role": "user", "content": prompt}]
+    st.button("⏹ Stop", key="stop_generation", help="Stop all models; the partial answers are kept")
+    placeholders = dict(zip(providers, (column.empty() for column in st.columns(len(providers)))))
+    tasks = start_comparison(get_background_loop(), providers, messages)
+    try:
+        while True:
+            done = all(task.done for task in tasks.values())
+            for key, task in tasks.items():
+                content = task.text or (f"⚠️ {task.error}" if task.error is not None else "…")
+                placeholders[key].markdown(message_html({"role": "assistant", "content": content, "model": key}, key),
+                                           unsafe_allow_html=True)
+            if done:
+                break
+            time.sleep(0.05)
+    finally:
+        for task in tasks.values():
+            if not task.done:
+                task.cancel()
+        comparison = finish_comparison(prompt, messages, providers, tasks,
+                                       {"temperature": temperature, "max_tokens": max_tokens,
+                                        "history_messages": len(history)})
+        st.session_state.comparisons.append(comparison)
+        ComparisonLog(COMPARE_LOG).append(comparison)
+        st.session_state.messages.append({"role": "assistant", "content": "", "comparison": comparison})
+
+if prompt and (auto_route and not route_candidates or compare_mode and not compare_models
+               or not auto_route and not compare_mode and not model_configured):
+    if auto_route:
+        st.error("⚠️ Please select at least one candidate model in the sidebar!")
+    elif compare_mode:
+        st.error("⚠️ Please select the models to compare in the sidebar!")
     else:
-        # Add user message to state if it's not already there
-        if not st.session_state.messages or st.session_state.messages[-1]["content"] != prompt:
-            st.session_state.messages.append({"role": "user", "content": prompt})
-            
-            # Process the message immediately instead of rerunning
-            with st.spinner("Generating response..."):
-                try:
-                    # Clear any previous errors
-                    st.session_state.pop('_error', None)
-                    
-                    if model_provider == "Gemini":
-                        if st.session_state.gemini_chat is None:
-                            model = genai.GenerativeModel(model_name=st.session_state.model_name)
-                            st.session_state.gemini_chat = model.start_chat(history=[])
-                        response = st.session_state.gemini_chat.send_message(prompt)
-                        response_text = response.text
-                    
-                    elif model_provider in ["OpenAI", "Ollama"]:
-                        if model_provider == "OpenAI":
-                            # Convert session messages to LangChain format
-                            messages = []
-                            for msg in st.session_state.messages:
-                                if msg["role"] == "user":
-                                    messages.append(HumanMessage(content=msg["content"]))
-                                elif msg["role"] == "assistant":
-                                    messages.append(AIMessage(content=msg["content"]))
-                            
-                            # Make sure the latest message is included
-                            if not messages or messages[-1].content != prompt:
-                                messages.append(HumanMessage(content=prompt))
-                            
-                            response = chat_model.invoke(messages)
-                            response_text = response.content
-                        else:  # Ollama
-                            messages = [HumanMessage(content=prompt)]
-                            response = chat_model.invoke(messages)
-                            response_text = response.content
-                    
-                    else:  # Grok or DeepSeek
-                        # Convert all messages to the format expected by these APIs
-                        messages = [
-                            {"role": "user" if msg["role"] == "user" else "assistant", "content": msg["content"]}
-                            for msg in st.session_state.messages
-                        ]
-                        
-                        # Ensure the latest message is included
-                        if not messages or messages[-1]["content"] != prompt:
-                            messages.append({"role": "user", "content": prompt})
-                            
-                        response_text = chat_model.invoke(messages)
-                    
-                    # Add assistant's response to state
-                    # Ensure response is a string and clean any unwanted HTML
-                    if not isinstance(response_text, str):
-                        response_text = str(response_text)
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
-                    
-                    # Rerun to update the UI
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.session_state._error = str(e)
-                    st.error(f"Error generating response: {str(e)}")
-                    st.rerun()
+        st.error("⚠️ Please configure the model properly in the sidebar!")
+elif prompt and (not st.session_state.messages or st.session_state.messages[-1]["content"] != prompt):
+    # Comparison exchanges are measurements, not part of the conversation sent to the models
+    history = []
+    for msg in st.session_state.messages:
+        if msg.get("comparison"):
+            history = history[:-1]  # drop the prompt that was compared
+        elif msg["content"]:  # not a reply stopped during its tool calls
+            history.append({"role": msg["role"], "content": msg["content"]})
+    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.markdown(message_html(st.session_state.messages[-1], model_provider), unsafe_allow_html=True)
+    client = get_background_loop().client
+    try:
+        # Clear any previous errors
+        st.session_state.pop('_error', None)
+        if compare_mode:
+            stream_comparison(prompt, history, client)
+        elif auto_route:
+            route: Dict[str, RouteDecision] = {}
+            stream = routed_stream(st.session_state.router, history, prompt, route_candidates, client,
+                                   temperature, max_tokens, route)
+            stream_response(stream, lambda: route["decision"].profile.key if route else "Auto")
+        else:
+            model_key = f"{model_provider}/{st.session_state.model_name}"
+            provider = make_provider(model_provider, st.session_state.model_name, client, temperature, max_tokens)
+            messages = history + [{"role": "user", "content": prompt}]
+            speculation = speculator.take(prompt) if speculator is not None else None
+            if speculation is not None:
+                st.session_state.messages.append({"role": "assistant", "content": speculation.answer, "speculative": True})
+                save_turn(prompt, speculation.answer, model_key)
+                complete = True
+            elif toolbox is not None:
+                tool_runs: List[ToolRun] = []
+                complete = stream_response(tool_stream(provider, toolbox, messages, tool_runs), lambda: model_provider,
+                                           tool_runs)
+            else:
+                complete = stream_response(provider.stream(messages), lambda: model_provider)
+            if speculator is not None and complete:
+                profile = next((profile for profile in DEFAULT_PROFILES if profile.key == model_key), None)
+                # Copies of a provider built here: make_provider reads the session, which the loop thread cannot
+                template = make_provider(model_provider, st.session_state.model_name, client, temperature, max_tokens)
+                speculator.speculate(lambda: copy.copy(template), profile,
+                                     messages + [{"role": "assistant", "content": st.session_state.messages[-1]["content"]}])
+        # Rerun to update the UI
+        profiler.end_turn()
+        st.rerun()
+    except Exception as e:
+        st.session_state._error = str(e)
+        st.error(f"Error generating response: {str(e)}")
+        profiler.end_turn()
+        st.rerun()
 
 # Show error message if any
 if '_error' in st.session_state:
@@ -775,4 +935,8 @@ if '_error' in st.session_state:
 # Add a clear chat button
 if st.sidebar.button("Clear Chat"):
     st.session_state.messages = []
-    st.session_state.gemini_chat = None
\ No newline at end of file
+    st.session_state.conversation_id = None
+    if st.session_state.speculator is not None:
+        st.session_state.speculator.discard()
+
+profiler.end_turn()
@@ -0,0 +1,114 @@
+"""Cancellation benchmark: how fast Stop releases an in-flight generation.
+
+Runs a local OpenAI-compatible server that streams a slow reply (one token
+every ``--token-ms``), then repeatedly starts a ``GenerationTask`` like the
+Streamlit app does, lets it receive ``--tokens-before-stop`` tokens and cancels
+it. For each cancellation it measures:
+
+- release: cancel request until the task has finished and its HTTP stream is
+  closed (``GenerationTask.release_latency``)
+- server abort: cancel request until the server saw the client go away and
+  stopped generating
+- that the pool has no active connection left afterwards and the partial
+  text was kept
+
+Usage:
+    python bench_cancel.py --runs 50 --token-ms 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from typing import List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from providers import OpenAICompatibleProvider
+from streaming import BackgroundLoop, GenerationTask
+
+PORT = 8077
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def slow_server(token_seconds: float, aborted: List[float]) -> Starlette:
+    async def completions(request: Request):
+        await request.json()
+
+        async def events():
+            try:
+                for i in range(100_000):
+                    await asyncio.sleep(token_seconds)
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': f'token{i} '}}]})}\n\n"
+                yield "data: [DONE]\n\n"
+            except asyncio.CancelledError:
+                # Starlette cancels the body iterator when the client disconnects
+                aborted.append(time.perf_counter())
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency from Stop to a released connection")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--token-ms", type=float, default=20.0, help="Server delay between tokens")
+    parser.add_argument("--tokens-before-stop", type=int, default=5)
+    args = parser.parse_args()
+
+    aborted: List[float] = []
+    server = uvicorn.Server(uvicorn.Config(slow_server(args.token_ms / 1000, aborted), port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    background = BackgroundLoop()
+    provider = OpenAICompatibleProvider("test-key", "slow-model", base_url=f"http://127.0.0.1:{PORT}/v1",
+                                        client=background.client)
+    messages = [{"role": "user", "content": "Write a very long story"}]
+    release, server_abort, leaked, kept = [], [], 0, 0
+    try:
+        for _ in range(args.runs):
+            task = GenerationTask(background, provider.stream(messages))
+            while len(task.parts) < args.tokens_before_stop and not task.done:
+                time.sleep(0.001)
+            received = len(task.parts)
+            aborted_before = len(aborted)
+            task.cancel()
+            release.append(task.release_latency * 1000)
+            kept += task.cancelled and len(task.parts) >= received > 0
+            leaked += background.active_connections()
+            deadline = time.perf_counter() + 2.0
+            while len(aborted) == aborted_before and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            if len(aborted) > aborted_before:
+                server_abort.append((aborted[-1] - task.cancel_requested_at) * 1000)
+    finally:
+        background.close()
+        server.should_exit = True
+
+    print(f"{args.runs} cancellations after {args.tokens_before_stop} tokens ({args.token_ms:.0f} ms per token)")
+    print(f"  release       p50={statistics.median(release):7.2f} ms  p95={percentile(release, 95):7.2f} ms  "
+          f"max={max(release):7.2f} ms")
+    if server_abort:
+        print(f"  server abort  p50={statistics.median(server_abort):7.2f} ms  p95={percentile(server_abort, 95):7.2f} ms  "
+              f"max={max(server_abort):7.2f} ms  ({len(server_abort)}/{args.runs} seen)")
+    print(f"  partial text kept: {kept}/{args.runs}, connections still active after cancel: {leaked}")
+    if leaked or kept < args.runs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Offline performance regression check on recorded provider traffic.
+
+``record`` calls each client path once against the live service and saves the
+exchange as ``cassettes/<target>.json`` (see ``cassettes.py``). Targets
+without an API key in the environment, or whose library is not installed,
+are skipped. ``run`` replays every target that has a cassette without
+touching the network:
+
+- client overhead: median wall time of ``--runs`` replays with zero delay.
+  This is the cost of request building, stream parsing, message conversion
+  and, for ``repl``, terminal rendering, with network time removed. ``app``
+  is the chat app's reply path: ``providers.py`` streaming on the shared
+  ``BackgroundLoop`` client, consumed through ``GenerationTask``.
+- with ``--speed S`` (e.g. 1 for real time), one more replay at that speed,
+  showing the simulated network time and the overhead on top of it
+
+``--save-baseline FILE`` stores the overheads. ``--baseline FILE`` compares
+against them and exits with status 1 when a target got slower than
+``--tolerance`` (relative) and ``--min-regression-ms`` (absolute).
+
+Usage:
+    python bench_replay.py record --targets openai ollama
+    python bench_replay.py run --runs 50 --save-baseline replay_baseline.json
+    python bench_replay.py run --runs 50 --baseline replay_baseline.json --speed 1
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from cassettes import Cassette
+from providers import GeminiProvider, OllamaProvider, OpenAICompatibleProvider, close_http_client
+from repl import ChatREPL
+from streaming import BackgroundLoop, GenerationTask
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CASSETTE_DIR = os.path.join(HERE, "cassettes")
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful AI assistant."},
+    {"role": "user", "content": "Explain in about a hundred words why the sky is blue."},
+]
+
+# Placeholder when replaying: keys are never stored in cassettes
+REPLAY_KEY = "replay"
+
+Target = Callable[[], Awaitable[str]]
+
+
+def _key(name: str) -> Optional[str]:
+    return os.getenv(name)
+
+
+def provider_target(factory: Callable[[], object]) -> Target:
+    async def run() -> str:
+        return await factory().complete(MESSAGES)
+    return run
+
+
+async def repl_target() -> str:
+    """The CLI turn end to end: streaming, stats and printing to the terminal"""
+    provider = OpenAICompatibleProvider(_key("OPENAI_API_KEY") or REPLAY_KEY, "gpt-4o-mini")
+    repl = ChatREPL(provider, title="bench", store=False)
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        await repl.send(MESSAGES[-1]["content"])
+        repl._print_stats(repl.turns[-1])
+    return output.getvalue()
+
+
+async def langchain_openai_target() -> str:
+    from langchain_openai import ChatOpenAI
+    from langchain.schema import HumanMessage, SystemMessage
+
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key=_key("OPENAI_API_KEY") or REPLAY_KEY, temperature=0.7)
+    messages = [SystemMessage(content=MESSAGES[0]["content"]), HumanMessage(content=MESSAGES[1]["content"])]
+    return "".join([chunk.content async for chunk in llm.astream(messages)])
+
+
+async def genai_target() -> str:
+    import google.generativeai as genai
+
+    # The REST transport goes through requests, which the cassette intercepts (gRPC would not be)
+    genai.configure(api_key=_key("GOOGLE_API_KEY") or REPLAY_KEY, transport="rest")
+    model = genai.GenerativeModel("gemini-2.0-flash-exp", system_instruction=MESSAGES[0]["content"])
+
+    def generate() -> str:
+        return "".join(chunk.text for chunk in model.generate_content(MESSAGES[1]["content"], stream=True))
+    return await asyncio.to_thread(generate)
+
+
+_background: Optional[BackgroundLoop] = None
+
+
+async def app_target() -> str:
+    """The app's reply path: a provider stream on the BackgroundLoop client, read by the script thread"""
+    global _background
+    if _background is None:
+        _background = BackgroundLoop()
+    provider = OpenAICompatibleProvider(_key("OPENAI_API_KEY") or REPLAY_KEY, "gpt-4o-mini",
+                                        client=_background.client)
+
+    def consume() -> str:
+        task = GenerationTask(_background, provider.stream(MESSAGES))
+        for _ in task.updates():
+            pass
+        if task.error is not None:
+            raise task.error
+        return task.text
+    return await asyncio.to_thread(consume)
+
+
+# name -> (environment variable with the API key, or None, target)
+TARGETS: Dict[str, tuple] = {
+    "openai": ("OPENAI_API_KEY", provider_target(
+        lambda: OpenAICompatibleProvider(_key("OPENAI_API_KEY") or REPLAY_KEY, "gpt-4o-mini"))),
+    "deepseek": ("OPENROUTER_API_KEY", provider_target(
+        lambda: OpenAICompatibleProvider(_key("OPENROUTER_API_KEY") or REPLAY_KEY, "deepseek/deepseek-chat",
+                                         base_url="https://openrouter.ai/api/v1"))),
+    "grok": ("GROK_API_KEY", provider_target(
+        lambda: OpenAICompatibleProvider(_key("GROK_API_KEY") or REPLAY_KEY, "grok-1",
+                                         base_url="https://api.groq.com/openai/v1"))),
+    "ollama": (None, provider_target(lambda: OllamaProvider("llama3.2"))),
+    "gemini": ("GOOGLE_API_KEY", provider_target(
+        lambda: GeminiProvider(_key("GOOGLE_API_KEY") or REPLAY_KEY, "gemini-2.0-flash-exp"))),
+    "repl": ("OPENAI_API_KEY", repl_target),
+    "langchain-openai": ("OPENAI_API_KEY", langchain_openai_target),
+    "genai-rest": ("GOOGLE_API_KEY", genai_target),
+    "app": ("OPENAI_API_KEY", app_target),
+}
+
+
+def cassette_path(name: str) -> str:
+    return os.path.join(CASSETTE_DIR, f"{name}.json")
+
+
+async def replay_once(name: str, speed: float) -> Dict[str, float]:
+    with Cassette(cassette_path(name), mode="replay", speed=speed) as cassette:
+        start = time.perf_counter()
+        await TARGETS[name][1]()
+        wall = time.perf_counter() - start
+    return {"wall_ms": wall * 1000, "network_ms": cassette.network_time * 1000}
+
+
+async def bench_target(name: str, runs: int, speed: Optional[float]) -> Dict[str, float]:
+    with open(cassette_path(name), encoding="utf-8") as f:
+        interactions = json.load(f)["interactions"]
+    chunks = sum(len(i["response"]["chunks"]) for i in interactions)
+    recorded = sum(i["response"]["chunks"][-1]["at"] if i["response"]["chunks"] else i["response"]["headers_at"]
+                   for i in interactions)
+    await replay_once(name, 0)  # warm up imports and caches
+    overheads = [(await replay_once(name, 0))["wall_ms"] for _ in range(runs)]
+    result = {
+        "requests": len(interactions),
+        "chunks": chunks,
+        "recorded_network_ms": round(recorded * 1000, 1),
+        "client_ms": round(statistics.median(overheads), 3),
+        "client_us_per_chunk": round(statistics.median(overheads) * 1000 / max(chunks, 1), 2),
+    }
+    if speed:
+        timed = await replay_once(name, speed)
+        result.update({
+            "speed": speed,
+            "replay_wall_ms": round(timed["wall_ms"], 1),
+            "replay_network_ms": round(timed["network_ms"], 1),
+            "replay_overhead_ms": round(timed["wall_ms"] - timed["network_ms"], 2),
+        })
+    await close_http_client()
+    return result
+
+
+async def record(names: List[str]) -> None:
+    load_dotenv()
+    os.makedirs(CASSETTE_DIR, exist_ok=True)
+    for name in names:
+        env, target = TARGETS[name]
+        if env and not _key(env):
+            print(f"{name:<20} skipped: {env} is not set")
+            continue
+        try:
+            with Cassette(cassette_path(name), mode="record") as cassette:
+                await target()
+            print(f"{name:<20} recorded {len(cassette.interactions)} request(s), "
+                  f"{cassette.network_time * 1000:.0f} ms network time")
+        except ImportError as e:
+            print(f"{name:<20} skipped: {e}")
+        except Exception as e:
+            print(f"{name:<20} failed: {e}")
+        finally:
+            await close_http_client()
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, min_regression_ms: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("client_ms")
+        if before is None:
+            continue
+        if result["client_ms"] > before * (1 + tolerance) and result["client_ms"] - before > min_regression_ms:
+            regressions.append(f"{name}: client overhead {before:.3f} ms -> {result['client_ms']:.3f} ms")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> int:
+    results = {}
+    for name in args.targets:
+        if not os.path.exists(cassette_path(name)):
+            print(f"{name:<20} no cassette, record it with: python bench_replay.py record --targets {name}")
+            continue
+        try:
+            results[name] = await bench_target(name, args.runs, args.speed)
+        except ImportError as e:
+            print(f"{name:<20} skipped: {e}")
+
+    if results:
+        print(f"\n{'target':<20} {'requests':>8} {'chunks':>7} {'network ms':>11} {'client ms':>10} {'us/chunk':>9}"
+              + (f" {'replay ms':>10} {'overhead ms':>12}" if args.speed else ""))
+        for name, result in results.items():
+            line = (f"{name:<20} {result['requests']:>8} {result['chunks']:>7} {result['recorded_network_ms']:>11.1f} "
+                    f"{result['client_ms']:>10.3f} {result['client_us_per_chunk']:>9.2f}")
+            if args.speed:
+                line += f" {result['replay_wall_ms']:>10.1f} {result['replay_overhead_ms']:>12.2f}"
+            print(line)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_regression_ms)
+        if regressions:
+            print("\nClient overhead regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo client overhead regressions against the baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record provider traffic, or replay it to measure client overhead")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record_parser = sub.add_parser("record", help="Record cassettes against the live services")
+    record_parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    run_parser = sub.add_parser("run", help="Replay cassettes offline and measure client overhead")
+    run_parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    run_parser.add_argument("--runs", type=int, default=30, help="Zero-delay replays per target")
+    run_parser.add_argument("--speed", type=float, help="Also replay once at this speed (1 = real time)")
+    run_parser.add_argument("--baseline", help="Compare against this baseline file")
+    run_parser.add_argument("--save-baseline", help="Write the results as a baseline file")
+    run_parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    run_parser.add_argument("--min-regression-ms", type=float, default=0.2, help="Ignore slowdowns below this")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(record(args.targets))
+    else:
+        sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
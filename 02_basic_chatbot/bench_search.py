@@ -0,0 +1,110 @@
+"""Conversation search benchmark: indexing cost per turn and query latency.
+
+Fills a fresh store (``history_store.py``) with ``--messages`` synthetic chat
+messages, drawn from a Zipf-like vocabulary so there are very common and very
+rare words like in real text. It then measures:
+
+- bulk load throughput, and the latency of saving one turn (two messages,
+  indexed in the same transaction) on the full store, as the bots do
+- query latency for rare, medium and common words, two-word, prefix and
+  phrase queries (top 10 by BM25, with snippets)
+
+Usage:
+    python bench_search.py --messages 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from history_store import ConversationStore
+
+WORDS_PER_MESSAGE = 40
+TURNS_PER_CONVERSATION = 10
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexing and full-text search of conversations")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per kind")
+    parser.add_argument("--db", help="Database file (default: a temporary file, removed afterwards)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    # Zipf-like weights: the k-th word is used about 1/k as often as the first
+    weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench_history.db")
+    store = ConversationStore(path)
+
+    print(f"Loading {args.messages:,} messages into {path} ...")
+    start = time.perf_counter()
+    batch = TURNS_PER_CONVERSATION * 2
+    for offset in range(0, args.messages, batch):
+        conversation = store.start_conversation("bench")
+        texts = [" ".join(rng.choices(vocabulary, cum_weights=weights, k=WORDS_PER_MESSAGE))
+                 for _ in range(min(batch, args.messages - offset))]
+        store.add_messages(conversation, [("user" if i % 2 == 0 else "assistant", text, "bench/model")
+                                          for i, text in enumerate(texts)])
+    load_seconds = time.perf_counter() - start
+    store.optimize()
+    print(f"Loaded in {load_seconds:.1f} s ({args.messages / load_seconds:,.0f} messages/s), "
+          f"database {os.path.getsize(path) / 1e6:.0f} MB")
+
+    # Incremental indexing: one turn at a time on the full store
+    conversation = store.start_conversation("bench")
+    turn_ms = []
+    for _ in range(200):
+        user, reply = (" ".join(rng.choices(vocabulary, cum_weights=weights, k=WORDS_PER_MESSAGE)) for _ in range(2))
+        start = time.perf_counter()
+        store.add_turn(conversation, user, reply, "bench/model")
+        turn_ms.append((time.perf_counter() - start) * 1000)
+    print(f"Saving one turn: p50 {statistics.median(turn_ms):.2f} ms, p95 {percentile(turn_ms, 95):.2f} ms")
+
+    kinds = {
+        "rare word": lambda: rng.choice(vocabulary[-args.vocabulary // 2:]),
+        "medium word": lambda: rng.choice(vocabulary[500:5000]),
+        "common word": lambda: rng.choice(vocabulary[:20]),
+        "two words": lambda: f"{rng.choice(vocabulary[:2000])} {rng.choice(vocabulary[:2000])}",
+        "prefix": lambda: rng.choice(vocabulary[:5000])[:3] + "*",
+        "phrase": lambda: f'"{rng.choice(vocabulary[:50])} {rng.choice(vocabulary[:50])}"',
+    }
+    print(f"\n{'query':<14} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'avg hits':>9}")
+    for kind, make_query in kinds.items():
+        latencies, hits = [], []
+        for _ in range(args.queries):
+            query = make_query()
+            start = time.perf_counter()
+            results = store.search(query, limit=10)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits.append(len(results))
+        print(f"{kind:<14} {statistics.median(latencies):>8.2f} {percentile(latencies, 95):>8.2f} "
+              f"{max(latencies):>8.2f} {statistics.mean(hits):>9.1f}")
+
+    store.close()
+    if not args.db:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
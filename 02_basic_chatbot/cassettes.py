@@ -0,0 +1,370 @@
+"""Record and replay provider HTTP traffic ("cassettes") for offline runs.
+
+``Cassette(path, mode)`` is a context manager that intercepts HTTP at the
+transport level, so every client in these scripts is covered without changes:
+
+- httpx, sync and async: ``providers.py``, which the app and the CLI bots use
+  for every model call (also through the app's shared ``BackgroundLoop``
+  client). Other httpx-based clients are covered too, such as the OpenAI SDK
+  behind LangChain's ``ChatOpenAI``.
+- requests: ``google.generativeai`` when configured with ``transport="rest"``
+  (its default gRPC transport cannot be intercepted), and other
+  requests-based clients
+
+In ``record`` mode real requests go out; each response is stored with the time
+until its headers arrived and the time offset of every body chunk, so a stream
+keeps its shape. In ``replay`` mode nothing goes out; responses are served from
+the file, with the recorded timing divided by ``speed``. ``speed=1`` replays in
+real time, ``speed=10`` ten times faster, and ``speed=0`` without any delay.
+``auto`` replays if the file exists and records otherwise.
+
+``network_time`` adds up the delays a replay simulated (or a recording
+measured). Wall time minus ``network_time`` is the client's own overhead:
+parsing, conversion and rendering. ``bench_replay.py`` tracks that overhead.
+
+Requests are matched on method, URL and JSON body (canonicalized); identical
+requests are replayed in recording order. Credentials (``Authorization``,
+``x-goog-api-key``, ``key=`` query parameters, ...) are never written.
+Streaming with requests is replayed with its total delay up front.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+try:
+    import requests
+    import requests.adapters
+    import urllib3
+except ImportError:
+    requests = None
+
+SECRET_HEADERS = {"authorization", "x-goog-api-key", "api-key", "x-api-key", "cookie", "set-cookie",
+                  "openai-organization", "openai-project"}
+SECRET_PARAMS = {"key", "api_key", "apikey", "access_token"}
+MODES = ("record", "replay", "auto")
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded response for a request"""
+
+
+def _clean_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _body_digest(body: bytes) -> str:
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def _clean_headers(headers: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in headers if k.lower() not in SECRET_HEADERS]
+
+
+def _encode_chunk(chunk: bytes) -> Dict[str, str]:
+    try:
+        return {"text": chunk.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(chunk).decode()}
+
+
+def _decode_chunk(chunk: Dict[str, str]) -> bytes:
+    return chunk["text"].encode("utf-8") if "text" in chunk else base64.b64decode(chunk["b64"])
+
+
+class _Recording:
+    """One response being recorded; chunk offsets are relative to the request start"""
+
+    def __init__(self, cassette: "Cassette", request: Dict[str, Any], started: float):
+        self.cassette = cassette
+        self.request = request
+        self.started = started
+        self.response: Dict[str, Any] = {}
+        self.chunks: List[Tuple[float, bytes]] = []
+        self._saved = False
+
+    def headers_received(self, status: int, headers: List[Tuple[str, str]]) -> None:
+        self.response = {"status": status, "headers": _clean_headers(headers),
+                         "headers_at": round(time.perf_counter() - self.started, 6)}
+
+    def chunk(self, data: bytes) -> None:
+        self.chunks.append((round(time.perf_counter() - self.started, 6), data))
+
+    def finish(self, complete: bool = True) -> None:
+        if self._saved:
+            return
+        self._saved = True
+        self.response["complete"] = complete
+        self.response["chunks"] = [{"at": at, **_encode_chunk(data)} for at, data in self.chunks]
+        self.cassette._add({"request": self.request, "response": self.response})
+        last = self.chunks[-1][0] if self.chunks else self.response["headers_at"]
+        self.cassette.network_time += last
+
+
+class _RecordingAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, recording: _Recording):
+        self._stream = stream
+        self._recording = recording
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._recording.chunk(chunk)
+            yield chunk
+        self._recording.finish()
+
+    async def aclose(self) -> None:
+        # Clients stop reading at the end marker (SSE "[DONE]") without exhausting
+        # the body, so a stream closed early is kept too, flagged as incomplete
+        self._recording.finish(complete=False)
+        await self._stream.aclose()
+
+
+class _RecordingSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, recording: _Recording):
+        self._stream = stream
+        self._recording = recording
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._recording.chunk(chunk)
+            yield chunk
+        self._recording.finish()
+
+    def close(self) -> None:
+        self._recording.finish(complete=False)
+        self._stream.close()
+
+
+def _schedule(cassette: "Cassette", chunks: List[Dict[str, Any]], start_at: float):
+    """Yield (seconds to sleep, chunk), aiming at each chunk's scheduled time
+
+    Sleeping until a deadline instead of for each gap keeps timer oversleep
+    from adding up over hundreds of chunks, which would show as client overhead.
+    """
+    started = time.perf_counter()
+    scheduled = 0.0
+    previous = start_at
+    for chunk in chunks:
+        scheduled += cassette._delay(chunk["at"] - previous)
+        previous = chunk["at"]
+        yield max(started + scheduled - time.perf_counter(), 0.0), chunk
+
+
+class _ReplayAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: "Cassette", chunks: List[Dict[str, Any]], start_at: float):
+        self._cassette = cassette
+        self._chunks = chunks
+        self._start_at = start_at
+
+    async def __aiter__(self):
+        for delay, chunk in _schedule(self._cassette, self._chunks, self._start_at):
+            await asyncio.sleep(delay)
+            yield _decode_chunk(chunk)
+
+
+class _ReplaySyncStream(httpx.SyncByteStream):
+    def __init__(self, cassette: "Cassette", chunks: List[Dict[str, Any]], start_at: float):
+        self._cassette = cassette
+        self._chunks = chunks
+        self._start_at = start_at
+
+    def __iter__(self):
+        for delay, chunk in _schedule(self._cassette, self._chunks, self._start_at):
+            time.sleep(delay)
+            yield _decode_chunk(chunk)
+
+
+_active: Optional["Cassette"] = None
+_originals: Dict[str, Any] = {}
+_patch_lock = threading.Lock()
+
+
+async def _patched_async(transport: httpx.AsyncHTTPTransport, request: httpx.Request) -> httpx.Response:
+    cassette = _active
+    if cassette is None:
+        return await _originals["httpx_async"](transport, request)
+    return await cassette._handle_httpx_async(transport, request)
+
+
+def _patched_sync(transport: httpx.HTTPTransport, request: httpx.Request) -> httpx.Response:
+    cassette = _active
+    if cassette is None:
+        return _originals["httpx_sync"](transport, request)
+    return cassette._handle_httpx_sync(transport, request)
+
+
+def _patched_requests(adapter, request, **kwargs):
+    cassette = _active
+    if cassette is None:
+        return _originals["requests"](adapter, request, **kwargs)
+    return cassette._handle_requests(adapter, request, **kwargs)
+
+
+def _install() -> None:
+    with _patch_lock:
+        if _originals:
+            return
+        _originals["httpx_async"] = httpx.AsyncHTTPTransport.handle_async_request
+        _originals["httpx_sync"] = httpx.HTTPTransport.handle_request
+        httpx.AsyncHTTPTransport.handle_async_request = _patched_async
+        httpx.HTTPTransport.handle_request = _patched_sync
+        if requests is not None:
+            _originals["requests"] = requests.adapters.HTTPAdapter.send
+            requests.adapters.HTTPAdapter.send = _patched_requests
+
+
+def _uninstall() -> None:
+    with _patch_lock:
+        if not _originals:
+            return
+        httpx.AsyncHTTPTransport.handle_async_request = _originals.pop("httpx_async")
+        httpx.HTTPTransport.handle_request = _originals.pop("httpx_sync")
+        if "requests" in _originals:
+            requests.adapters.HTTPAdapter.send = _originals.pop("requests")
+
+
+class Cassette:
+    """Record HTTP exchanges to ``path`` or replay them from it (one cassette active at a time)"""
+
+    def __init__(self, path: str, mode: str = "auto", speed: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if mode == "auto":
+            mode = "replay" if os.path.exists(path) else "record"
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.network_time = 0.0  # seconds of network time recorded, or simulated during replay
+        self.replayed = 0
+        self.interactions: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}  # request key -> next recording to replay
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f)["interactions"]
+
+    def __enter__(self) -> "Cassette":
+        global _active
+        if _active is not None:
+            raise RuntimeError("Another cassette is already active")
+        _install()
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _active
+        _active = None
+        _uninstall()
+        if self.mode == "record":
+            self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+
+    # Matching and timing
+
+    @staticmethod
+    def _request_record(method: str, url: str, body: bytes) -> Dict[str, Any]:
+        return {"method": method.upper(), "url": _clean_url(url), "body_sha": _body_digest(body)}
+
+    @staticmethod
+    def _key(request: Dict[str, Any]) -> str:
+        return f"{request['method']} {request['url']} {request['body_sha']}"
+
+    def _add(self, interaction: Dict[str, Any]) -> None:
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def _next(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(request)
+        with self._lock:
+            matches = [i for i in self.interactions if self._key(i["request"]) == key]
+            position = self._positions.get(key, 0)
+            if position >= len(matches):
+                raise CassetteMiss(f"No recorded response for {request['method']} {request['url']} "
+                                   f"(body {request['body_sha']}, {position} replayed) in {self.path}")
+            self._positions[key] = position + 1
+            self.replayed += 1
+        return matches[position]["response"]
+
+    def _delay(self, seconds: float) -> float:
+        seconds = max(seconds, 0.0)
+        if not self.speed:
+            return 0.0
+        delay = seconds / self.speed
+        self.network_time += delay
+        return delay
+
+    # httpx
+
+    async def _handle_httpx_async(self, transport, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        record = self._request_record(request.method, str(request.url), body)
+        if self.mode == "replay":
+            response = self._next(record)
+            await asyncio.sleep(self._delay(response["headers_at"]))
+            return httpx.Response(response["status"], headers=response["headers"],
+                                  stream=_ReplayAsyncStream(self, response["chunks"], response["headers_at"]))
+        recording = _Recording(self, record, time.perf_counter())
+        upstream = await _originals["httpx_async"](transport, request)
+        recording.headers_received(upstream.status_code, upstream.headers.multi_items())
+        upstream.stream = _RecordingAsyncStream(upstream.stream, recording)
+        return upstream
+
+    def _handle_httpx_sync(self, transport, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        record = self._request_record(request.method, str(request.url), body)
+        if self.mode == "replay":
+            response = self._next(record)
+            time.sleep(self._delay(response["headers_at"]))
+            return httpx.Response(response["status"], headers=response["headers"],
+                                  stream=_ReplaySyncStream(self, response["chunks"], response["headers_at"]))
+        recording = _Recording(self, record, time.perf_counter())
+        upstream = _originals["httpx_sync"](transport, request)
+        recording.headers_received(upstream.status_code, upstream.headers.multi_items())
+        upstream.stream = _RecordingSyncStream(upstream.stream, recording)
+        return upstream
+
+    # requests
+
+    def _handle_requests(self, adapter, request, **kwargs):
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        record = self._request_record(request.method, request.url, body)
+        if self.mode == "replay":
+            response = self._next(record)
+            chunks = response["chunks"]
+            time.sleep(self._delay(chunks[-1]["at"] if chunks else response["headers_at"]))
+            status, headers = response["status"], response["headers"]
+            data = b"".join(_decode_chunk(chunk) for chunk in chunks)
+        else:
+            recording = _Recording(self, record, time.perf_counter())
+            upstream = _originals["requests"](adapter, request, **{**kwargs, "stream": True})
+            recording.headers_received(upstream.status_code, list(upstream.raw.headers.items()))
+            for chunk in upstream.raw.stream(65536, decode_content=False):
+                recording.chunk(chunk)
+            recording.finish()
+            upstream.close()
+            status, headers = upstream.status_code, recording.response["headers"]
+            data = b"".join(chunk for _, chunk in recording.chunks)
+        raw = urllib3.HTTPResponse(body=io.BytesIO(data), headers=headers, status=status,
+                                   preload_content=False, decode_content=True)
+        return adapter.build_response(request, raw)
+
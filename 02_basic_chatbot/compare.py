@@ -0,0 +1,167 @@
+"""Side-by-side model comparison for the chat app.
+
+``start_comparison`` sends one prompt to several providers at once: every
+provider stream becomes a ``GenerationTask`` on the shared ``BackgroundLoop``,
+so the requests run concurrently over the pooled HTTP client and each TTFT is
+measured from the same start. ``finish_comparison`` turns the finished (or
+stopped) tasks into a ``Comparison`` with TTFT, total latency, output tokens,
+tokens/s and estimated cost per model. Token counts come from the provider's
+usage report when it sends one, otherwise they are estimated from the text.
+Cost uses the list prices of the router profiles.
+
+``ComparisonLog`` appends every comparison to a JSON-lines file, and
+``to_jsonl``/``to_csv`` export them (one row per model and prompt for CSV),
+so real prompts can be turned into model-selection benchmarks.
+"""
+import csv
+import io
+import json
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from providers import ChatProvider, Message
+from router import DEFAULT_PROFILES, ModelProfile, estimate_tokens
+from streaming import BackgroundLoop, GenerationTask
+
+CSV_FIELDS = ["comparison_id", "time", "prompt", "model", "ttft_s", "latency_s", "input_tokens", "output_tokens",
+              "tokens_estimated", "tokens_per_s", "cost_usd", "stopped", "error", "output_chars"]
+
+
+@dataclass
+class ModelRun:
+    model: str  # profile key, "Provider/model"
+    text: str = ""
+    ttft: Optional[float] = None
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    tokens_estimated: bool = False  # no usage report from the provider
+    cost: Optional[float] = None  # USD, None if the model has no price profile
+    stopped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation speed after the first token"""
+        if self.ttft is None or self.output_tokens < 2 or self.seconds <= self.ttft:
+            return None
+        return self.output_tokens / (self.seconds - self.ttft)
+
+    def metrics(self) -> Dict[str, Any]:
+        """One row of the comparison table"""
+        tokens_per_second = self.tokens_per_second
+        return {
+            "model": self.model,
+            "ttft_s": round(self.ttft, 3) if self.ttft is not None else None,
+            "latency_s": round(self.seconds, 3),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "tokens_per_s": round(tokens_per_second, 1) if tokens_per_second is not None else None,
+            "cost_usd": round(self.cost, 6) if self.cost is not None else None,
+            "stopped": self.stopped,
+            "error": self.error,
+        }
+
+
+@dataclass
+class Comparison:
+    prompt: str
+    runs: List[ModelRun]
+    settings: Dict[str, Any] = field(default_factory=dict)  # temperature, max_tokens, history_messages
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    time: float = field(default_factory=time.time)
+
+    def table(self) -> List[Dict[str, Any]]:
+        return [run.metrics() for run in self.runs]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "time": self.time, "prompt": self.prompt, "settings": self.settings,
+                "runs": [asdict(run) for run in self.runs]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Comparison":
+        return cls(prompt=data["prompt"], runs=[ModelRun(**run) for run in data["runs"]],
+                   settings=data.get("settings", {}), id=data["id"], time=data["time"])
+
+
+def start_comparison(background: BackgroundLoop, providers: Dict[str, ChatProvider],
+                     messages: List[Message]) -> Dict[str, GenerationTask]:
+    """Start one streamed request per provider (keyed by profile key); they run concurrently"""
+    return {key: GenerationTask(background, provider.stream(messages)) for key, provider in providers.items()}
+
+
+def finish_comparison(prompt: str, messages: List[Message], providers: Dict[str, ChatProvider],
+                      tasks: Dict[str, GenerationTask], settings: Optional[Dict[str, Any]] = None,
+                      profiles: Sequence[ModelProfile] = DEFAULT_PROFILES) -> Comparison:
+    """Measurements of finished tasks; call after the tasks are done or cancelled"""
+    prices = {profile.key: profile for profile in profiles}
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    runs = []
+    for key, task in tasks.items():
+        usage = providers[key].usage
+        output_tokens = usage.get("output_tokens")
+        run = ModelRun(
+            model=key,
+            text=task.text,
+            ttft=task.ttft,
+            seconds=task.seconds,
+            input_tokens=usage.get("input_tokens") or prompt_tokens,
+            output_tokens=output_tokens or (estimate_tokens(task.text) if task.text else 0),
+            tokens_estimated=not output_tokens,
+            stopped=task.cancelled or task.cancel_requested_at is not None,
+            error=f"{type(task.error).__name__}: {task.error}" if task.error is not None else None,
+        )
+        profile = prices.get(key)
+        if profile is not None:
+            run.cost = (run.input_tokens * profile.input_price + run.output_tokens * profile.output_price) / 1e6
+        runs.append(run)
+    return Comparison(prompt=prompt, runs=runs, settings=settings or {})
+
+
+class ComparisonLog:
+    """Comparisons appended to a JSON-lines file, one per line"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def append(self, comparison: Comparison) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(comparison.to_dict()) + "\n")
+        except OSError as e:
+            print(f"Could not write comparison log: {e}", file=sys.stderr)
+
+    def load(self) -> List[Comparison]:
+        comparisons = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        comparisons.append(Comparison.from_dict(json.loads(line)))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except (OSError, TypeError):
+            pass
+        return comparisons
+
+
+def to_jsonl(comparisons: Sequence[Comparison]) -> str:
+    return "".join(json.dumps(comparison.to_dict()) + "\n" for comparison in comparisons)
+
+
+def to_csv(comparisons: Sequence[Comparison]) -> str:
+    """One row per model and prompt, without the answer texts"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for comparison in comparisons:
+        for run in comparison.runs:
+            writer.writerow({"comparison_id": comparison.id, "time": comparison.time, "prompt": comparison.prompt,
+                             **run.metrics(), "output_chars": len(run.text)})
+    return output.getvalue()
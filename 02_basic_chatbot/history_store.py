@@ -0,0 +1,192 @@
+"""Searchable store of past conversations, shared by the CLI bots and the app.
+
+Every finished turn is appended to one SQLite database (``chat_history.db``
+next to this file, or ``$CHATBOT_HISTORY_DB``; set it to an empty string to
+turn the store off). An FTS5 full-text index over the message text is kept
+current by triggers in the same transaction as the insert, so indexing is
+incremental: a turn costs one small write and search never rebuilds anything.
+
+``search`` ranks matches with BM25 and returns a highlighted snippet per
+message. Ranking every match of a very common word would take time that grows
+with the corpus. Only the newest ``RANK_CANDIDATES`` matches are ranked
+instead. FTS5 walks its postings in rowid order and stops early, so query time
+stays flat as the history grows. For rarer words, that window covers every
+match. The FTS index is an external-content table (the text is stored once,
+in ``messages``), and the database runs in WAL mode so the app and several
+CLI bots can write while others search. ``bench_search.py`` measures indexing
+and query latency on a synthetic corpus.
+
+Query syntax: words are matched as whole tokens and all must occur (``sky
+blue``); ``word*`` matches a prefix and ``"two words"`` a phrase. Other FTS5
+operators are treated as plain words.
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_history.db")
+ENV_VAR = "CHATBOT_HISTORY_DB"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,  -- "cli" or "app"
+    title TEXT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+    role TEXT NOT NULL,
+    model TEXT,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages(conversation_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+# Newest matches that are ranked by relevance (see the module docstring)
+RANK_CANDIDATES = 2000
+
+# Quoted phrases, or single words with an optional trailing * for prefix search
+QUERY_TERM = re.compile(r'"([^"]+)"|(\w+\*?)')
+
+
+@dataclass
+class SearchHit:
+    message_id: int
+    conversation_id: int
+    source: str
+    title: Optional[str]
+    role: str
+    model: Optional[str]
+    created: float
+    snippet: str
+    rank: float  # BM25, lower is better
+
+    def format(self) -> str:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.created))
+        speaker = "You" if self.role == "user" else (self.model or "AI")
+        return f"[{when} · {self.source} #{self.conversation_id}] {speaker}: {self.snippet}"
+
+
+def fts_query(text: str) -> str:
+    """User input as a safe FTS5 query: every term quoted, prefixes and phrases kept"""
+    terms = []
+    for phrase, word in QUERY_TERM.findall(text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word.endswith("*"):
+            terms.append(f'"{word[:-1]}"*')
+        else:
+            terms.append(f'"{word}"')
+    return " ".join(terms)
+
+
+class ConversationStore:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        # One connection shared by the app's script threads, serialized by a lock
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def start_conversation(self, source: str, title: Optional[str] = None) -> int:
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO conversations(source, title, started) VALUES (?, ?, ?)",
+                                      (source, title, time.time()))
+            return cursor.lastrowid
+
+    def add_messages(self, conversation_id: int, messages: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+        """Append ``(role, content, model)`` messages of one turn; indexed in the same transaction"""
+        now = time.time()
+        rows = [(conversation_id, role, model, content, now) for role, content, model in messages if content]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO messages(conversation_id, role, model, content, created) VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def add_turn(self, conversation_id: int, user_input: str, reply: str, model: Optional[str] = None) -> None:
+        self.add_messages(conversation_id, [("user", user_input, None), ("assistant", reply, model)])
+
+    def search(self, query: str, limit: int = 10, source: Optional[str] = None) -> List[SearchHit]:
+        """Best matching messages first (BM25)"""
+        match = fts_query(query)
+        if not match:
+            return []
+        # The rowid bound is the oldest of the newest RANK_CANDIDATES matches (of ``source``, if given)
+        if source:
+            candidates = """
+                SELECT messages_fts.rowid AS rowid FROM messages_fts
+                JOIN messages AS cm ON cm.id = messages_fts.rowid
+                JOIN conversations AS cc ON cc.id = cm.conversation_id
+                WHERE messages_fts MATCH ? AND cc.source = ? ORDER BY messages_fts.rowid DESC LIMIT ?"""
+            candidate_parameters: List[object] = [match, source, RANK_CANDIDATES]
+        else:
+            candidates = "SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+            candidate_parameters = [match, RANK_CANDIDATES]
+        sql = f"""
+            SELECT m.id, m.conversation_id, c.source, c.title, m.role, m.model, m.created,
+                   snippet(messages_fts, 0, '[', ']', '…', 12), f.rank
+            FROM messages_fts AS f
+            JOIN messages AS m ON m.id = f.rowid
+            JOIN conversations AS c ON c.id = m.conversation_id
+            WHERE messages_fts MATCH ? AND f.rowid >= (SELECT coalesce(min(rowid), 0) FROM ({candidates}))
+        """
+        parameters: List[object] = [match, *candidate_parameters]
+        if source:
+            sql += " AND c.source = ?"
+            parameters.append(source)
+        sql += " ORDER BY f.rank LIMIT ?"
+        parameters.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, parameters).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM messages").fetchone()[0]
+
+    def optimize(self) -> None:
+        """Merge the index segments, after bulk imports"""
+        with self._lock:
+            self._db.execute("INSERT INTO messages_fts(messages_fts) VALUES ('optimize')")
+
+
+def open_store(path: Optional[str] = None) -> Optional[ConversationStore]:
+    """The store at ``path`` or ``$CHATBOT_HISTORY_DB``; None if that is set empty or cannot be opened"""
+    if path is None:
+        path = os.getenv(ENV_VAR, DEFAULT_PATH)
+    if not path:
+        return None
+    try:
+        return ConversationStore(path)
+    except sqlite3.Error as e:
+        print(f"Conversation history disabled: {e}", file=sys.stderr)
+        return None
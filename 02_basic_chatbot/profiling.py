@@ -0,0 +1,224 @@
+"""Opt-in profiling for the chat app and the command-line bots.
+
+Turn it on with the environment variable ``CHATBOT_PROFILE=1`` (or set it to
+an output directory) or, for the command-line bots, the ``--profile [DIR]``
+flag. Each session then writes to ``profiles/<time>-<pid>/`` (or DIR):
+
+- ``startup.prof``: a CPU profile from the first import of this module until the
+  bot is ready, which mostly shows import cost
+- ``turn-NNN.prof`` per chat turn: a cProfile profile, readable with ``pstats``
+  or snakeviz. On Python 3.12+ it covers all threads, including the app's
+  background event loop.
+- ``turn-NNN-memory.txt``: a tracemalloc snapshot after the turn, with the
+  largest allocation sites and the growth since the previous turn
+- ``summary.txt``: per startup/turn, time by category and the top functions
+  by self time, rewritten after every turn. The categories are imports, JSON,
+  waiting (blocked on I/O or locks, i.e. mostly the provider's response
+  time), network (client-side HTTP/TLS work), rendering, message conversion
+  and other.
+
+Only one cProfile profiler can be active per process, so a turn that starts
+while another is being profiled (a second browser session) is skipped.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ENV_VAR = "CHATBOT_PROFILE"
+FLAG = "--profile"
+
+# (category, substrings of "file:function") checked in order against each function's self time
+CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("imports", ("<frozen importlib", "importlib/", "built-in method _imp.", "built-in method marshal.",
+                 "built-in method builtins.exec")),
+    ("json", ("json/", "orjson", "built-in method _json.", "pydantic_core")),
+    ("waiting", ("method 'select' of", "method 'poll' of", "method 'control' of", "method 'acquire' of '_thread.",
+                 "built-in method time.sleep")),
+    ("network", ("httpx/", "httpcore/", "h11/", "ssl.py", "socket.py", "selectors.py", "asyncio/", "requests/",
+                 "urllib3/", "grpc", "of '_ssl.", "of '_socket.")),
+    ("rendering", ("streamlit/", "html/", "format_message_content", "message_html", "builtins.print", "markdown")),
+    ("message conversion", ("langchain", "providers.py", "repl.py", "router.py", "google/generativeai")),
+]
+
+
+def categorize(location: str) -> str:
+    for category, patterns in CATEGORIES:
+        if any(pattern in location for pattern in patterns):
+            return category
+    return "other"
+
+
+def _location(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    return name if filename == "~" else f"{filename}:{line}({name})"
+
+
+def profile_summary(profile: cProfile.Profile, top: int = 10) -> Tuple[Dict[str, float], List[Tuple[float, float, str]]]:
+    """(self seconds per category, top (self seconds, cumulative seconds, function) by self time)"""
+    stats = pstats.Stats(profile).stats
+    categories: Dict[str, float] = {}
+    functions = []
+    for func, (_, _, self_time, cumulative, _) in stats.items():
+        location = _location(func)
+        category = categorize(location)
+        categories[category] = categories.get(category, 0.0) + self_time
+        functions.append((self_time, cumulative, location))
+    functions.sort(reverse=True)
+    return categories, functions[:top]
+
+
+class Profiler:
+    """Writes a CPU profile and a memory snapshot per turn into ``out_dir``"""
+
+    enabled = True
+
+    def __init__(self, out_dir: str, top: int = 15, memory_frames: int = 10):
+        self.out_dir = out_dir
+        self.top = top
+        os.makedirs(out_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sections: List[str] = []
+        self._turns = 0
+        self._current: Optional[Tuple[str, cProfile.Profile, float]] = None
+        self._previous_snapshot: Optional[tracemalloc.Snapshot] = None
+        tracemalloc.start(memory_frames)
+        self._startup: Optional[cProfile.Profile] = self._enable()
+        self._startup_began = time.perf_counter()
+
+    @staticmethod
+    def _enable() -> Optional[cProfile.Profile]:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None  # another profiler is active
+        return profile
+
+    def end_startup(self) -> None:
+        """Call once the bot is ready (imports and setup done); later calls do nothing"""
+        with self._lock:
+            profile, self._startup = self._startup, None
+        if profile is None:
+            return
+        profile.disable()
+        self._write("startup", profile, time.perf_counter() - self._startup_began)
+
+    def start_turn(self, label: str = "turn") -> None:
+        """Start profiling a turn; a turn still open (e.g. interrupted) is finished first"""
+        self.end_startup()
+        self.end_turn()
+        profile = self._enable()
+        if profile is not None:
+            with self._lock:
+                self._current = (label, profile, time.perf_counter())
+
+    def end_turn(self) -> None:
+        with self._lock:
+            current, self._current = self._current, None
+        if current is None:
+            return
+        label, profile, began = current
+        profile.disable()
+        self._turns += 1
+        name = f"turn-{self._turns:03d}"
+        self._write(name, profile, time.perf_counter() - began, label)
+        self._write_memory(name)
+
+    @contextmanager
+    def turn(self, label: str = "turn") -> Iterator[None]:
+        self.start_turn(label)
+        try:
+            yield
+        finally:
+            self.end_turn()
+
+    def _write(self, name: str, profile: cProfile.Profile, wall: float, label: Optional[str] = None) -> None:
+        profile.dump_stats(os.path.join(self.out_dir, f"{name}.prof"))
+        categories, functions = profile_summary(profile, self.top)
+        profiled = sum(categories.values()) or 1e-9
+        lines = [f"== {name}{f' ({label})' if label else ''}: {wall * 1000:.1f} ms wall, "
+                 f"{profiled * 1000:.1f} ms profiled self time"]
+        for category, seconds in sorted(categories.items(), key=lambda item: -item[1]):
+            lines.append(f"  {category:<20} {seconds * 1000:9.1f} ms  {seconds / profiled:6.1%}")
+        lines.append(f"  {'self ms':>9} {'cum ms':>9}  top functions by self time")
+        for self_time, cumulative, location in functions:
+            lines.append(f"  {self_time * 1000:9.1f} {cumulative * 1000:9.1f}  {location}")
+        self._sections.append("\n".join(lines))
+        self._write_summary()
+
+    def _write_memory(self, name: str) -> None:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced memory: current {current / 2 ** 20:.2f} MiB, peak {peak / 2 ** 20:.2f} MiB", "",
+                 f"top {self.top} allocation sites:"]
+        lines += [f"  {stat}" for stat in snapshot.statistics("lineno")[:self.top]]
+        if self._previous_snapshot is not None:
+            lines += ["", f"top {self.top} changes since the previous turn:"]
+            lines += [f"  {stat}" for stat in snapshot.compare_to(self._previous_snapshot, "lineno")[:self.top]]
+        self._previous_snapshot = snapshot
+        with open(os.path.join(self.out_dir, f"{name}-memory.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self._sections.append(f"  memory after {name}: {current / 2 ** 20:.2f} MiB traced, peak {peak / 2 ** 20:.2f} MiB")
+        self._write_summary()
+
+    def _write_summary(self) -> None:
+        with open(os.path.join(self.out_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(self._sections) + "\n")
+
+
+class NullProfiler:
+    """Stand-in when profiling is off; every hook does nothing"""
+
+    enabled = False
+    out_dir = None
+
+    def end_startup(self) -> None:
+        pass
+
+    def start_turn(self, label: str = "turn") -> None:
+        pass
+
+    def end_turn(self) -> None:
+        pass
+
+    @contextmanager
+    def turn(self, label: str = "turn") -> Iterator[None]:
+        yield
+
+
+_profiler = None
+
+
+def _requested_dir(argv: List[str]) -> Optional[str]:
+    """Output directory if profiling was asked for; removes ``--profile [DIR]`` from ``argv``"""
+    directory = None
+    if FLAG in argv:
+        index = argv.index(FLAG)
+        del argv[index]
+        directory = argv.pop(index) if index < len(argv) and not argv[index].startswith("-") else ""
+    value = os.getenv(ENV_VAR, "")
+    if directory is None and value and value.lower() not in ("0", "false", "no"):
+        directory = "" if value.lower() in ("1", "true", "yes") else value
+    if directory is None:
+        return None
+    return directory or os.path.join("profiles", f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+
+def get_profiler(argv: Optional[List[str]] = None):
+    """The process-wide profiler (a ``NullProfiler`` unless profiling is on)"""
+    global _profiler
+    if _profiler is None:
+        directory = _requested_dir(sys.argv if argv is None else argv)
+        _profiler = Profiler(directory) if directory else NullProfiler()
+        if directory:
+            print(f"Profiling to {os.path.abspath(directory)}", file=sys.stderr)
+    return _profiler
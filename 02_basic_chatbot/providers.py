@@ -0,0 +1,334 @@
+"""Async streaming chat providers for the command-line bots.
+
+Every provider takes OpenAI-style messages (``{"role": ..., "content": ...}``
+with roles system/user/assistant) and yields the reply as text deltas while
+the server produces it. All of them talk to the REST APIs over one shared
+``httpx.AsyncClient``, so a conversation reuses the same keep-alive
+connections turn after turn, and cancelling a stream closes its socket right
+away instead of reading the rest of the reply.
+
+- ``OpenAICompatibleProvider``: OpenAI, OpenRouter (DeepSeek), Groq and other
+  ``/chat/completions`` servers, server-sent events
+- ``OllamaProvider``: a local Ollama server, ``/api/chat`` JSON lines
+- ``GeminiProvider``: Google Gemini, ``streamGenerateContent`` server-sent events
+
+After a stream ends, ``provider.usage`` holds the token counts the server
+reported (``output_tokens`` may be missing if it reports none).
+
+Function calling: set ``provider.tools`` to OpenAI-style function schemas
+(``{"type": "function", "function": {"name", "description", "parameters"}}``).
+After a stream ends, ``provider.tool_calls`` holds the calls the model asked
+for, and ``provider.tool_messages(text, calls, results)`` builds the messages
+that hand the results back in the provider's own format.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Plain messages are {"role", "content"}; tool exchanges carry provider-specific extra keys
+Message = Dict[str, Any]
+
+# Generous read timeout: reasoning models can think for a while before the first token
+DEFAULT_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The process-wide client; create and use it from one event loop"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120.0),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class ProviderError(Exception):
+    """The provider answered with an error status or an error payload"""
+
+
+async def _raise_for_status(response: httpx.Response) -> None:
+    if response.status_code >= 400:
+        body = (await response.aread()).decode("utf-8", "replace")
+        raise ProviderError(f"HTTP {response.status_code} from {response.url.host}: {body[:500]}")
+
+
+async def _sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """Payloads of the ``data:`` lines of a server-sent event stream (comments and other fields skipped)"""
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            yield line[5:].strip()
+
+
+@dataclass
+class ToolCall:
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    id: str = ""  # set by OpenAI-compatible servers, echoed back with the result
+
+
+def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+    """Tool arguments arrive as a JSON string (OpenAI) or an object (Ollama, Gemini)"""
+    if isinstance(arguments, dict):
+        return arguments
+    try:
+        parsed = json.loads(arguments or "{}")
+    except ValueError:
+        raise ProviderError(f"Tool arguments are not valid JSON: {arguments[:200]}")
+    return parsed if isinstance(parsed, dict) else {}
+
+
+class ChatProvider:
+    """Base class: ``stream(messages)`` yields text deltas"""
+
+    name = "provider"
+
+    def __init__(self, model: str, temperature: float = 0.7, max_tokens: Optional[int] = None,
+                 client: Optional[httpx.AsyncClient] = None):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._client = client
+        self.usage: Dict[str, int] = {}
+        self.tools: Optional[List[Dict[str, Any]]] = None
+        self.tool_calls: List[ToolCall] = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
+    def stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def complete(self, messages: List[Message]) -> str:
+        """The whole reply at once"""
+        return "".join([delta async for delta in self.stream(messages)])
+
+    def tool_messages(self, text: str, calls: List[ToolCall], results: List[str]) -> List[Message]:
+        """The assistant turn that requested ``calls`` and one message per result, to append to the history"""
+        raise NotImplementedError
+
+
+class OpenAICompatibleProvider(ChatProvider):
+    """Streaming ``/chat/completions`` (OpenAI, OpenRouter, Groq, ...)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.openai.com/v1",
+                 headers: Optional[Dict[str, str]] = None, **kwargs: Any):
+        super().__init__(model, **kwargs)
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key}", **(headers or {})}
+
+    def _payload(self, messages: List[Message]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "stream": True,
+            # Ask for a final chunk with the token counts
+            "stream_options": {"include_usage": True},
+        }
+        if self.max_tokens:
+            payload["max_tokens"] = self.max_tokens
+        if self.tools:
+            payload["tools"] = self.tools
+        return payload
+
+    async def stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        self.usage = {}
+        self.tool_calls = []
+        # Tool calls stream in pieces: the first delta of a call has its id and name,
+        # the following ones append to the JSON arguments
+        calls: Dict[int, Dict[str, str]] = {}
+        async with self.client.stream("POST", f"{self.base_url}/chat/completions",
+                                      headers=self.headers, json=self._payload(messages)) as response:
+            await _raise_for_status(response)
+            async for data in _sse_data(response):
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise ProviderError(str(chunk["error"].get("message", chunk["error"])))
+                if chunk.get("usage"):
+                    self.usage = {"input_tokens": chunk["usage"].get("prompt_tokens", 0),
+                                  "output_tokens": chunk["usage"].get("completion_tokens", 0)}
+                for choice in chunk.get("choices") or []:
+                    delta = choice.get("delta") or {}
+                    for piece in delta.get("tool_calls") or []:
+                        call = calls.setdefault(piece.get("index", len(calls)), {"id": "", "name": "", "arguments": ""})
+                        function = piece.get("function") or {}
+                        call["id"] = piece.get("id") or call["id"]
+                        call["name"] += function.get("name") or ""
+                        call["arguments"] += function.get("arguments") or ""
+                    text = delta.get("content")
+                    if text:
+                        yield text
+        self.tool_calls = [ToolCall(call["name"], _parse_arguments(call["arguments"]), call["id"])
+                           for _, call in sorted(calls.items())]
+
+    def tool_messages(self, text: str, calls: List[ToolCall], results: List[str]) -> List[Message]:
+        assistant = {
+            "role": "assistant",
+            "content": text or None,
+            "tool_calls": [{"id": call.id, "type": "function",
+                            "function": {"name": call.name, "arguments": json.dumps(call.arguments)}}
+                           for call in calls],
+        }
+        return [assistant] + [{"role": "tool", "tool_call_id": call.id, "content": result}
+                              for call, result in zip(calls, results)]
+
+
+class OllamaProvider(ChatProvider):
+    """Streaming ``/api/chat`` on a local Ollama server"""
+
+    name = "ollama"
+
+    def __init__(self, model: str = "llama3.2", host: str = "http://localhost:11434", **kwargs: Any):
+        super().__init__(model, **kwargs)
+        self.host = host.rstrip("/")
+
+    async def verify_connection(self) -> bool:
+        """Verify connection to the Ollama server"""
+        try:
+            response = await self.client.get(f"{self.host}/api/tags", timeout=5.0)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def list_models(self) -> List[str]:
+        """Names of the locally available models"""
+        try:
+            response = await self.client.get(f"{self.host}/api/tags", timeout=5.0)
+            return [model["name"] for model in response.json()["models"]]
+        except (httpx.HTTPError, ValueError, KeyError):
+            return []
+
+    async def stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        self.usage = {}
+        options: Dict[str, Any] = {"temperature": self.temperature}
+        if self.max_tokens:
+            options["num_predict"] = self.max_tokens
+        payload: Dict[str, Any] = {"model": self.model, "messages": messages, "stream": True, "options": options}
+        if self.tools:
+            payload["tools"] = self.tools
+        self.tool_calls = []
+        async with self.client.stream("POST", f"{self.host}/api/chat", json=payload) as response:
+            await _raise_for_status(response)
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise ProviderError(chunk["error"])
+                message = chunk.get("message") or {}
+                for call in message.get("tool_calls") or []:
+                    function = call.get("function") or {}
+                    self.tool_calls.append(ToolCall(function.get("name", ""), _parse_arguments(function.get("arguments"))))
+                text = message.get("content")
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    self.usage = {"input_tokens": chunk.get("prompt_eval_count", 0),
+                                  "output_tokens": chunk.get("eval_count", 0)}
+
+    def tool_messages(self, text: str, calls: List[ToolCall], results: List[str]) -> List[Message]:
+        assistant = {"role": "assistant", "content": text,
+                     "tool_calls": [{"function": {"name": call.name, "arguments": call.arguments}} for call in calls]}
+        return [assistant] + [{"role": "tool", "tool_name": call.name, "content": result}
+                              for call, result in zip(calls, results)]
+
+
+# JSON schema keywords the Gemini API accepts in function parameters (an OpenAPI subset)
+GEMINI_SCHEMA_KEYS = {"type", "description", "properties", "required", "items", "enum", "format", "nullable"}
+
+
+def _gemini_schema(schema: Any) -> Any:
+    """Drop the keywords Gemini rejects (title, default, additionalProperties, ...) at every level"""
+    if not isinstance(schema, dict):
+        return schema
+    cleaned = {key: value for key, value in schema.items() if key in GEMINI_SCHEMA_KEYS}
+    if "properties" in cleaned:
+        cleaned["properties"] = {name: _gemini_schema(value) for name, value in cleaned["properties"].items()}
+    if "items" in cleaned:
+        cleaned["items"] = _gemini_schema(cleaned["items"])
+    return cleaned
+
+
+class GeminiProvider(ChatProvider):
+    """Streaming ``streamGenerateContent`` on the Gemini REST API"""
+
+    name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com/v1beta"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp",
+                 generation_config: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        super().__init__(model, **kwargs)
+        self.api_key = api_key
+        self.generation_config = dict(generation_config or {})
+
+    def _payload(self, messages: List[Message]) -> Dict[str, Any]:
+        config = {"temperature": self.temperature, **self.generation_config}
+        if self.max_tokens:
+            config["maxOutputTokens"] = self.max_tokens
+        payload: Dict[str, Any] = {
+            "contents": [
+                # Tool exchanges (see tool_messages) carry their function call/response parts
+                {"role": "model" if message["role"] == "assistant" else "user",
+                 "parts": message.get("parts") or [{"text": message["content"]}]}
+                for message in messages if message["role"] != "system"
+            ],
+            "generationConfig": config,
+        }
+        if self.tools:
+            payload["tools"] = [{"functionDeclarations": [
+                {**{key: value for key, value in tool["function"].items() if key != "parameters"},
+                 "parameters": _gemini_schema(tool["function"].get("parameters") or {"type": "object"})}
+                for tool in self.tools
+            ]}]
+        system = "\n\n".join(message["content"] for message in messages if message["role"] == "system")
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        return payload
+
+    async def stream(self, messages: List[Message]) -> AsyncIterator[str]:
+        self.usage = {}
+        self.tool_calls = []
+        url = f"{self.base_url}/models/{self.model}:streamGenerateContent"
+        async with self.client.stream("POST", url, params={"alt": "sse"}, headers={"x-goog-api-key": self.api_key},
+                                      json=self._payload(messages)) as response:
+            await _raise_for_status(response)
+            async for data in _sse_data(response):
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise ProviderError(str(chunk["error"].get("message", chunk["error"])))
+                usage = chunk.get("usageMetadata")
+                if usage:
+                    self.usage = {"input_tokens": usage.get("promptTokenCount", 0),
+                                  "output_tokens": usage.get("candidatesTokenCount", 0)}
+                for candidate in chunk.get("candidates") or []:
+                    for part in (candidate.get("content") or {}).get("parts") or []:
+                        if part.get("functionCall"):
+                            call = part["functionCall"]
+                            self.tool_calls.append(ToolCall(call.get("name", ""), _parse_arguments(call.get("args"))))
+                        if part.get("text"):
+                            yield part["text"]
+
+    def tool_messages(self, text: str, calls: List[ToolCall], results: List[str]) -> List[Message]:
+        parts = ([{"text": text}] if text else []) + [
+            {"functionCall": {"name": call.name, "args": call.arguments}} for call in calls]
+        responses = [{"functionResponse": {"name": call.name, "response": {"content": result}}}
+                     for call, result in zip(calls, results)]
+        return [{"role": "assistant", "content": text, "parts": parts},
+                {"role": "tool", "content": "\n".join(results), "parts": responses}]
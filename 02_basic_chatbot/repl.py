@@ -0,0 +1,276 @@
+"""Async streaming chat loop shared by the command-line bots.
+
+``ChatREPL`` runs a conversation against any ``providers.ChatProvider``:
+
+- the reply is printed token by token as it streams in
+- Ctrl+C while a reply is streaming cancels that request (the HTTP stream is
+  closed) and returns to the prompt; Ctrl+C at the prompt exits
+- after each turn it prints time to first token (TTFT) and tokens/s
+- it owns the history (system prompt plus the last ``max_history_messages``
+  user/assistant messages) and the built-in commands ``exit``, ``clear``,
+  ``history`` and ``stats``; bots add their own (e.g. ``model``)
+- every finished turn is saved to the shared conversation store
+  (``history_store.py``), and ``search <words>`` searches all past
+  conversations of every bot and the app
+
+All turns run on one event loop (``asyncio.Runner``), so the provider's pooled
+HTTP connections are reused across the whole session. With profiling on (see
+``profiling.py``) every turn is profiled.
+"""
+import asyncio
+import sqlite3
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import httpx
+
+from history_store import ConversationStore, open_store
+from profiling import get_profiler
+from providers import ChatProvider, Message, ProviderError, close_http_client
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+# A command handler gets the REPL and the rest of the input line; returning True ends the session.
+# Built-in commands must be typed alone, commands passed in by a bot may take an argument.
+Command = Callable[["ChatREPL", str], Any]
+
+
+@dataclass
+class TurnStats:
+    ttft: Optional[float] = None  # seconds until the first token
+    seconds: float = 0.0
+    output_tokens: int = 0
+    estimated: bool = False  # token count is the number of stream chunks, the server reported none
+    cancelled: bool = False
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation speed, from the first token to the end of the stream"""
+        generating = self.seconds - (self.ttft or 0.0)
+        return self.output_tokens / generating if generating > 0 else 0.0
+
+    def format(self) -> str:
+        ttft = f"TTFT {self.ttft:.2f} s" if self.ttft is not None else "no tokens"
+        tokens = f"{'~' if self.estimated else ''}{self.output_tokens} tokens"
+        text = f"{ttft}, {tokens} in {self.seconds:.2f} s, {self.tokens_per_second:.1f} tokens/s"
+        return f"[{text}{', cancelled' if self.cancelled else ''}]"
+
+
+class ChatREPL:
+    def __init__(
+        self,
+        provider: ChatProvider,
+        title: str,
+        system_prompt: Optional[str] = DEFAULT_SYSTEM_PROMPT,
+        commands: Optional[Dict[str, Command]] = None,
+        max_history_messages: int = 40,
+        show_stats: bool = True,
+        store: Union[ConversationStore, bool] = True,
+    ):
+        """``store``: where turns are saved; True for the default store (``$CHATBOT_HISTORY_DB``), False for none"""
+        self.provider = provider
+        self.title = title
+        self.system_prompt = system_prompt
+        self.max_history_messages = max_history_messages
+        self.show_stats = show_stats
+        self.history: List[Message] = []
+        self.turns: List[TurnStats] = []
+        self.commands: Dict[str, Command] = {
+            "exit": ChatREPL._exit,
+            "quit": ChatREPL._exit,
+            "clear": ChatREPL._clear,
+            "history": ChatREPL._show_history,
+            "stats": ChatREPL._show_stats,
+            **(commands or {}),
+        }
+        self._argument_commands = set(commands or {})
+        self.store: Optional[ConversationStore] = open_store() if store is True else (store or None)
+        self._conversation_id: Optional[int] = None
+        if self.store is not None:
+            self.commands.setdefault("search", ChatREPL._search)
+            self._argument_commands.add("search")
+        self._runner: Optional[asyncio.Runner] = None
+        self.profiler = get_profiler()
+
+    # History
+
+    def messages(self, user_input: Optional[str] = None) -> List[Message]:
+        """What gets sent to the provider: system prompt, history and the new input"""
+        messages = [{"role": "system", "content": self.system_prompt}] if self.system_prompt else []
+        messages += self.history
+        if user_input is not None:
+            messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def clear(self) -> None:
+        self.history = []
+        self._conversation_id = None  # the next turn starts a new conversation in the store
+
+    def format_history(self) -> str:
+        return "\n".join(f"{'You' if message['role'] == 'user' else 'AI'}: {message['content']}"
+                         for message in self.history)
+
+    def _remember(self, user_input: str, reply: str) -> None:
+        self.history += [{"role": "user", "content": user_input}, {"role": "assistant", "content": reply}]
+        if len(self.history) > self.max_history_messages:
+            # Drop whole exchanges from the front so the history still starts with a user message
+            excess = len(self.history) - self.max_history_messages
+            self.history = self.history[excess + excess % 2:]
+        self._save(user_input, reply)
+
+    def _save(self, user_input: str, reply: str) -> None:
+        if self.store is None:
+            return
+        try:
+            if self._conversation_id is None:
+                self._conversation_id = self.store.start_conversation("cli", self.title)
+            self.store.add_turn(self._conversation_id, user_input, reply,
+                                f"{self.provider.name}/{self.provider.model}")
+        except sqlite3.Error as e:
+            print(f"\n(Could not save the turn to the conversation history: {e})")
+
+    # Turns
+
+    def run_async(self, coro) -> Any:
+        """Run a coroutine on the session's event loop (for commands and setup that call the provider)"""
+        return self._runner.run(coro)
+
+    async def send(self, user_input: str) -> TurnStats:
+        """Stream one reply to stdout and add the exchange to the history.
+
+        A cancelled turn keeps what was already received, so the history matches
+        what the user saw. A failed turn is not added.
+        """
+        stats = TurnStats()
+        self.turns.append(stats)
+        reply: List[str] = []
+        failed = False
+        start = time.perf_counter()
+        print("\nAI: ", end="", flush=True)
+        try:
+            async for delta in self.provider.stream(self.messages(user_input)):
+                if stats.ttft is None:
+                    stats.ttft = time.perf_counter() - start
+                reply.append(delta)
+                print(delta, end="", flush=True)
+        except asyncio.CancelledError:
+            stats.cancelled = True
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            stats.seconds = time.perf_counter() - start
+            reported = self.provider.usage.get("output_tokens")
+            stats.output_tokens = reported if reported else len(reply)
+            stats.estimated = not reported
+            if reply and not failed:
+                self._remember(user_input, "".join(reply))
+        print()
+        return stats
+
+    def _print_stats(self, stats: TurnStats) -> None:
+        if self.show_stats:
+            text = stats.format()
+            print(f"\033[2m{text}\033[0m" if sys.stdout.isatty() else text)
+
+    def _handle_command(self, user_input: str) -> Optional[bool]:
+        """None if the input is not a command, otherwise True to end the session"""
+        handler, argument = self.commands.get(user_input.lower()), ""
+        if handler is None:
+            # Only the bot's own commands take an argument ("model llama3.2"); "clear the table" is a prompt
+            name, _, argument = user_input.partition(" ")
+            handler = self.commands.get(name.lower()) if name.lower() in self._argument_commands else None
+        if handler is None:
+            return None
+        return bool(handler(self, argument.strip()))
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        """Keep the event loop (and the HTTP connections) open, e.g. for setup calls before ``run``"""
+        if self._runner is not None:
+            yield
+            return
+        with asyncio.Runner() as runner:
+            self._runner = runner
+            try:
+                yield
+            finally:
+                runner.run(close_http_client())
+                self._runner = None
+
+    def run(self) -> None:
+        with self.session():
+            self.profiler.end_startup()
+            print(f"\n=== Welcome to {self.title}! ===")
+            print(f"Commands: {', '.join(sorted(self.commands))}. "
+                  "Ctrl+C stops a reply, Ctrl+C at the prompt quits.\n")
+            self._loop()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                user_input = input("\nYou: ").strip()
+            except (KeyboardInterrupt, EOFError):
+                print("\n\nExiting gracefully...")
+                return
+            if not user_input:
+                continue
+            try:
+                command = self._handle_command(user_input)
+                if command:
+                    return
+                if command is None:
+                    # The runner turns Ctrl+C into a cancellation of this turn, then KeyboardInterrupt
+                    with self.profiler.turn("chat turn"):
+                        stats = self._runner.run(self.send(user_input))
+                    self._print_stats(stats)
+            except KeyboardInterrupt:
+                print("\n[Stopped]")
+                if self.turns and self.turns[-1].cancelled:
+                    self._print_stats(self.turns[-1])
+            except (ProviderError, httpx.HTTPError) as e:
+                print(f"\nError: {str(e)}")
+                print("Please try again.")
+            except Exception as e:
+                # E.g. a malformed stream chunk: report it and keep the session
+                print(f"\nError: {type(e).__name__}: {str(e)}")
+                print("Please try again.")
+
+    # Built-in commands
+
+    def _exit(self, argument: str) -> bool:
+        print("\nGoodbye! Thank you for chatting.")
+        return True
+
+    def _clear(self, argument: str) -> None:
+        self.clear()
+        print("\nConversation history cleared.")
+
+    def _show_history(self, argument: str) -> None:
+        print("\n=== Chat History ===")
+        print(self.format_history() or "(empty)")
+
+    def _search(self, argument: str) -> None:
+        if not argument:
+            print("\nUsage: search <words>   (word* for a prefix, \"two words\" for a phrase)")
+            return
+        start = time.perf_counter()
+        hits = self.store.search(argument, limit=10)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n=== {len(hits)} result(s) for {argument!r} in {elapsed:.1f} ms ===")
+        for hit in hits:
+            print(hit.format())
+
+    def _show_stats(self, argument: str) -> None:
+        finished = [turn for turn in self.turns if turn.ttft is not None]
+        if not finished:
+            print("\nNo replies yet.")
+            return
+        print(f"\n{len(self.turns)} turns, model {self.provider.model}: "
+              f"median TTFT {statistics.median(turn.ttft for turn in finished):.2f} s, "
+              f"median {statistics.median(turn.tokens_per_second for turn in finished):.1f} tokens/s")
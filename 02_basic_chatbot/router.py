@@ -0,0 +1,305 @@
+"""Latency- and cost-aware model routing for the chat app.
+
+Instead of one fixed model, ``ModelRouter.choose`` picks a provider/model per
+prompt:
+
+1. Prompt features (length, whether it contains code) decide the quality tier
+   the answer needs: the configured minimum, one tier more for code or for
+   long prompts.
+2. Among the candidates that reach that tier, it picks the one with the lowest
+   expected cost-adjusted latency. Expected latency is
+   ``TTFT + output tokens / tokens per second``, inflated by the error rate
+   (a failed call has to be retried); cost is converted to seconds with
+   ``seconds_per_cent``.
+3. TTFT, tokens/s, output tokens and error rate are exponentially weighted
+   moving averages (EWMA) per model, updated from every routed call
+   (``record``). Until a model has real measurements its profile priors are used.
+   ``explore`` sends a small share of traffic to a random eligible model so
+   the estimates of models that are not winning stay current.
+
+Every decision and its outcome go to a JSON-lines log (``event`` is
+"decision" or "outcome", joined by ``id``) for offline analysis, and
+``ModelRouter.load`` replays the outcomes of an existing log to warm the EWMAs.
+"""
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Fenced blocks, or lines that look like code (keywords, braces/semicolons at the end, tracebacks)
+CODE_PATTERN = re.compile(
+    r"```|^\s*(def |class |import |from \S+ import |function |const |let |var |#include|SELECT |public |fn )"
+    r"|[{};]\s*$|Traceback \(most recent call last\)",
+    re.MULTILINE,
+)
+LONG_PROMPT_TOKENS = 1500
+QUALITY_TIERS = {1: "Basic", 2: "Standard", 3: "Best"}
+
+
+@dataclass
+class ModelProfile:
+    provider: str  # app provider name: OpenAI, Gemini, Ollama, Grok, DeepSeek
+    model: str
+    tier: int  # 1 basic .. 3 best
+    input_price: float = 0.0  # USD per million tokens
+    output_price: float = 0.0
+    code: bool = False  # counts one tier higher for prompts with code
+    ttft: float = 0.8  # priors until the model has measurements (seconds, tokens/s)
+    tokens_per_second: float = 50.0
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+# Defaults for AVAILABLE_MODELS in app.py; prices are list prices, local models are free
+DEFAULT_PROFILES = [
+    ModelProfile("OpenAI", "gpt-4o-mini", tier=2, input_price=0.15, output_price=0.60, ttft=0.5, tokens_per_second=80),
+    ModelProfile("OpenAI", "gpt-4o", tier=3, input_price=2.50, output_price=10.00, code=True, ttft=0.7, tokens_per_second=60),
+    ModelProfile("Gemini", "gemini-2.0-flash-exp", tier=2, input_price=0.10, output_price=0.40, ttft=0.5, tokens_per_second=120),
+    ModelProfile("Ollama", "llama3.2:latest", tier=1, ttft=0.3, tokens_per_second=25),
+    ModelProfile("Ollama", "llama3.1:latest", tier=1, ttft=0.5, tokens_per_second=15),
+    ModelProfile("Ollama", "mistral:latest", tier=1, ttft=0.5, tokens_per_second=15),
+    ModelProfile("Grok", "grok-1", tier=2, input_price=0.60, output_price=0.60, ttft=0.3, tokens_per_second=200),
+    ModelProfile("DeepSeek", "deepseek/deepseek-chat", tier=3, input_price=0.27, output_price=1.10, code=True,
+                 ttft=1.5, tokens_per_second=30),
+    ModelProfile("DeepSeek", "deepseek/deepseek-coder", tier=2, input_price=0.14, output_price=0.28, code=True,
+                 ttft=1.5, tokens_per_second=30),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class PromptFeatures:
+    prompt_tokens: int  # the new prompt
+    context_tokens: int  # prompt plus the history sent with it
+    has_code: bool
+
+    @classmethod
+    def from_messages(cls, prompt: str, history: Sequence[Dict[str, str]] = ()) -> "PromptFeatures":
+        context = sum(estimate_tokens(message["content"]) for message in history)
+        prompt_tokens = estimate_tokens(prompt)
+        return cls(prompt_tokens, context + prompt_tokens, bool(CODE_PATTERN.search(prompt)))
+
+
+class Ewma:
+    def __init__(self, alpha: float, initial: float):
+        self.alpha = alpha
+        self.value = initial
+
+    def update(self, sample: float) -> None:
+        self.value += self.alpha * (sample - self.value)
+
+
+@dataclass
+class ModelStats:
+    ttft: Ewma
+    tokens_per_second: Ewma
+    output_tokens: Ewma
+    error_rate: Ewma
+    calls: int = 0
+    errors: int = 0
+    cost: float = 0.0  # USD spent so far
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "ttft_s": round(self.ttft.value, 3),
+            "tokens_per_s": round(self.tokens_per_second.value, 1),
+            "output_tokens": round(self.output_tokens.value),
+            "error_rate": round(self.error_rate.value, 3),
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+@dataclass
+class RouteDecision:
+    id: str
+    profile: ModelProfile
+    required_tier: int
+    features: PromptFeatures
+    expected_latency: float
+    expected_cost: float
+    reason: str  # "best", "explore" or "fallback" (no candidate reached the tier)
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        profiles: Sequence[ModelProfile] = DEFAULT_PROFILES,
+        min_tier: int = 1,
+        seconds_per_cent: float = 1.0,
+        explore: float = 0.05,
+        alpha: float = 0.2,
+        log_path: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.profiles = {profile.key: profile for profile in profiles}
+        self.min_tier = min_tier
+        self.seconds_per_cent = seconds_per_cent
+        self.explore = explore
+        self.alpha = alpha
+        self.log_path = log_path
+        self.stats: Dict[str, ModelStats] = {key: self._initial_stats(profile) for key, profile in self.profiles.items()}
+        self._rng = random.Random(seed)
+
+    def _initial_stats(self, profile: ModelProfile) -> ModelStats:
+        return ModelStats(
+            ttft=Ewma(self.alpha, profile.ttft),
+            tokens_per_second=Ewma(self.alpha, profile.tokens_per_second),
+            output_tokens=Ewma(self.alpha, 300.0),
+            error_rate=Ewma(self.alpha, 0.0),
+        )
+
+    # Decisions
+
+    def required_tier(self, features: PromptFeatures) -> int:
+        tier = self.min_tier
+        if features.has_code or features.prompt_tokens > LONG_PROMPT_TOKENS:
+            tier += 1
+        return min(tier, max(QUALITY_TIERS))
+
+    def effective_tier(self, profile: ModelProfile, features: PromptFeatures) -> int:
+        return profile.tier + 1 if profile.code and features.has_code else profile.tier
+
+    def estimate(self, profile: ModelProfile, features: PromptFeatures) -> Tuple[float, float]:
+        """(expected latency in seconds including retries, expected cost in USD)"""
+        stats = self.stats[profile.key]
+        latency = stats.ttft.value + stats.output_tokens.value / max(stats.tokens_per_second.value, 1e-3)
+        # Each failure costs another attempt; cap so a broken model still gets a finite score
+        latency /= max(1.0 - stats.error_rate.value, 0.05)
+        cost = (features.context_tokens * profile.input_price + stats.output_tokens.value * profile.output_price) / 1e6
+        return latency, cost
+
+    def choose(self, prompt: str, history: Sequence[Dict[str, str]] = (),
+               candidates: Optional[Sequence[str]] = None) -> RouteDecision:
+        """Pick a model for this prompt among ``candidates`` (profile keys, default all)"""
+        keys = [key for key in (candidates or self.profiles) if key in self.profiles]
+        if not keys:
+            raise ValueError("No routable models: configure at least one provider")
+        features = PromptFeatures.from_messages(prompt, history)
+        tier = self.required_tier(features)
+        eligible = [key for key in keys if self.effective_tier(self.profiles[key], features) >= tier]
+        reason = "best"
+        if not eligible:
+            # Nothing reaches the tier: use the best models we have
+            top = max(self.effective_tier(self.profiles[key], features) for key in keys)
+            eligible = [key for key in keys if self.effective_tier(self.profiles[key], features) == top]
+            reason = "fallback"
+
+        scores, estimates = {}, {}
+        for key in eligible:
+            latency, cost = self.estimate(self.profiles[key], features)
+            estimates[key] = (latency, cost)
+            scores[key] = latency + cost * 100 * self.seconds_per_cent
+
+        chosen = min(scores, key=scores.get)
+        if reason == "best" and len(eligible) > 1 and self._rng.random() < self.explore:
+            chosen = self._rng.choice([key for key in eligible if key != chosen])
+            reason = "explore"
+
+        decision = RouteDecision(
+            id=uuid.uuid4().hex,
+            profile=self.profiles[chosen],
+            required_tier=tier,
+            features=features,
+            expected_latency=estimates[chosen][0],
+            expected_cost=estimates[chosen][1],
+            reason=reason,
+            scores={key: round(score, 4) for key, score in scores.items()},
+        )
+        self._log({
+            "event": "decision",
+            "id": decision.id,
+            "time": time.time(),
+            "model": chosen,
+            "reason": reason,
+            "required_tier": tier,
+            "features": asdict(features),
+            "expected_latency_s": round(decision.expected_latency, 4),
+            "expected_cost_usd": round(decision.expected_cost, 8),
+            "scores": decision.scores,
+        })
+        return decision
+
+    # Outcomes
+
+    def record(self, decision: RouteDecision, ttft: Optional[float], seconds: float,
+               output_tokens: int, input_tokens: Optional[int] = None, error: Optional[str] = None) -> float:
+        """Update the model's estimates from a finished call; returns its cost in USD"""
+        profile = decision.profile
+        if input_tokens is None:
+            input_tokens = decision.features.context_tokens
+        cost = 0.0 if error else (input_tokens * profile.input_price + output_tokens * profile.output_price) / 1e6
+        self._update(profile.key, ttft, seconds, output_tokens, cost, error)
+        self._log({
+            "event": "outcome",
+            "id": decision.id,
+            "time": time.time(),
+            "model": profile.key,
+            "ttft_s": round(ttft, 4) if ttft is not None else None,
+            "latency_s": round(seconds, 4),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(cost, 8),
+            "error": error,
+        })
+        return cost
+
+    def _update(self, key: str, ttft: Optional[float], seconds: float, output_tokens: int,
+                cost: float, error: Optional[str]) -> None:
+        stats = self.stats.get(key)
+        if stats is None:
+            return
+        stats.calls += 1
+        stats.error_rate.update(1.0 if error else 0.0)
+        if error:
+            stats.errors += 1
+            return
+        stats.cost += cost
+        if ttft is not None:
+            stats.ttft.update(ttft)
+            if output_tokens > 1 and seconds > ttft:
+                stats.tokens_per_second.update(output_tokens / (seconds - ttft))
+        stats.output_tokens.update(output_tokens)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Replay the outcomes in a decision log to warm the estimates; returns how many were read"""
+        path = path or self.log_path
+        count = 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get("event") == "outcome":
+                        self._update(event["model"], event.get("ttft_s"), event["latency_s"],
+                                     event.get("output_tokens", 0), event.get("cost_usd", 0.0), event.get("error"))
+                        count += 1
+        except OSError:
+            pass
+        return count
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key: stats.snapshot() for key, stats in self.stats.items()}
+
+    def _log(self, event: Dict[str, Any]) -> None:
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+        except OSError as e:
+            print(f"Could not write routing log: {e}", file=sys.stderr)
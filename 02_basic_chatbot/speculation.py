@@ -0,0 +1,253 @@
+"""Speculative precomputation of likely follow-up questions for the chat app.
+
+After an answer, ``FollowUpSpeculator.speculate`` asks the same model for a few
+follow-up questions the user is likely to ask next. It then precomputes their
+answers in the background. If the user picks or types one of those questions,
+``take`` returns the finished answer and no request is sent.
+
+The work is low priority and capped:
+
+- it runs on the app's ``BackgroundLoop``, one request at a time
+  (``concurrency``)
+- it waits while a foreground reply is streaming (``foreground``)
+- each request reserves its worst-case cost (input plus ``max_tokens``
+  output) against ``budget`` (USD per session). Requests that do not fit are
+  skipped, and the actual cost is charged when they finish.
+- a new answer discards the previous round. Queued and running work is
+  cancelled. Unused answers, and what cancelled ones had already cost, count
+  as wasted.
+
+A typed prompt matches a precomputed question if, after lowercasing and
+removing punctuation, it is equal or shares at least ``MATCH_THRESHOLD`` of
+its words (Jaccard). ``stats`` tracks the hit rate and the cost of wasted
+speculation.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from providers import ChatProvider, Message
+from router import ModelProfile, estimate_tokens
+from streaming import BackgroundLoop
+
+SUGGEST_PROMPT = (
+    "Based on the conversation so far, write the {count} follow-up questions the user is most likely to ask next. "
+    "Write them from the user's point of view, one per line, without numbering or any other text."
+)
+MATCH_THRESHOLD = 0.8
+WORD = re.compile(r"\w+")
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def _words(text: str) -> Set[str]:
+    return set(WORD.findall(text.lower()))
+
+
+def parse_questions(text: str, count: int) -> List[str]:
+    """Suggested questions, one per line, without list markers or duplicates"""
+    questions, seen = [], set()
+    for line in text.splitlines():
+        question = LIST_MARKER.sub("", line).strip().strip('"')
+        key = " ".join(WORD.findall(question.lower()))
+        if question and key and key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions[:count]
+
+
+@dataclass
+class Speculation:
+    question: str
+    status: str = "queued"  # queued, running, ready, failed, skipped (over budget), cancelled
+    answer: str = ""
+    cost: float = 0.0  # USD
+    seconds: float = 0.0
+    served: bool = False
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+
+class FollowUpSpeculator:
+    def __init__(self, background: BackgroundLoop, budget: float = 0.02, suggestions: int = 3,
+                 max_tokens: int = 400, concurrency: int = 1):
+        """Precompute up to ``suggestions`` follow-ups per answer, spending at most ``budget`` USD in total"""
+        self.background = background
+        self.budget = budget
+        self.suggestions = suggestions
+        self.max_tokens = max_tokens
+        self.speculations: List[Speculation] = []
+        self.stats: Dict[str, float] = {"rounds": 0, "precomputed": 0, "hits": 0, "misses": 0, "skipped": 0,
+                                        "spent_usd": 0.0, "suggestions_usd": 0.0, "wasted_usd": 0.0}
+        self._reserved = 0.0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._round: Optional[asyncio.Task] = None
+        self._starting = False  # speculate() called, round not created on the loop yet
+
+    # Called from the script thread
+
+    def speculate(self, make_provider: Callable[[], ChatProvider], profile: Optional[ModelProfile],
+                  messages: List[Message]) -> None:
+        """Start a new round for the conversation ``messages`` (ending with the latest answer)"""
+        self.discard()
+        self.stats["rounds"] += 1
+        self._starting = True
+        self.background.loop.call_soon_threadsafe(self._start_round, make_provider, profile, list(messages))
+
+    def foreground(self, active: bool) -> None:
+        """Hold speculation back while a user-visible reply is streaming"""
+        self.background.loop.call_soon_threadsafe(self._idle.clear if active else self._idle.set)
+
+    def match(self, prompt: str) -> Optional[Speculation]:
+        words = _words(prompt)
+        if not words:
+            return None
+        best, best_score = None, 0.0
+        for speculation in self.speculations:
+            candidate = _words(speculation.question)
+            score = len(words & candidate) / len(words | candidate) if candidate else 0.0
+            if score > best_score:
+                best, best_score = speculation, score
+        return best if best_score >= MATCH_THRESHOLD else None
+
+    def take(self, prompt: str, wait: float = 30.0) -> Optional[Speculation]:
+        """The precomputed answer for ``prompt``, waiting for one that is being generated; None on a miss"""
+        if not self.speculations:
+            return None
+        speculation = self.match(prompt)
+        if speculation is not None and speculation.status == "running" and speculation.task is not None:
+            # Already generating: finishing it is sooner than starting over
+            asyncio.run_coroutine_threadsafe(asyncio.wait({speculation.task}, timeout=wait),
+                                             self.background.loop).result()
+        if speculation is None or not speculation.ready:
+            self.stats["misses"] += 1
+            return None
+        speculation.served = True
+        self.stats["hits"] += 1
+        return speculation
+
+    def discard(self) -> None:
+        """Cancel the current round; finished answers that were not used count as wasted"""
+        for speculation in self.speculations:
+            if speculation.ready and not speculation.served:
+                self.stats["wasted_usd"] += speculation.cost
+            elif speculation.status in ("queued", "running") and speculation.task is not None:
+                self.background.loop.call_soon_threadsafe(speculation.task.cancel)
+        if self._round is not None:
+            self.background.loop.call_soon_threadsafe(self._round.cancel)
+        self.speculations = []
+
+    @property
+    def pending(self) -> bool:
+        """Whether the current round is still suggesting or precomputing"""
+        return (self._starting or self._round is not None and not self._round.done()
+                or any(speculation.status in ("queued", "running") for speculation in self.speculations))
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        attempts = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / attempts if attempts else None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            **{key: round(value, 6) if isinstance(value, float) else value for key, value in self.stats.items()},
+            "hit_rate": round(self.hit_rate, 3) if self.hit_rate is not None else None,
+            "budget_left_usd": round(max(self.budget - self.stats["spent_usd"] - self._reserved, 0.0), 6),
+            "current": {speculation.question: speculation.status for speculation in self.speculations},
+        }
+
+    # On the background loop
+
+    def _start_round(self, make_provider: Callable[[], ChatProvider], profile: Optional[ModelProfile],
+                     messages: List[Message]) -> None:
+        self._round = asyncio.get_running_loop().create_task(self._run_round(make_provider, profile, messages))
+        self._starting = False
+
+    def _reserve(self, profile: Optional[ModelProfile], messages: List[Message]) -> Optional[float]:
+        """Worst-case cost of a request, reserved against the budget; None if it does not fit"""
+        if profile is None:
+            return 0.0
+        input_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        worst = (input_tokens * profile.input_price + self.max_tokens * profile.output_price) / 1e6
+        if self.stats["spent_usd"] + self._reserved + worst > self.budget:
+            return None
+        self._reserved += worst
+        return worst
+
+    def _charge(self, provider: ChatProvider, profile: Optional[ModelProfile], messages: List[Message],
+                reply: str) -> float:
+        if profile is None:
+            return 0.0
+        input_tokens = provider.usage.get("input_tokens") or sum(estimate_tokens(m["content"]) for m in messages)
+        output_tokens = provider.usage.get("output_tokens") or estimate_tokens(reply)
+        cost = (input_tokens * profile.input_price + output_tokens * profile.output_price) / 1e6
+        self.stats["spent_usd"] += cost
+        return cost
+
+    async def _generate(self, make_provider: Callable[[], ChatProvider], profile: Optional[ModelProfile],
+                        messages: List[Message], speculation: Optional[Speculation] = None) -> Optional[Tuple[str, float]]:
+        """(reply, cost) of one low-priority request, or None if the budget does not allow it"""
+        async with self._slots:
+            await self._idle.wait()
+            reserved = self._reserve(profile, messages)
+            if reserved is None:
+                return None
+            if speculation is not None:
+                speculation.status = "running"
+            provider = make_provider()
+            provider.max_tokens = self.max_tokens
+            reply = ""
+            cost = 0.0
+            try:
+                reply = await provider.complete(messages)
+            finally:
+                # Charged also when cancelled: the tokens generated so far are billed
+                self._reserved -= reserved
+                cost = self._charge(provider, profile, messages, reply)
+                if speculation is not None:
+                    speculation.cost = cost
+            return reply, cost
+
+    async def _run_round(self, make_provider: Callable[[], ChatProvider], profile: Optional[ModelProfile],
+                         messages: List[Message]) -> None:
+        try:
+            prompt = SUGGEST_PROMPT.format(count=self.suggestions)
+            result = await self._generate(make_provider, profile, messages + [{"role": "user", "content": prompt}])
+        except Exception:
+            return
+        if result is None:
+            self.stats["skipped"] += 1
+            return
+        self.speculations = [Speculation(question) for question in parse_questions(result[0], self.suggestions)]
+        self.stats["suggestions_usd"] += result[1]
+        for speculation in self.speculations:
+            speculation.task = asyncio.get_running_loop().create_task(
+                self._precompute(speculation, make_provider, profile, messages))
+
+    async def _precompute(self, speculation: Speculation, make_provider: Callable[[], ChatProvider],
+                          profile: Optional[ModelProfile], messages: List[Message]) -> None:
+        start = time.perf_counter()
+        try:
+            result = await self._generate(make_provider, profile,
+                                          messages + [{"role": "user", "content": speculation.question}], speculation)
+        except asyncio.CancelledError:
+            speculation.status = "cancelled"
+            self.stats["wasted_usd"] += speculation.cost
+            raise
+        except Exception:
+            speculation.status = "failed"
+            return
+        if result is None:
+            speculation.status = "skipped"
+            self.stats["skipped"] += 1
+            return
+        speculation.answer, speculation.cost = result
+        speculation.seconds = time.perf_counter() - start
+        speculation.status = "ready"
+        self.stats["precomputed"] += 1
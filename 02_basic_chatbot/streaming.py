@@ -0,0 +1,145 @@
+"""Cancellable streamed generation for the Streamlit app.
+
+Streamlit runs the page script in a worker thread and interrupts it (with a
+rerun) when the user clicks a button, such as Stop, while it is running. The
+provider stream therefore runs on a ``BackgroundLoop``, an event loop on a
+daemon thread with its own pooled ``httpx.AsyncClient``. The script thread only
+reads the deltas a ``GenerationTask`` hands over.
+
+``GenerationTask.cancel`` cancels the asyncio task. The task's ``async with``
+around the HTTP stream then closes the response, so the socket is closed and
+leaves the connection pool. ``release_latency`` is the time from the cancel
+request until the task has finished and the connection is released.
+"""
+import asyncio
+import queue
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+import httpx
+
+from providers import DEFAULT_TIMEOUT
+
+
+class BackgroundLoop:
+    """An event loop on a daemon thread with one HTTP client, shared by all script runs"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.client: httpx.AsyncClient = self.run(self._create_client())
+
+    @staticmethod
+    async def _create_client() -> httpx.AsyncClient:
+        # Created on the loop it will be used from
+        return httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120.0),
+        )
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def active_connections(self) -> int:
+        """Pooled connections currently carrying a request (not idle, not closed)"""
+        async def count() -> int:
+            pool = self.client._transport._pool
+            return sum(1 for connection in pool.connections if not connection.is_idle() and not connection.is_closed())
+        return self.run(count())
+
+    def close(self) -> None:
+        self.run(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class GenerationTask:
+    """One streamed reply running on the background loop, consumed from a sync thread"""
+
+    def __init__(self, background: BackgroundLoop, stream: AsyncIterator[str]):
+        self.parts: List[str] = []
+        self.ttft: Optional[float] = None
+        self.seconds = 0.0
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.cancel_requested_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._finished = threading.Event()
+        self._deltas: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._started = time.perf_counter()
+        self._loop = background.loop
+        self._task: Optional[asyncio.Task] = None
+        self._loop.call_soon_threadsafe(self._start, stream)
+
+    def _start(self, stream: AsyncIterator[str]) -> None:
+        self._task = self._loop.create_task(self._run(stream))
+        # Also covers a task cancelled before it started running
+        self._task.add_done_callback(self._finish)
+
+    async def _run(self, stream: AsyncIterator[str]) -> None:
+        try:
+            async for delta in stream:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - self._started
+                self.parts.append(delta)
+                self._deltas.put(delta)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            # Closing the async generator closes the provider's HTTP stream (and its connection)
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._finish()
+
+    def _finish(self, *args) -> None:
+        if not self._finished.is_set():
+            self.finished_at = time.perf_counter()
+            self.seconds = self.finished_at - self._started
+            self._deltas.put(None)
+            self._finished.set()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def release_latency(self) -> Optional[float]:
+        """Seconds from ``cancel()`` until the stream was closed"""
+        if self.cancel_requested_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.cancel_requested_at
+
+    def updates(self, interval: float = 0.05) -> Iterator[str]:
+        """The text so far, at most every ``interval`` seconds and once more at the end"""
+        last_update = 0.0
+        while True:
+            try:
+                delta = self._deltas.get(timeout=interval)
+            except queue.Empty:
+                delta = ""
+            if delta is None:
+                yield self.text
+                return
+            now = time.perf_counter()
+            if now - last_update >= interval:
+                last_update = now
+                yield self.text
+
+    def cancel(self, wait: float = 5.0) -> Optional[float]:
+        """Cancel the request and wait until its connection is released; returns ``release_latency``"""
+        if not self.done:
+            self.cancel_requested_at = time.perf_counter()
+            # Scheduled after _start, so the task exists by then
+            self._loop.call_soon_threadsafe(lambda: self._task.cancel())
+            self._finished.wait(wait)
+        return self.release_latency
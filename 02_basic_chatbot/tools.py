@@ -0,0 +1,160 @@
+"""MCP tools for the chat app's models.
+
+``MCPToolbox`` keeps one persistent session per MCP server. It uses
+``MCPClientPool`` from ``05_mcp_server_client/01_basic`` with a single
+session, because JSON-RPC multiplexes concurrent calls over one connection.
+``connect()`` opens all servers concurrently and caches their tool schemas. A
+server's ``notifications/tools/list_changed`` invalidates the cache, and the
+next ``schemas()`` call fetches the list again.
+
+``tool_stream`` runs the function-calling loop around a provider:
+
+1. The model's reply streams as usual, with the tool schemas attached.
+2. When the model asks for tools, all calls of that turn run concurrently. A
+   model only emits calls together that do not depend on each other's results.
+3. The results go back to the model, which continues. After ``max_rounds``
+   rounds of tool calls, tools are withdrawn so the model has to answer.
+
+Every call is recorded as a ``ToolRun`` with its round-trip time (request to
+result, measured on the client), for display in the transcript.
+
+The toolbox must be used from one event loop. In the app, this is the
+``BackgroundLoop``.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from providers import ChatProvider, Message, ToolCall
+
+# The pooled client lives with the MCP server example
+MCP_CLIENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "05_mcp_server_client", "01_basic")
+if MCP_CLIENT_DIR not in sys.path:
+    sys.path.append(MCP_CLIENT_DIR)
+
+try:
+    from client_pool import MCPClientPool
+except ImportError:  # the mcp package is not installed
+    MCPClientPool = None
+
+# Function names the model APIs accept
+FUNCTION_NAME = re.compile(r"[^a-zA-Z0-9_-]")
+MAX_RESULT_CHARS = 8000  # longer tool results are cut before they go back to the model
+
+
+@dataclass
+class ToolRun:
+    name: str
+    server: str
+    arguments: Dict[str, Any]
+    result: str
+    error: bool = False
+    rtt: float = 0.0  # seconds
+    batch: int = 1  # calls that ran concurrently with this one, itself included
+
+    def format(self) -> str:
+        arguments = ", ".join(f"{key}={value!r}" for key, value in self.arguments.items())
+        result = self.result if len(self.result) <= 80 else self.result[:77] + "..."
+        outcome = "failed: " if self.error else "→ "
+        parallel = f", {self.batch} in parallel" if self.batch > 1 else ""
+        return f"{self.name}({arguments}) {outcome}{result} · {self.rtt * 1000:.1f} ms{parallel}"
+
+
+class MCPToolbox:
+    def __init__(self, servers: List[str], call_timeout: float = 30.0, transport: str = "sse"):
+        """Tools of the MCP servers at ``servers`` (URLs such as http://localhost:8050/sse)"""
+        if MCPClientPool is None:
+            raise RuntimeError("MCP tools need the mcp package: pip install mcp")
+        self.servers = list(servers)
+        self.pools = {url: MCPClientPool(url, size=1, transport=transport, call_timeout=call_timeout)
+                      for url in self.servers}
+        self.errors: Dict[str, str] = {}  # server -> why it could not be reached
+        self._routes: Dict[str, Tuple[str, str]] = {}  # function name -> (server, tool name)
+
+    async def connect(self) -> None:
+        """Open every server's session concurrently and cache the tool schemas"""
+        results = await asyncio.gather(*(pool.start() for pool in self.pools.values()), return_exceptions=True)
+        for url, result in zip(self.servers, results):
+            if isinstance(result, BaseException):
+                self.errors[url] = str(result)
+        await self.schemas()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()), return_exceptions=True)
+
+    async def schemas(self) -> List[Dict[str, Any]]:
+        """OpenAI-style function schemas of all tools; rebuilt only when a server's tool list changed"""
+        live = [url for url in self.servers if url not in self.errors]
+        listed = await asyncio.gather(*(self.pools[url].list_tools() for url in live), return_exceptions=True)
+        routes, schemas = {}, []
+        for url, tools in zip(live, listed):
+            if isinstance(tools, BaseException):
+                self.errors[url] = str(tools)
+                continue
+            for tool in tools:
+                name = FUNCTION_NAME.sub("_", tool.name)[:64]
+                if name in routes:
+                    # Same tool name on two servers: qualify the later one with its server's position
+                    name = f"s{self.servers.index(url) + 1}_{name}"[:64]
+                routes[name] = (url, tool.name)
+                schemas.append({"type": "function", "function": {
+                    "name": name,
+                    "description": tool.description or "",
+                    "parameters": tool.inputSchema or {"type": "object", "properties": {}},
+                }})
+        self._routes = routes
+        return schemas
+
+    @property
+    def tool_names(self) -> List[str]:
+        return list(self._routes)
+
+    async def _call(self, call: ToolCall, batch: int) -> ToolRun:
+        server, tool = self._routes.get(call.name, ("", call.name))
+        start = time.perf_counter()
+        try:
+            if not server:
+                raise KeyError(f"Unknown tool: {call.name}")
+            result = await self.pools[server].call_tool(tool, call.arguments)
+            text = "\n".join(getattr(item, "text", "") or str(item) for item in result.content)
+            error = bool(result.isError)
+        except Exception as e:
+            text, error = f"{type(e).__name__}: {e}", True
+        return ToolRun(call.name, server, call.arguments, text[:MAX_RESULT_CHARS], error,
+                       time.perf_counter() - start, batch)
+
+    async def call_many(self, calls: List[ToolCall]) -> List[ToolRun]:
+        """Run the calls of one model turn concurrently; a failed call becomes an error result for the model"""
+        return list(await asyncio.gather(*(self._call(call, len(calls)) for call in calls)))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "tools": self.tool_names,
+            "unreachable": self.errors,
+            "sessions": {url: pool.stats() for url, pool in self.pools.items()},
+        }
+
+
+async def tool_stream(provider: ChatProvider, toolbox: MCPToolbox, messages: List[Message],
+                      runs: List[ToolRun], max_rounds: int = 4) -> AsyncIterator[str]:
+    """Stream the reply, running the tools the model calls in between (appended to ``runs``)"""
+    provider.tools = await toolbox.schemas() or None
+    for round_number in range(max_rounds + 1):
+        if round_number == max_rounds:
+            provider.tools = None  # enough tool rounds: answer with what you have
+        parts: List[str] = []
+        async for delta in provider.stream(messages):
+            parts.append(delta)
+            yield delta
+        if not provider.tool_calls:
+            return
+        results = await toolbox.call_many(provider.tool_calls)
+        runs.extend(results)
+        messages = messages + provider.tool_messages("".join(parts), provider.tool_calls,
+                                                     [run.result for run in results])
+        if parts:
+            yield "\n\n"
@@ -0,0 +1,102 @@
+import os
+
+import streamlit as st
+from dotenv import load_dotenv
+
+from embeddings import EmbeddingBroker, get_embedding_backend
+from ingest import ingest, load_documents
+from lexical import BM25Index
+from pipeline import BackgroundLoop, RAGPipeline, gemini_generator
+from vector_store import MODES
+
+# Load environment variables
+load_dotenv()
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+st.set_page_config(
+    page_title="RAG Chatbot",
+    page_icon="📚",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+
+def init_session_state():
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+
+
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    # One event loop for the whole app, the broker and pipeline tasks live on it
+    return BackgroundLoop()
+
+
+@st.cache_resource(show_spinner="Indexing documents...")
+def setup_vector_store(data_dir: str, mode: str, provider: str):
+    documents = load_documents(data_dir)
+    if not documents:
+        return None, None, 0
+    broker = EmbeddingBroker(get_embedding_backend(None if provider == "auto" else provider))
+    store, chunks, _ = get_background_loop().run(ingest(documents, broker, mode=mode))
+    return broker, (store, BM25Index(chunks)), len(documents)
+
+
+init_session_state()
+
+st.title("📚 Chat with your documents")
+
+with st.sidebar:
+    st.header("Index")
+    data_dir = st.text_input("Documents directory", value=DATA_DIR)
+    provider = st.selectbox("Embedding provider", ["auto", "gemini", "openai", "local"])
+    mode = st.selectbox("Vector store mode", MODES)
+    deadline_ms = st.slider("Retrieval deadline (ms)", 50, 2000, 300, 50)
+    show_timings = st.checkbox("Show stage timings", value=True)
+    if st.button("Clear Chat"):
+        st.session_state.messages = []
+
+try:
+    broker, index, n_documents = setup_vector_store(data_dir, mode, provider)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+if index is None:
+    st.info(f"Place your documents (.txt, .md, .pdf) in `{data_dir}` to get started.")
+    st.stop()
+st.sidebar.caption(f"{n_documents} documents, {len(index[0])} chunks indexed")
+
+try:
+    generator = gemini_generator()
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+for message in st.session_state.messages:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        if message.get("timings") and show_timings:
+            st.caption(message["timings"])
+
+if prompt := st.chat_input("Ask a question about your documents..."):
+    st.session_state.messages.append({"role": "user", "content": prompt})
+    with st.chat_message("user"):
+        st.markdown(prompt)
+
+    store, lexical = index
+    pipeline = RAGPipeline(store, broker, lexical, generator, deadline_ms=deadline_ms)
+    with st.chat_message("assistant"):
+        try:
+            # Tokens are rendered as soon as Gemini produces them
+            response_text = st.write_stream(get_background_loop().iterate(pipeline.answer(prompt)))
+            timings = pipeline.last_timings.timings
+            summary = " · ".join(
+                f"{name} {timing['start_ms']:.0f}+{timing['duration_ms']:.0f} ms"
+                for name, timing in sorted(timings.items(), key=lambda item: item[1]["start_ms"])
+            )
+            if show_timings:
+                st.caption(summary)
+            st.session_state.messages.append({"role": "assistant", "content": response_text, "timings": summary})
+        except Exception as e:
+            st.error(f"Error generating response: {str(e)}")
@@ -0,0 +1,128 @@
+"""Throughput of sharded scatter-gather search against one in-process index.
+
+Builds a synthetic clustered index, then for every shard count writes the
+segments (``sharded_store.py``) and runs ``--clients`` concurrent client
+threads. It reports queries per second, p50/p99 latency and recall@k against
+exact search. The in-process ``VectorStore`` runs the same load as a baseline.
+Throughput can only scale up to the number of CPU cores.
+
+With ``--stall-shard`` (POSIX only), one worker is then paused with SIGSTOP
+and queries run with ``--timeout-ms``. This shows the partial results: the
+latency stays bounded and only the paused shard's chunks are missing.
+
+Usage:
+    python bench_shards.py --vectors 500000 --shards 1 2 4 8 --clients 16
+"""
+import argparse
+import os
+import signal
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from sharded_store import ShardedVectorStore, write_shards
+from vector_store import MODES, VectorStore, normalize
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_load(search: Callable[[np.ndarray], List[Tuple[str, float]]], queries: np.ndarray,
+             clients: int) -> Tuple[float, List[float], List[List[str]]]:
+    """(queries per second, latencies in ms, result ids) of all queries run by ``clients`` threads"""
+    latencies = [0.0] * len(queries)
+    found: List[List[str]] = [[] for _ in queries]
+    lock = threading.Lock()
+    next_query = iter(range(len(queries)))
+
+    def client() -> None:
+        while True:
+            with lock:
+                index = next(next_query, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            found[index] = [doc_id for doc_id, _ in search(queries[index])]
+            latencies[index] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        for future in [pool.submit(client) for _ in range(clients)]:
+            future.result()
+    return len(queries) / (time.perf_counter() - start), latencies, found
+
+
+def recall(found: List[List[str]], exact: List[List[str]]) -> float:
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded scatter-gather vector search")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--mode", choices=MODES, default="float32")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--stall-shard", action="store_true", help="Pause one worker and measure partial results")
+    parser.add_argument("--timeout-ms", type=float, default=100.0, help="Shard deadline with --stall-shard")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(64, args.dim))
+    embeddings = centers[rng.integers(64, size=args.vectors)] + 0.3 * rng.normal(size=(args.vectors, args.dim))
+    queries = normalize(embeddings[rng.choice(args.vectors, args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim)))
+    ids = [f"chunk-{i}" for i in range(args.vectors)]
+
+    store = VectorStore(args.dim, mode=args.mode, keep_originals=args.mode != "float32")
+    store.add(ids, embeddings)
+    exact_vectors = normalize(embeddings)
+    exact = [[ids[i] for i in np.argsort(-(exact_vectors @ query))[:args.k]] for query in queries]
+
+    print(f"{args.vectors:,} vectors, dim {args.dim}, {args.mode}, {args.clients} clients, "
+          f"{args.queries} queries, {os.cpu_count()} CPUs")
+    print(f"\n{'index':<16} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall@k':>9}")
+    qps, latencies, found = run_load(lambda query: store.search(query, args.k), queries, args.clients)
+    print(f"{'in-process':<16} {qps:>8.1f} {statistics.median(latencies):>8.2f} "
+          f"{percentile(latencies, 99):>8.2f} {recall(found, exact):>9.3f}")
+
+    with tempfile.TemporaryDirectory() as root:
+        for n_shards in args.shards:
+            directory = os.path.join(root, f"{n_shards}-shards")
+            write_shards(store, directory, n_shards)
+            with ShardedVectorStore(directory, timeout_ms=None) as sharded:
+                qps, latencies, found = run_load(lambda query: sharded.search(query, args.k), queries, args.clients)
+                print(f"{f'{n_shards} shard(s)':<16} {qps:>8.1f} {statistics.median(latencies):>8.2f} "
+                      f"{percentile(latencies, 99):>8.2f} {recall(found, exact):>9.3f}")
+
+                if args.stall_shard and n_shards == max(args.shards) and n_shards > 1 and hasattr(signal, "SIGSTOP"):
+                    stalled: Dict[str, int] = {"pid": sharded.pids[0]}
+                    os.kill(stalled["pid"], signal.SIGSTOP)
+                    try:
+                        details = []
+
+                        def search(query: np.ndarray) -> List[Tuple[str, float]]:
+                            result = sharded.search_detailed(query, args.k, timeout_ms=args.timeout_ms)
+                            details.append(result)
+                            return result.results
+
+                        qps, latencies, found = run_load(search, queries, args.clients)
+                    finally:
+                        os.kill(stalled["pid"], signal.SIGCONT)
+                    partial = sum(result.partial for result in details) / len(details)
+                    print(f"{'  shard 0 stalled':<16} {qps:>8.1f} {statistics.median(latencies):>8.2f} "
+                          f"{percentile(latencies, 99):>8.2f} {recall(found, exact):>9.3f}"
+                          f"   ({partial:.0%} partial, timeout {args.timeout_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Retrieval quality and latency benchmark for the RAG index.
+
+Runs fully offline with the local hashing embedder. For every combination of
+chunk size and index type it builds an index, runs the labeled queries and
+reports recall@k, MRR and nDCG@k together with p50/p99 query latency and index
+memory, as one JSON report that can be diffed between runs.
+
+The query set is a JSON list of ``{"query": "...", "relevant": ["doc.txt#3", ...]}``.
+A relevant id is either a chunk id (``<document>#<chunk>``) or a document id,
+which marks every chunk of that document relevant, so one query set works
+across chunk sizes.
+
+Usage:
+    python benchmark.py data/ queries.json --chunk-sizes 500 1000 --k 1 5 10 -o report.json
+    python benchmark.py --synthetic -o report.json
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from dedup import deduplicate_chunks
+from embeddings import HashingEmbedder
+from ingest import chunk_documents, load_documents
+from lexical import BM25Index
+from vector_store import VectorStore
+
+# index type -> (vector store mode or None for BM25, re-score with originals)
+INDEX_TYPES = {
+    "float32": ("float32", False),
+    "int8": ("int8", False),
+    "int8+rescore": ("int8", True),
+    "pq": ("pq", False),
+    "pq+rescore": ("pq", True),
+    "bm25": (None, False),
+}
+
+
+def matched_item(chunk_id: str, relevant: set):
+    """The labeled item a chunk satisfies (its own id or its document id), or None"""
+    if chunk_id in relevant:
+        return chunk_id
+    doc_id = chunk_id.split("#", 1)[0]
+    return doc_id if doc_id in relevant else None
+
+
+def recall_at_k(ranked: List[str], relevant: set, k: int) -> float:
+    """Fraction of the relevant items found in the top k (documents count once)"""
+    found = {matched_item(chunk_id, relevant) for chunk_id in ranked[:k]} - {None}
+    return len(found) / len(relevant) if relevant else 0.0
+
+
+def reciprocal_rank(ranked: List[str], relevant: set) -> float:
+    for rank, chunk_id in enumerate(ranked, 1):
+        if matched_item(chunk_id, relevant) is not None:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranked: List[str], relevant: set, k: int) -> float:
+    # Binary gain, and a labeled item only earns it once (several chunks of one relevant document)
+    gains, seen = [], set()
+    for chunk_id in ranked[:k]:
+        item = matched_item(chunk_id, relevant)
+        gains.append(1.0 if item is not None and item not in seen else 0.0)
+        seen.add(item)
+    dcg = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(gains))
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def build_index(index_type: str, chunks: List[Dict], embedder: HashingEmbedder) -> Tuple[Callable, Dict]:
+    """Build one index and return its search function ``query -> ranked ids`` plus memory figures"""
+    mode, rescore = INDEX_TYPES[index_type]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    if mode is None:
+        index = BM25Index(chunks)
+
+        def search(query: str, k: int) -> List[str]:
+            return [chunk_id for chunk_id, _ in index.search(query, k)]
+
+        footprint = {}
+    else:
+        embeddings = embedder.embed([c["text"] for c in chunks])
+        pq_subspaces = 32 if embedder.dim % 32 == 0 else 8
+        store = VectorStore(embedder.dim, mode=mode, pq_subspaces=pq_subspaces, keep_originals=rescore)
+        store.add([c["id"] for c in chunks], embeddings)
+        del embeddings
+
+        def search(query: str, k: int) -> List[str]:
+            vector = embedder.embed([query], kind="query")[0]
+            return [chunk_id for chunk_id, _ in store.search(vector, k=k, rescore=rescore)]
+
+        footprint = store.memory_footprint()
+
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return search, {
+        "index_bytes": footprint.get("total_ram_bytes", retained),
+        "retained_bytes": retained,
+        "compression_ratio": footprint.get("compression_ratio"),
+    }
+
+
+def run_config(
+    documents: List[Dict],
+    queries: List[Dict],
+    chunk_size: int,
+    index_type: str,
+    ks: List[int],
+    embedder: HashingEmbedder,
+    dedup_threshold: float = 0.0,
+) -> Dict:
+    chunks = chunk_documents(documents, chunk_size, chunk_overlap=chunk_size // 5)
+    if dedup_threshold:
+        chunks, _ = deduplicate_chunks(chunks, threshold=dedup_threshold)
+
+    build_start = time.perf_counter()
+    search, memory = build_index(index_type, chunks, embedder)
+    build_seconds = time.perf_counter() - build_start
+
+    max_k = max(ks)
+    latencies, rankings = [], []
+    search(queries[0]["query"], max_k)  # warm-up
+    for item in queries:
+        start = time.perf_counter()
+        ranked = search(item["query"], max_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rankings.append((ranked, set(item["relevant"])))
+
+    metrics = {}
+    for k in ks:
+        metrics[f"recall@{k}"] = round(float(np.mean([recall_at_k(r, rel, k) for r, rel in rankings])), 4)
+        metrics[f"ndcg@{k}"] = round(float(np.mean([ndcg_at_k(r, rel, k) for r, rel in rankings])), 4)
+    metrics["mrr"] = round(float(np.mean([reciprocal_rank(r, rel) for r, rel in rankings])), 4)
+
+    return {
+        "chunk_size": chunk_size,
+        "index_type": index_type,
+        "chunks": len(chunks),
+        "metrics": metrics,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(float(np.mean(latencies)), 3),
+        },
+        "memory": memory,
+        "build_seconds": round(build_seconds, 3),
+    }
+
+
+def synthetic_dataset(n_documents: int = 200, n_queries: int = 100, seed: int = 7) -> Tuple[List[Dict], List[Dict]]:
+    """Documents made of topic-specific vocabulary; each query paraphrases a sentence of one document"""
+    rng = random.Random(seed)
+    common = [f"common{i}" for i in range(300)]
+    documents = []
+    for d in range(n_documents):
+        topic = [f"topic{d}term{i}" for i in range(15)]
+        sentences = [
+            " ".join(rng.choice(topic if rng.random() < 0.3 else common) for _ in range(rng.randint(8, 20))) + "."
+            for _ in range(rng.randint(20, 60))
+        ]
+        documents.append({"id": f"doc{d}.txt", "text": " ".join(sentences), "metadata": {"source": f"doc{d}.txt"}})
+
+    queries = []
+    for _ in range(n_queries):
+        doc = rng.choice(documents)
+        words = rng.choice(doc["text"].split(".")[:-1]).split()
+        queries.append({"query": " ".join(rng.sample(words, min(6, len(words)))), "relevant": [doc["id"]]})
+    return documents, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency per index configuration")
+    parser.add_argument("data_dir", nargs="?", help="Directory with the corpus")
+    parser.add_argument("queries", nargs="?", help="JSON file with the labeled queries")
+    parser.add_argument("--synthetic", action="store_true", help="Use a generated corpus and query set")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 1000])
+    parser.add_argument("--index-types", nargs="+", choices=list(INDEX_TYPES), default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--dim", type=int, default=256, help="Local embedder dimension")
+    parser.add_argument("--dedup-threshold", type=float, default=0.0, help="De-duplicate chunks first (0 = off)")
+    parser.add_argument("-o", "--output", default="benchmark_report.json")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        documents, queries = synthetic_dataset()
+        dataset = "synthetic"
+    elif args.data_dir and args.queries:
+        documents = load_documents(args.data_dir)
+        with open(args.queries, encoding="utf-8") as f:
+            queries = json.load(f)
+        dataset = args.queries
+    else:
+        parser.error("Provide data_dir and queries, or --synthetic")
+
+    embedder = HashingEmbedder(dim=args.dim)
+    results = []
+    for chunk_size in args.chunk_sizes:
+        for index_type in args.index_types:
+            result = run_config(documents, queries, chunk_size, index_type, args.k, embedder, args.dedup_threshold)
+            results.append(result)
+            metrics = result["metrics"]
+            print(
+                f"chunk={chunk_size:<5} {index_type:<13} recall@{max(args.k)}={metrics[f'recall@{max(args.k)}']:<6} "
+                f"mrr={metrics['mrr']:<6} ndcg@{max(args.k)}={metrics[f'ndcg@{max(args.k)}']:<6} "
+                f"p50={result['latency_ms']['p50']:.2f}ms p99={result['latency_ms']['p99']:.2f}ms "
+                f"index={result['memory']['index_bytes'] / 1e6:.2f}MB"
+            )
+
+    report = {
+        "dataset": dataset,
+        "documents": len(documents),
+        "queries": len(queries),
+        "embedder": {"name": embedder.name, "dim": embedder.dim},
+        "k": args.k,
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Near-duplicate chunk elimination with MinHash signatures and LSH banding.
+
+Each chunk is reduced to a set of word shingles and a MinHash signature whose
+slot-wise agreement estimates the Jaccard similarity of two shingle sets.
+Signatures are cut into bands; chunks sharing any band bucket become candidates
+and are compared on the full signature. Candidates above the threshold are
+dropped, or merged into the chunk that was kept (its metadata records every
+source the text appeared in).
+
+Runs before embedding so duplicates never cost an embedding call or index slot.
+"""
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Hash family h(x) = (a * x + b) mod p; with p < 2**31 the product fits in uint64
+MERSENNE_PRIME = (1 << 31) - 1
+WHITESPACE = re.compile(r"\s+")
+
+
+def shingles(text: str, size: int = 5) -> List[str]:
+    """Word n-grams of the lowercased, whitespace-normalized text"""
+    words = WHITESPACE.sub(" ", text.lower()).strip().split(" ")
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        """Initialize ``num_perm`` random hash functions"""
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                for s in set(shingles(text, self.shingle_size))
+            ),
+            dtype=np.uint64,
+        ) % MERSENNE_PRIME
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) with bands * rows == num_perm whose S-curve midpoint is closest to the threshold"""
+    best = None
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        if best is None or abs(midpoint - threshold) < best[0]:
+            best = (abs(midpoint - threshold), bands, rows)
+    return best[1], best[2]
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def deduplicate_chunks(
+    chunks: List[Dict],
+    threshold: float = 0.8,
+    mode: str = "drop",
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    embedding_dim: int = 768,
+) -> Tuple[List[Dict], Dict]:
+    """Remove near-duplicate chunks
+
+    Args:
+        chunks: Dicts with ``id``, ``text`` and ``metadata`` keys, in ingestion order
+        threshold: Estimated Jaccard similarity above which a chunk is a duplicate
+        mode: "drop" discards duplicates, "merge" records them on the kept chunk
+            under ``metadata["duplicates"]``
+        num_perm: MinHash signature length
+        shingle_size: Words per shingle
+        embedding_dim: Used only to estimate the index bytes saved
+
+    Returns:
+        The kept chunks and a report of how much the index and embedding spend shrank
+    """
+    if mode not in ("drop", "merge"):
+        raise ValueError(f"Unknown dedup mode: {mode}. Use 'drop' or 'merge'")
+
+    hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+    bands, rows = choose_bands(num_perm, threshold)
+    buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+
+    kept: List[Dict] = []
+    signatures: List[np.ndarray] = []
+    duplicates = 0
+
+    for chunk in chunks:
+        signature = hasher.signature(chunk["text"])
+        keys = [signature[i * rows:(i + 1) * rows].tobytes() for i in range(bands)]
+
+        candidates = {idx for band, key in enumerate(keys) for idx in buckets[band].get(key, ())}
+        match = max(
+            ((estimated_jaccard(signature, signatures[idx]), idx) for idx in candidates),
+            default=(0.0, None),
+        )
+        if match[1] is not None and match[0] >= threshold:
+            duplicates += 1
+            if mode == "merge":
+                canonical = kept[match[1]]
+                canonical["metadata"].setdefault("duplicates", []).append(
+                    {"id": chunk["id"], "similarity": round(match[0], 3), **chunk.get("metadata", {})}
+                )
+            continue
+
+        index = len(kept)
+        kept.append({**chunk, "metadata": dict(chunk.get("metadata", {}))})
+        signatures.append(signature)
+        for band, key in enumerate(keys):
+            buckets[band][key].append(index)
+
+    chars_in = sum(len(c["text"]) for c in chunks)
+    chars_out = sum(len(c["text"]) for c in kept)
+    report = {
+        "threshold": threshold,
+        "bands": bands,
+        "rows_per_band": rows,
+        "chunks_in": len(chunks),
+        "chunks_out": len(kept),
+        "duplicates_removed": duplicates,
+        "index_shrink_pct": round(100.0 * duplicates / len(chunks), 2) if chunks else 0.0,
+        "index_bytes_saved": duplicates * embedding_dim * 4,
+        "embedding_chars_saved": chars_in - chars_out,
+        # ~4 characters per token for English text
+        "embedding_tokens_saved_est": (chars_in - chars_out) // 4,
+        "embedding_spend_shrink_pct": round(100.0 * (chars_in - chars_out) / chars_in, 2) if chars_in else 0.0,
+    }
+    return kept, report
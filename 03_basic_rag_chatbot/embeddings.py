@@ -0,0 +1,294 @@
+"""Embedding backends and a dynamic batching broker for the RAG chatbot.
+
+Backends turn a list of texts into a ``(len(texts), dim)`` float32 array:
+
+- ``GeminiEmbedder``: Google ``text-embedding-004`` via ``google.generativeai``
+- ``OpenAIEmbedder``: OpenAI ``text-embedding-3-small``
+- ``HashingEmbedder``: offline feature-hashing embedder, for tests and benchmarks
+
+``EmbeddingBroker`` sits in front of a backend. Concurrent callers each ask for
+one (or a few) embeddings; the broker collects them into batches of up to
+``max_batch_size`` texts or ``max_wait_ms`` milliseconds, whichever comes first,
+sends one request per batch and hands every caller its own rows back. Query
+embeddings are kept in an LRU cache.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of words and word bigrams
+
+    Deterministic across processes (uses blake2b, not ``hash()``), needs no
+    network and no fitting, so ingestion and queries can be embedded independently.
+    """
+
+    name = "local"
+    max_batch_size = 4096
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = TOKEN_PATTERN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str], kind: str = "document") -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                index = value % self.dim
+                sign = 1.0 if (value >> 63) & 1 else -1.0
+                counts[index] = counts.get(index, 0.0) + sign
+            for index, count in counts.items():
+                # Sublinear term frequency, keeps repeated boilerplate from dominating
+                vectors[row, index] = np.sign(count) * (1.0 + np.log(abs(count))) if count else 0.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class GeminiEmbedder:
+    name = "gemini"
+    max_batch_size = 100  # batchEmbedContents limit
+    DIMENSIONS = {"models/text-embedding-004": 768, "models/embedding-001": 768}
+
+    def __init__(self, api_key: str, model: str = "models/text-embedding-004"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model = model
+        self.dim = self.DIMENSIONS.get(model)
+
+    def embed(self, texts: List[str], kind: str = "document") -> np.ndarray:
+        result = self._genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type="retrieval_query" if kind == "query" else "retrieval_document",
+        )
+        return np.asarray(result["embedding"], dtype=np.float32)
+
+
+class OpenAIEmbedder:
+    name = "openai"
+    max_batch_size = 2048
+    DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small"):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.dim = self.DIMENSIONS.get(model)
+
+    def embed(self, texts: List[str], kind: str = "document") -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+
+def get_embedding_backend(provider: Optional[str] = None):
+    """Create the configured embedding backend
+
+    The provider comes from the argument or the ``EMBEDDING_PROVIDER`` env var
+    ("gemini", "openai" or "local"); it defaults to Gemini when a Google API key
+    is set and to the offline embedder otherwise.
+    """
+    load_dotenv()
+    provider = provider or os.getenv("EMBEDDING_PROVIDER")
+    if provider is None:
+        provider = "gemini" if os.getenv("GOOGLE_API_KEY") else "local"
+
+    if provider == "gemini":
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
+        return GeminiEmbedder(api_key)
+    if provider == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
+        return OpenAIEmbedder(api_key)
+    if provider == "local":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+class EmbeddingBroker:
+    def __init__(
+        self,
+        backend,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0,
+        max_concurrent_batches: int = 4,
+        cache_size: int = 1024,
+    ):
+        """Initialize the broker
+
+        Args:
+            backend: Any object with ``embed(texts, kind) -> np.ndarray``
+            max_batch_size: Upper bound on texts per backend request (capped by the backend's own limit)
+            max_wait_ms: How long the first text of a batch may wait for company
+            max_concurrent_batches: Backend requests allowed in flight at once
+            cache_size: Number of query embeddings kept in the LRU cache
+        """
+        self.backend = backend
+        self.max_batch_size = min(max_batch_size, getattr(backend, "max_batch_size", max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        # Known up front for most backends, otherwise learned from the first batch
+        self.dim: Optional[int] = getattr(backend, "dim", None)
+
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {"query": [], "document": []}
+        self._timers: Dict[str, Optional[asyncio.TimerHandle]] = {"query": None, "document": None}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._max_concurrent_batches = max_concurrent_batches
+        self._tasks: set = set()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.stats = {
+            "requests": 0,
+            "texts_embedded": 0,
+            "batches": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "backend_seconds": 0.0,
+        }
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Embed a search query, served from the LRU cache when possible"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self.stats["cache_hits"] += 1
+            return cached
+
+        self.stats["cache_misses"] += 1
+        vector = await self._submit(text, "query")
+        self._cache[text] = vector
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return vector
+
+    async def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed document chunks, batched together with any other concurrent callers"""
+        if not texts:
+            if self.dim is None:
+                await self._submit(".", "document")
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vectors = await asyncio.gather(*(self._submit(text, "document") for text in texts))
+        return np.stack(vectors)
+
+    def _submit(self, text: str, kind: str) -> asyncio.Future:
+        self.stats["requests"] += 1
+        # Identical texts already waiting or in flight share one slot in the batch. Each caller
+        # awaits a shield of it, so a cancelled caller does not cancel the others.
+        key = (kind, text)
+        if key in self._inflight:
+            return asyncio.shield(self._inflight[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        pending = self._pending[kind]
+        pending.append((text, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(kind)
+        elif self._timers[kind] is None:
+            self._timers[kind] = loop.call_later(self.max_wait, self._flush, kind)
+        return asyncio.shield(future)
+
+    def _flush(self, kind: str) -> None:
+        timer = self._timers[kind]
+        if timer is not None:
+            timer.cancel()
+            self._timers[kind] = None
+
+        pending = self._pending[kind]
+        while pending:
+            batch, pending[:] = pending[:self.max_batch_size], pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._dispatch(batch, kind))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]], kind: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_batches)
+        texts = [text for text, _ in batch]
+        try:
+            async with self._semaphore:
+                start = time.perf_counter()
+                # Backends use blocking SDKs, keep them off the event loop
+                vectors = await asyncio.to_thread(self.backend.embed, texts, kind)
+                self.stats["backend_seconds"] += time.perf_counter() - start
+            if len(vectors) != len(batch):
+                # A truncated response would leave the unmatched callers waiting forever
+                raise RuntimeError(f"Embedding backend returned {len(vectors)} vectors for {len(batch)} texts")
+            self.stats["batches"] += 1
+            self.stats["texts_embedded"] += len(texts)
+            self.dim = vectors.shape[1]
+            for (text, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for text, _ in batch:
+                self._inflight.pop((kind, text), None)
+
+    async def close(self) -> None:
+        """Flush anything still waiting and wait for in-flight batches"""
+        for kind in self._pending:
+            self._flush(kind)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def report(self) -> Dict[str, float]:
+        """Batching and cache statistics"""
+        batches = self.stats["batches"]
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return {
+            **self.stats,
+            "backend_seconds": round(self.stats["backend_seconds"], 4),
+            "avg_batch_size": round(self.stats["texts_embedded"] / batches, 2) if batches else 0.0,
+            "cache_hit_rate": round(self.stats["cache_hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def _demo(n_queries: int = 200) -> None:
+    broker = EmbeddingBroker(HashingEmbedder(), max_batch_size=32, max_wait_ms=5)
+    queries = [f"how do I configure option {i % 50}" for i in range(n_queries)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(broker.embed_query(q) for q in queries))
+    # Repeated queries are now answered from the LRU cache
+    await asyncio.gather(*(broker.embed_query(q) for q in queries[:50]))
+    await broker.embed_documents([f"chunk number {i} of the manual" for i in range(1000)])
+    await broker.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n=== Embedding broker ({n_queries} concurrent queries + 1000 chunks) ===")
+    print(f"Elapsed: {elapsed * 1000:.1f} ms")
+    for key, value in broker.report().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,163 @@
+"""Document ingestion for the RAG chatbot: load, chunk, de-duplicate, embed, index.
+
+Usage:
+    python ingest.py data/ --mode int8 --dedup drop --threshold 0.8
+    python ingest.py data/ --shards 4 --index-dir vector_store/shards
+"""
+import argparse
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from dedup import deduplicate_chunks
+from embeddings import EmbeddingBroker, get_embedding_backend
+from sharded_store import write_shards
+from vector_store import MODES, VectorStore
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+
+
+def load_documents(data_dir: str) -> List[Dict]:
+    """Load every supported file under ``data_dir`` as ``{"id", "text", "metadata"}``"""
+    documents = []
+    for root, _, files in os.walk(data_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in SUPPORTED_EXTENSIONS:
+                continue
+            if extension == ".pdf":
+                from pypdf import PdfReader
+
+                text = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+            else:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            doc_id = os.path.relpath(path, data_dir)
+            documents.append({"id": doc_id, "text": text, "metadata": {"source": doc_id}})
+    return documents
+
+
+def split_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    """Split text into chunks of about ``chunk_size`` characters, preferring whitespace boundaries"""
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            boundary = text.rfind(" ", start + chunk_size // 2, end)
+            if boundary != -1:
+                end = boundary
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - chunk_overlap, start + 1)
+    return chunks
+
+
+def chunk_documents(documents: List[Dict], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Dict]:
+    chunks = []
+    for doc in documents:
+        for i, text in enumerate(split_text(doc["text"], chunk_size, chunk_overlap)):
+            chunks.append({
+                "id": f"{doc['id']}#{i}",
+                "text": text,
+                "metadata": {**doc["metadata"], "chunk": i},
+            })
+    return chunks
+
+
+async def ingest(
+    documents: List[Dict],
+    broker: EmbeddingBroker,
+    mode: str = "float32",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    dedup: Optional[str] = "drop",
+    dedup_threshold: float = 0.8,
+    keep_originals: bool = False,
+) -> Tuple[VectorStore, List[Dict], Optional[Dict]]:
+    """Chunk, de-duplicate and embed the documents into a new vector store
+
+    Returns the store, the indexed chunks and the de-duplication report
+    (``None`` when de-duplication is off). Raises ``ValueError`` when the
+    documents contain no text to index (e.g. empty files or scanned PDFs).
+    """
+    chunks = chunk_documents(documents, chunk_size, chunk_overlap)
+    if not chunks:
+        raise ValueError("No indexable text found in the documents (empty files or PDFs without extractable text)")
+    report = None
+    if dedup:
+        chunks, report = deduplicate_chunks(
+            chunks,
+            threshold=dedup_threshold,
+            mode=dedup,
+            embedding_dim=getattr(broker.backend, "dim", 768),
+        )
+
+    embeddings = await broker.embed_documents([c["text"] for c in chunks])
+    store = VectorStore(embeddings.shape[1], mode=mode, keep_originals=keep_originals)
+    store.add(
+        [c["id"] for c in chunks],
+        embeddings,
+        [{**c["metadata"], "text": c["text"]} for c in chunks],
+    )
+    return store, chunks, report
+
+
+async def _main(args: argparse.Namespace) -> None:
+    documents = load_documents(args.data_dir)
+    if not documents:
+        print(f"No documents found in {args.data_dir} (supported: {', '.join(SUPPORTED_EXTENSIONS)})")
+        return
+
+    broker = EmbeddingBroker(get_embedding_backend(args.provider))
+    try:
+        store, chunks, report = await ingest(
+            documents,
+            broker,
+            mode=args.mode,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            dedup=None if args.dedup == "off" else args.dedup,
+            dedup_threshold=args.threshold,
+        )
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    finally:
+        await broker.close()
+
+    print(f"\nIndexed {len(chunks)} chunks from {len(documents)} documents")
+    if report:
+        print("\n=== De-duplication ===")
+        for key, value in report.items():
+            print(f"  {key}: {value}")
+    print("\n=== Index ===")
+    for key, value in store.memory_footprint().items():
+        print(f"  {key}: {value}")
+    if args.shards:
+        manifest = write_shards(store, args.index_dir, args.shards)
+        print(f"\nWrote {manifest['shards']} shards to {args.index_dir} (sizes {manifest['sizes']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents into the RAG vector store")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--provider", choices=["gemini", "openai", "local"], default=None)
+    parser.add_argument("--mode", choices=MODES, default="float32")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dedup", choices=["drop", "merge", "off"], default="drop")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Jaccard similarity for near-duplicates")
+    parser.add_argument("--shards", type=int, default=0, help="Also write the index as this many shard segments")
+    parser.add_argument("--index-dir", default=os.path.join("vector_store", "shards"))
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
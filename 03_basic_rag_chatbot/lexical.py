@@ -0,0 +1,46 @@
+"""BM25 keyword index over the ingested chunks, the lexical half of hybrid retrieval."""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, chunks: List[Dict], k1: float = 1.5, b: float = 0.75):
+        """Build an inverted index over ``chunks`` (dicts with ``id`` and ``text``)"""
+        self.k1 = k1
+        self.b = b
+        self.ids = [chunk["id"] for chunk in chunks]
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+
+        for doc, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings[term].append((doc, tf))
+
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        n = len(chunks)
+        self._idf = {
+            term: math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / self._avg_length)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(self.ids[doc], scores[doc]) for doc in best]
@@ -0,0 +1,324 @@
+"""Pipelined retrieve-then-generate for the RAG chatbot.
+
+Stages overlap instead of running one after another:
+
+1. Query embedding + vector search and BM25 lexical search start together.
+2. Prompt assembly starts with whichever retriever returns first and folds in
+   the others as they arrive (reciprocal rank fusion). Once one retriever has
+   answered, late ones get until ``deadline_ms`` and are then dropped. The whole
+   retrieval stage is bounded by ``retrieval_timeout_ms``, also when no
+   retriever returns results.
+3. Gemini generation streams tokens back as they are produced.
+
+Every stage is timed (start offset and duration) in ``RAGPipeline.last_timings``
+so the end-to-end latency can be broken down.
+
+Usage:
+    python pipeline.py data/ "What does the manual say about backups?"
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+from embeddings import EmbeddingBroker
+from lexical import BM25Index
+from sharded_store import ShardedVectorStore, write_shards
+from vector_store import VectorStore
+
+# Reciprocal rank fusion constant, the usual value from the RRF paper
+RRF_K = 60
+
+PROMPT_TEMPLATE = """Answer the question using only the context below. If the context does not contain the answer, say so.
+
+Context:
+{context}
+
+Question: {question}
+Answer:"""
+
+
+class StageTimer:
+    """Records start offset and duration (ms) of each pipeline stage"""
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    @contextmanager
+    def stage(self, name: str):
+        start = self._now_ms()
+        try:
+            yield
+        finally:
+            previous = self.timings.get(name)
+            duration = self._now_ms() - start
+            if previous:
+                # Repeated stages (e.g. assembly per retriever) accumulate
+                previous["duration_ms"] = round(previous["duration_ms"] + duration, 3)
+            else:
+                self.timings[name] = {"start_ms": round(start, 3), "duration_ms": round(duration, 3)}
+
+    def mark(self, name: str) -> None:
+        """Record an instant, e.g. the first generated token"""
+        self.timings[name] = {"start_ms": round(self._now_ms(), 3), "duration_ms": 0.0}
+
+    def format(self) -> str:
+        lines = [f"{'stage':<22} {'start (ms)':>11} {'duration (ms)':>14}"]
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1]["start_ms"]):
+            lines.append(f"{name:<22} {timing['start_ms']:>11.1f} {timing['duration_ms']:>14.1f}")
+        return "\n".join(lines)
+
+
+class PromptBuilder:
+    """Fuses retriever results incrementally and renders the final prompt"""
+
+    def __init__(self, question: str, chunk_texts: Dict[str, str], k: int = 4, max_context_chars: int = 6000):
+        self.question = question
+        self.chunk_texts = chunk_texts
+        self.k = k
+        self.max_context_chars = max_context_chars
+        self.sources: List[str] = []
+        self._scores: Dict[str, float] = {}
+        self._blocks: Dict[str, str] = {}
+
+    def add(self, retriever: str, results: List[Tuple[str, float]]) -> None:
+        self.sources.append(retriever)
+        for rank, (chunk_id, _) in enumerate(results):
+            self._scores[chunk_id] = self._scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            if chunk_id not in self._blocks:
+                # Formatting happens here, while slower retrievers are still running
+                text = " ".join(self.chunk_texts.get(chunk_id, "").split())
+                self._blocks[chunk_id] = f"[{chunk_id}]\n{text}"
+
+    @property
+    def has_results(self) -> bool:
+        return bool(self._scores)
+
+    def ranked_ids(self) -> List[str]:
+        return sorted(self._scores, key=self._scores.get, reverse=True)[:self.k]
+
+    def build(self) -> str:
+        blocks, size = [], 0
+        for chunk_id in self.ranked_ids():
+            block = self._blocks[chunk_id]
+            if size + len(block) > self.max_context_chars and blocks:
+                break
+            blocks.append(block)
+            size += len(block)
+        context = "\n\n".join(blocks) if blocks else "(no relevant context found)"
+        return PROMPT_TEMPLATE.format(context=context, question=self.question)
+
+
+def gemini_generator(model_name: str = "gemini-2.0-flash-exp") -> Callable[[str], AsyncIterator[str]]:
+    """Streaming Gemini generation as an async generator function"""
+    import google.generativeai as genai
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(model_name=model_name, generation_config={"temperature": 0.2})
+
+    async def generate(prompt: str) -> AsyncIterator[str]:
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+    return generate
+
+
+class RAGPipeline:
+    def __init__(
+        self,
+        store: Union[VectorStore, ShardedVectorStore],
+        broker: EmbeddingBroker,
+        lexical: Optional[BM25Index] = None,
+        generator: Optional[Callable[[str], AsyncIterator[str]]] = None,
+        k: int = 4,
+        deadline_ms: float = 300.0,
+        max_context_chars: int = 6000,
+        retrieval_timeout_ms: float = 2000.0,
+    ):
+        """Initialize the pipeline
+
+        Args:
+            store: Vector store (in-process or sharded) whose metadatas carry the chunk ``text``
+            broker: Embedding broker used for the query embedding
+            lexical: Optional BM25 index searched in parallel with the vector store
+            generator: Async generator function ``prompt -> tokens``; defaults to Gemini
+            k: Chunks placed in the prompt
+            deadline_ms: Time budget for late retrievers once the first one has returned
+            max_context_chars: Upper bound on the context size in the prompt
+            retrieval_timeout_ms: Upper bound on the retrieval stage from the start of the retrievers
+        """
+        self.store = store
+        self.broker = broker
+        self.lexical = lexical
+        self.generator = generator
+        self.k = k
+        self.deadline = deadline_ms / 1000.0
+        self.retrieval_timeout = retrieval_timeout_ms / 1000.0
+        self.max_context_chars = max_context_chars
+        self.chunk_texts = {
+            chunk_id: metadata.get("text", "") for chunk_id, metadata in zip(store.ids, store.metadatas)
+        }
+        self.last_timings: Optional[StageTimer] = None
+        self.last_prompt: Optional[str] = None
+
+    async def _vector_retriever(self, question: str, timer: StageTimer) -> List[Tuple[str, float]]:
+        with timer.stage("query_embedding"):
+            query = await self.broker.embed_query(question)
+        with timer.stage("vector_search"):
+            return await asyncio.to_thread(self.store.search, query, self.k * 2)
+
+    async def _lexical_retriever(self, question: str, timer: StageTimer) -> List[Tuple[str, float]]:
+        with timer.stage("lexical_search"):
+            return await asyncio.to_thread(self.lexical.search, question, self.k * 2)
+
+    async def build_prompt(self, question: str, timer: StageTimer) -> str:
+        """Run the retrievers concurrently and assemble the prompt as results arrive"""
+        loop = asyncio.get_running_loop()
+        retrievers = {"vector": self._vector_retriever(question, timer)}
+        if self.lexical is not None:
+            retrievers["lexical"] = self._lexical_retriever(question, timer)
+        tasks = {asyncio.create_task(coro): name for name, coro in retrievers.items()}
+
+        builder = PromptBuilder(question, self.chunk_texts, self.k, self.max_context_chars)
+        pending = set(tasks)
+        # Overall bound from launch; shortened to the late-retriever grace once results arrive
+        deadline = loop.time() + self.retrieval_timeout
+        grace_started = False
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    timer.mark(f"{tasks[task]}_failed")
+                    continue
+                with timer.stage("prompt_assembly"):
+                    builder.add(tasks[task], task.result())
+                if not grace_started and builder.has_results:
+                    grace_started = True
+                    deadline = min(deadline, loop.time() + self.deadline)
+
+        for task in pending:
+            timer.mark(f"{tasks[task]}_dropped")
+            task.cancel()
+
+        with timer.stage("prompt_assembly"):
+            return builder.build()
+
+    async def answer(self, question: str) -> AsyncIterator[str]:
+        """Stream the answer tokens; timings are in ``last_timings`` once the stream ends"""
+        timer = StageTimer()
+        self.last_timings = timer
+        if self.generator is None:
+            self.generator = gemini_generator()
+
+        with timer.stage("retrieval"):
+            prompt = await self.build_prompt(question, timer)
+        self.last_prompt = prompt
+
+        first = True
+        with timer.stage("generation"):
+            async for token in self.generator(prompt):
+                if first:
+                    timer.mark("first_token")
+                    first = False
+                yield token
+        timer.mark("done")
+
+
+class BackgroundLoop:
+    """An event loop on a daemon thread, for driving the pipeline from sync code such as Streamlit"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def iterate(self, agen: AsyncIterator[str]) -> Iterator[str]:
+        """Consume an async generator from a sync caller, item by item"""
+        while True:
+            try:
+                yield self.run(agen.__anext__())
+            except StopAsyncIteration:
+                return
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from embeddings import get_embedding_backend
+    from ingest import ingest, load_documents
+
+    documents = load_documents(args.data_dir)
+    if not documents:
+        print(f"No documents found in {args.data_dir}")
+        sys.exit(1)
+
+    broker = EmbeddingBroker(get_embedding_backend(args.provider))
+    store = None
+    try:
+        try:
+            store, chunks, _ = await ingest(documents, broker, mode=args.mode)
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+        if args.shards:
+            write_shards(store, args.index_dir, args.shards)
+            store = ShardedVectorStore(args.index_dir)
+        try:
+            generator = gemini_generator()
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+        pipeline = RAGPipeline(store, broker, BM25Index(chunks), generator, deadline_ms=args.deadline_ms,
+                               retrieval_timeout_ms=args.retrieval_timeout_ms)
+        print("\nAI: ", end="", flush=True)
+        async for token in pipeline.answer(args.question):
+            print(token, end="", flush=True)
+        print("\n\n=== Stage timings ===")
+        print(pipeline.last_timings.format())
+    finally:
+        await broker.close()
+        if isinstance(store, ShardedVectorStore):
+            store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask a question over the ingested documents")
+    parser.add_argument("data_dir")
+    parser.add_argument("question")
+    parser.add_argument("--provider", choices=["gemini", "openai", "local"], default=None)
+    parser.add_argument("--mode", choices=["float32", "int8", "pq"], default="float32")
+    parser.add_argument("--deadline-ms", type=float, default=300.0)
+    parser.add_argument("--retrieval-timeout-ms", type=float, default=2000.0)
+    parser.add_argument("--shards", type=int, default=0, help="Search the index as this many worker processes")
+    parser.add_argument("--index-dir", default=os.path.join("vector_store", "shards"))
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
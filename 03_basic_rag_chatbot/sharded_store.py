@@ -0,0 +1,342 @@
+"""Sharded vector search across worker processes (scatter-gather).
+
+The index is partitioned into shards by a hash of the chunk id, so a chunk
+always lands in the same shard as the corpus grows. Each shard is a segment
+directory written by ``VectorStore.save``. All shards share one trained
+quantizer, so their scores are comparable.
+
+``ShardedVectorStore`` starts one worker process per shard. A worker opens its
+segment memory-mapped and answers top-k queries on it. A query is sent to all
+workers at once, and the per-shard top-k lists, each already sorted, are merged
+with a heap. One query's scan is split over all shards, and the shards scan in
+parallel. Throughput therefore grows with the number of shards, up to the
+number of cores.
+
+A shard that has not answered by the deadline (``timeout_ms``) is left out.
+The query then returns the merged results of the other shards, and
+``search_detailed`` reports which shards were missing. Requests that have
+already expired when a busy worker gets to them are skipped, so a slow shard
+does not build up a backlog.
+
+Usage:
+    write_shards(store, "vector_store/shards", n_shards=4)
+    with ShardedVectorStore("vector_store/shards", timeout_ms=200) as sharded:
+        sharded.search(query_embedding, k=4)
+"""
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import VectorStore, normalize
+
+MANIFEST_FILE = "manifest.json"
+
+# Longest a query waits when it is asked to wait for every shard (timeout_ms=None)
+MAX_WAIT_MS = 30_000.0
+
+# Worker processes scan with one BLAS thread each: the shards are the parallelism
+WORKER_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def shard_of(chunk_id: str, n_shards: int) -> int:
+    """Stable shard of a chunk id, independent of insertion order"""
+    return zlib.crc32(chunk_id.encode("utf-8")) % n_shards
+
+
+def shard_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"shard-{shard:03d}")
+
+
+def write_shards(store: VectorStore, directory: str, n_shards: int) -> Dict:
+    """Partition ``store`` into ``n_shards`` segments under ``directory`` and return the manifest"""
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1")
+    shards = [store.empty_copy() for _ in range(n_shards)]
+    rows: List[List[int]] = [[] for _ in range(n_shards)]
+    for row, chunk_id in enumerate(store.ids):
+        rows[shard_of(chunk_id, n_shards)].append(row)
+    for shard, members in zip(shards, rows):
+        if members:
+            shard.ids = [store.ids[row] for row in members]
+            shard.metadatas = [store.metadatas[row] for row in members]
+            shard._codes = np.asarray(store._codes[members])
+            if store.keep_originals:
+                shard._originals = np.asarray(store._originals[members])
+    for index, shard in enumerate(shards):
+        shard.save(shard_path(directory, index))
+    manifest = {"shards": n_shards, "dim": store.dim, "mode": store.mode, "vectors": len(store),
+                "sizes": [len(members) for members in rows]}
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def _serve_shard(directory: str, shard: int, connection: Connection) -> None:
+    """Worker process: answer ``(request_id, query, k, rescore, rescore_factor, expires)`` on one segment"""
+    store = VectorStore.load(shard_path(directory, shard), mmap=True, with_metadata=False)
+    connection.send(("ready", shard, len(store)))
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        request_id, query, k, rescore, rescore_factor, expires = request
+        if time.time() > expires:
+            continue  # the caller has stopped waiting
+        start = time.perf_counter()
+        try:
+            results, error = store.search(query, k, rescore, rescore_factor), None
+        except Exception as e:
+            results, error = [], f"{type(e).__name__}: {e}"
+        connection.send((request_id, shard, results, (time.perf_counter() - start) * 1000, error))
+    connection.close()
+
+
+@contextmanager
+def _single_threaded_blas() -> Iterator[None]:
+    """Environment inherited by the worker processes started inside"""
+    saved = {name: os.environ.get(name) for name in WORKER_THREAD_VARIABLES}
+    os.environ.update({name: "1" for name in WORKER_THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@dataclass
+class ShardedResults:
+    results: List[Tuple[str, float]]
+    shards: int
+    answered: List[int] = field(default_factory=list)
+    missing: List[int] = field(default_factory=list)  # timed out, failed or not running
+    shard_ms: Dict[int, float] = field(default_factory=dict)  # search time inside each worker
+    errors: Dict[int, str] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.missing)
+
+
+class _PendingQuery:
+    def __init__(self, shards: List[int]):
+        self.replies: Dict[int, Tuple[List[Tuple[str, float]], float, Optional[str]]] = {}
+        self.shards = shards
+        self.complete = threading.Event()
+
+    def reply(self, shard: int, results: List[Tuple[str, float]], ms: float, error: Optional[str]) -> None:
+        self.replies[shard] = (results, ms, error)
+        if len(self.replies) == len(self.shards):
+            self.complete.set()
+
+
+class ShardedVectorStore:
+    def __init__(self, directory: str, timeout_ms: Optional[float] = 250.0, start_timeout: float = 60.0):
+        """Start one worker process per shard of the index in ``directory``
+
+        Args:
+            directory: Directory written by ``write_shards``
+            timeout_ms: Default time a query waits for the shards; None waits for all of them (up to ``MAX_WAIT_MS``)
+            start_timeout: Seconds to wait for the workers to open their segments
+        """
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.directory = directory
+        self.n_shards = self.manifest["shards"]
+        self.dim = self.manifest["dim"]
+        self.mode = self.manifest["mode"]
+        self.timeout_ms = timeout_ms
+        self.stats = {"queries": 0, "partial": 0, "shard_timeouts": 0, "shard_errors": 0}
+
+        # Ids and metadata (chunk texts) stay in this process, for prompt assembly
+        self.ids: List[str] = []
+        self.metadatas: List[Dict] = []
+        for shard in range(self.n_shards):
+            segment = VectorStore.load(shard_path(directory, shard), mmap=True)
+            self.ids.extend(segment.ids)
+            self.metadatas.extend(segment.metadatas)
+
+        self._pending: Dict[int, _PendingQuery] = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self.alive = [False] * self.n_shards
+        self._connections: List[Connection] = []
+        self._outboxes: List[queue.SimpleQueue] = []
+        self._processes: List[multiprocessing.Process] = []
+        context = multiprocessing.get_context("spawn")
+        with _single_threaded_blas():
+            for shard in range(self.n_shards):
+                parent, child = context.Pipe()
+                process = context.Process(target=_serve_shard, args=(directory, shard, child),
+                                          name=f"shard-{shard}", daemon=True)
+                process.start()
+                child.close()
+                self._connections.append(parent)
+                self._processes.append(process)
+        for shard, connection in enumerate(self._connections):
+            try:
+                if not connection.poll(start_timeout):
+                    raise RuntimeError(f"Shard {shard} did not start within {start_timeout} s")
+                connection.recv()
+            except EOFError:
+                self.close()
+                raise RuntimeError(f"Shard {shard} exited while opening {shard_path(directory, shard)}") from None
+            except RuntimeError:
+                self.close()
+                raise
+            self.alive[shard] = True
+
+        # Requests go out through one sender thread per shard, so a stalled worker never blocks a query
+        for shard in range(self.n_shards):
+            outbox: queue.SimpleQueue = queue.SimpleQueue()
+            self._outboxes.append(outbox)
+            threading.Thread(target=self._send_loop, args=(shard, outbox), daemon=True).start()
+        self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self._collector.start()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __enter__(self) -> "ShardedVectorStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def pids(self) -> List[int]:
+        return [process.pid for process in self._processes]
+
+    def _send_loop(self, shard: int, outbox: queue.SimpleQueue) -> None:
+        connection = self._connections[shard]
+        while True:
+            request = outbox.get()
+            try:
+                connection.send(request)
+            except (OSError, ValueError):
+                self._shard_failed(shard, "worker connection closed")
+                return
+            if request is None:
+                return
+
+    def _shard_failed(self, shard: int, error: str) -> None:
+        """Mark a shard dead and answer it with an error in every query still waiting for it"""
+        with self._lock:
+            self.alive[shard] = False
+            for pending in self._pending.values():
+                if shard in pending.shards and shard not in pending.replies:
+                    pending.reply(shard, [], 0.0, error)
+
+    def _collect_loop(self) -> None:
+        """Route the workers' replies to the waiting queries; late replies are dropped"""
+        connections = {connection: shard for shard, connection in enumerate(self._connections)}
+        while connections:
+            for connection in wait(list(connections)):
+                try:
+                    request_id, shard, results, ms, error = connection.recv()
+                except (EOFError, OSError):
+                    self._shard_failed(connections.pop(connection), "worker exited")
+                    continue
+                with self._lock:
+                    pending = self._pending.get(request_id)
+                    if pending is not None and shard not in pending.replies:
+                        pending.reply(shard, results, ms, error)
+
+    def search_detailed(
+        self,
+        query: np.ndarray,
+        k: int = 4,
+        rescore: bool = True,
+        rescore_factor: int = 4,
+        timeout_ms: Optional[float] = -1.0,
+    ) -> ShardedResults:
+        """Scatter the query to all live shards, gather until the deadline and merge the top-k
+
+        ``timeout_ms`` defaults to the store's; None waits for every live shard,
+        up to ``MAX_WAIT_MS``. A worker that exits counts as a failed shard.
+        """
+        if timeout_ms is not None and timeout_ms < 0:
+            timeout_ms = self.timeout_ms
+        start = time.perf_counter()
+        query = normalize(query)[0]
+        request_id = next(self._request_ids)
+        timeout = (MAX_WAIT_MS if timeout_ms is None else min(timeout_ms, MAX_WAIT_MS)) / 1000
+        # Workers skip requests that expire before they get to them
+        expires = time.time() + timeout
+        with self._lock:
+            # Registered together with the live set, so a worker exiting from now on answers this query
+            live = [shard for shard in range(self.n_shards) if self.alive[shard]]
+            pending = _PendingQuery(live)
+            self._pending[request_id] = pending
+        for shard in live:
+            self._outboxes[shard].put((request_id, query, k, rescore, rescore_factor, expires))
+        if live:
+            pending.complete.wait(timeout)
+        with self._lock:
+            del self._pending[request_id]
+            replies = dict(pending.replies)
+
+        answered = sorted(shard for shard, (_, _, error) in replies.items() if error is None)
+        errors = {shard: error for shard, (_, _, error) in replies.items() if error is not None}
+        # Each shard's list is sorted best first: a k-way heap merge needs only the first k items
+        merged = heapq.merge(*(replies[shard][0] for shard in answered), key=lambda item: item[1], reverse=True)
+        result = ShardedResults(
+            results=list(itertools.islice(merged, k)),
+            shards=self.n_shards,
+            answered=answered,
+            missing=[shard for shard in range(self.n_shards) if shard not in answered],
+            shard_ms={shard: round(replies[shard][1], 3) for shard in answered},
+            errors=errors,
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+        )
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["partial"] += result.partial
+            self.stats["shard_timeouts"] += len(live) - len(replies)
+            self.stats["shard_errors"] += len(errors)
+        return result
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 4,
+        rescore: bool = True,
+        rescore_factor: int = 4,
+    ) -> List[Tuple[str, float]]:
+        """Top-k (id, score) pairs over all shards that answer within the default timeout"""
+        return self.search_detailed(query, k, rescore, rescore_factor).results
+
+    def close(self) -> None:
+        """Stop the workers"""
+        for outbox in self._outboxes:
+            outbox.put(None)
+        if not self._outboxes:
+            for connection in self._connections:
+                try:
+                    connection.send(None)
+                except (OSError, ValueError):
+                    pass
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._outboxes = []
+        self.alive = [False] * self.n_shards
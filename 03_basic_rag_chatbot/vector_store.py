@@ -0,0 +1,402 @@
+"""In-memory vector store for the RAG chatbot with optional embedding quantization.
+
+Three storage modes are supported:
+
+- ``float32``: the raw (normalized) embeddings, exact cosine search
+- ``int8``: per-dimension scalar quantization, 4x smaller than float32
+- ``pq``: product quantization, one byte per sub-space (``dim / pq_subspaces`` bytes per vector)
+
+Search always runs on the stored codes. When the full-precision vectors are kept
+(in RAM or in a memory-mapped file on disk), the best candidates can be re-scored
+exactly before the final top-k is returned.
+
+``save`` writes a store to a directory (a segment) that ``load`` opens with the
+codes and originals memory-mapped, so several processes can serve it without
+copying it into RAM (see ``sharded_store.py``).
+"""
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MODES = ("float32", "int8", "pq")
+
+# Rows scored per block when decoding int8 codes, keeps the float32 scratch space bounded
+SEARCH_BLOCK_SIZE = 65536
+
+# Files of a saved segment
+SETTINGS_FILE = "store.json"
+CODES_FILE = "codes.npy"
+QUANTIZER_FILE = "quantizer.npz"
+ORIGINALS_FILE = "originals.f32"
+METADATA_FILE = "metadata.jsonl"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return L2-normalized float32 copies of the vectors so dot product == cosine"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means, used to train the product quantizer codebooks"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, the ||x||^2 term does not change the argmin
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * data @ centroids.T
+        assignment = distances.argmin(axis=1)
+        for c in range(n_clusters):
+            members = data[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # Re-seed empty clusters so every code is usable
+                centroids[c] = data[rng.integers(len(data))]
+    return centroids
+
+
+class VectorStore:
+    def __init__(
+        self,
+        dim: int,
+        mode: str = "float32",
+        pq_subspaces: int = 8,
+        keep_originals: bool = False,
+        originals_path: Optional[str] = None,
+    ):
+        """Initialize an empty store
+
+        Args:
+            dim: Embedding dimension
+            mode: One of "float32", "int8" or "pq"
+            pq_subspaces: Number of PQ sub-spaces, must divide ``dim`` (pq mode only)
+            keep_originals: Keep full-precision vectors for exact re-scoring
+            originals_path: Keep the full-precision vectors in a memory-mapped file
+                instead of RAM (implies ``keep_originals``)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode: {mode}. Choose one of {', '.join(MODES)}")
+        if mode == "pq" and dim % pq_subspaces != 0:
+            raise ValueError(f"pq_subspaces ({pq_subspaces}) must divide the embedding dimension ({dim})")
+
+        self.dim = dim
+        self.mode = mode
+        self.pq_subspaces = pq_subspaces
+        self.keep_originals = keep_originals or originals_path is not None
+        self.originals_path = originals_path
+
+        self.ids: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._codes: Optional[np.ndarray] = None
+        self._originals: Optional[np.ndarray] = None
+
+        # int8 quantizer parameters
+        self._offset: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        # pq codebooks, shape (pq_subspaces, 256, dim // pq_subspaces)
+        self._codebooks: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def is_trained(self) -> bool:
+        if self.mode == "int8":
+            return self._scale is not None
+        if self.mode == "pq":
+            return self._codebooks is not None
+        return True
+
+    def empty_copy(self) -> "VectorStore":
+        """A new empty store with the same settings and the same trained quantizer"""
+        store = VectorStore(self.dim, self.mode, self.pq_subspaces, self.keep_originals)
+        store._offset, store._scale, store._codebooks = self._offset, self._scale, self._codebooks
+        return store
+
+    def train(self, sample: np.ndarray) -> None:
+        """Fit the quantizer on a representative sample of embeddings"""
+        sample = normalize(sample)
+        if self.mode == "int8":
+            low = sample.min(axis=0)
+            high = sample.max(axis=0)
+            self._offset = low
+            self._scale = np.maximum(high - low, 1e-8) / 255.0
+        elif self.mode == "pq":
+            sub_dim = self.dim // self.pq_subspaces
+            self._codebooks = np.stack([
+                kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], 256, seed=j)
+                for j in range(self.pq_subspaces)
+            ])
+            if self._codebooks.shape[1] < 256:
+                # Small training sets give fewer centroids, pad so codes stay valid uint8 indices
+                pad = 256 - self._codebooks.shape[1]
+                self._codebooks = np.concatenate(
+                    [self._codebooks, np.repeat(self._codebooks[:, :1], pad, axis=1)], axis=1
+                )
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.mode == "float32":
+            return vectors
+        if self.mode == "int8":
+            codes = np.rint((vectors - self._offset) / self._scale) - 128
+            return np.clip(codes, -128, 127).astype(np.int8)
+
+        sub_dim = self.dim // self.pq_subspaces
+        codes = np.empty((len(vectors), self.pq_subspaces), dtype=np.uint8)
+        for j in range(self.pq_subspaces):
+            sub = vectors[:, j * sub_dim:(j + 1) * sub_dim]
+            centroids = self._codebooks[j]
+            distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * sub @ centroids.T
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def add(self, ids: List[str], embeddings: np.ndarray, metadatas: Optional[List[Dict]] = None) -> None:
+        """Add embeddings to the store, training the quantizer on the first batch if needed"""
+        vectors = normalize(embeddings)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got {vectors.shape[1]}")
+        if len(ids) != len(vectors):
+            raise ValueError("ids and embeddings must have the same length")
+        if len(vectors) == 0:
+            # Nothing to train the quantizer on or to encode
+            return
+        if not self.is_trained:
+            self.train(vectors)
+
+        codes = self._encode(vectors)
+        self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+        if self.keep_originals:
+            self._append_originals(vectors)
+
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas or [{} for _ in ids])
+
+    def _append_originals(self, vectors: np.ndarray) -> None:
+        if self.originals_path is None:
+            self._originals = vectors if self._originals is None else np.concatenate([self._originals, vectors])
+            return
+
+        # Grow the raw float32 file in place; only the pages touched while re-scoring are paged in
+        start = 0 if self._originals is None else len(self._originals)
+        rows = start + len(vectors)
+        with open(self.originals_path, "wb" if self._originals is None else "r+b") as f:
+            f.truncate(rows * self.dim * 4)
+        self._originals = np.memmap(self.originals_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        self._originals[start:] = vectors
+        self._originals.flush()
+
+    def save(self, directory: str) -> None:
+        """Write the store as a segment: codes, quantizer, raw float32 originals, ids and metadata"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, SETTINGS_FILE), "w") as f:
+            json.dump({"dim": self.dim, "mode": self.mode, "pq_subspaces": self.pq_subspaces,
+                       "keep_originals": self.keep_originals, "ids": self.ids}, f)
+        if self._codes is not None:
+            np.save(os.path.join(directory, CODES_FILE), self._codes)
+        quantizer = {name: value for name, value in
+                     (("offset", self._offset), ("scale", self._scale), ("codebooks", self._codebooks))
+                     if value is not None}
+        np.savez(os.path.join(directory, QUANTIZER_FILE), **quantizer)
+        if self.keep_originals:
+            originals = self._originals if self._originals is not None else np.zeros((0, self.dim), np.float32)
+            np.asarray(originals, dtype=np.float32).tofile(os.path.join(directory, ORIGINALS_FILE))
+        with open(os.path.join(directory, METADATA_FILE), "w") as f:
+            for metadata in self.metadatas:
+                f.write(json.dumps(metadata) + "\n")
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, with_metadata: bool = True) -> "VectorStore":
+        """Open a segment written by ``save``
+
+        Args:
+            directory: Segment directory
+            mmap: Memory-map the codes and originals read-only instead of reading them into RAM
+            with_metadata: Also load the metadatas (search only needs the ids)
+        """
+        with open(os.path.join(directory, SETTINGS_FILE)) as f:
+            settings = json.load(f)
+        store = cls(settings["dim"], settings["mode"], settings["pq_subspaces"], settings["keep_originals"])
+        store.ids = settings["ids"]
+        if store.ids:
+            store._codes = np.load(os.path.join(directory, CODES_FILE), mmap_mode="r" if mmap else None)
+        quantizer = np.load(os.path.join(directory, QUANTIZER_FILE))
+        store._offset = quantizer["offset"] if "offset" in quantizer else None
+        store._scale = quantizer["scale"] if "scale" in quantizer else None
+        store._codebooks = quantizer["codebooks"] if "codebooks" in quantizer else None
+        if store.keep_originals and store.ids:
+            path = os.path.join(directory, ORIGINALS_FILE)
+            if mmap:
+                store._originals = np.memmap(path, dtype=np.float32, mode="r", shape=(len(store.ids), store.dim))
+            else:
+                store._originals = np.fromfile(path, dtype=np.float32).reshape(len(store.ids), store.dim)
+        if with_metadata:
+            with open(os.path.join(directory, METADATA_FILE)) as f:
+                store.metadatas = [json.loads(line) for line in f]
+        else:
+            store.metadatas = [{} for _ in store.ids]
+        return store
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of the query against every stored code"""
+        if self.mode == "float32":
+            return self._codes @ query
+
+        if self.mode == "int8":
+            # x ~= offset + (code + 128) * scale, so q.x = q.offset + (q * scale).(code + 128)
+            weights = query * self._scale
+            bias = float(query @ self._offset) + 128.0 * float(weights.sum())
+            scores = np.empty(len(self._codes), dtype=np.float32)
+            for start in range(0, len(self._codes), SEARCH_BLOCK_SIZE):
+                block = self._codes[start:start + SEARCH_BLOCK_SIZE]
+                scores[start:start + len(block)] = block.astype(np.float32) @ weights + bias
+            return scores
+
+        # Asymmetric distance computation: one lookup table per sub-space, then sum of lookups
+        sub_dim = self.dim // self.pq_subspaces
+        tables = np.einsum("mkd,md->mk", self._codebooks, query.reshape(self.pq_subspaces, sub_dim))
+        scores = np.zeros(len(self._codes), dtype=np.float32)
+        for j in range(self.pq_subspaces):
+            scores += tables[j, self._codes[:, j]]
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 4,
+        rescore: bool = True,
+        rescore_factor: int = 4,
+    ) -> List[Tuple[str, float]]:
+        """Return the top-k (id, score) pairs for the query
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            rescore: Re-score the best ``k * rescore_factor`` candidates with the
+                full-precision vectors (only when originals are kept)
+            rescore_factor: Candidate multiplier for re-scoring
+        """
+        if not self.ids:
+            return []
+        query = normalize(query)[0]
+        scores = self._scores(query)
+
+        can_rescore = rescore and self.keep_originals and self.mode != "float32"
+        n_candidates = min(len(scores), k * rescore_factor if can_rescore else k)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+
+        if can_rescore:
+            candidates = np.sort(candidates)  # sequential reads on the memory-mapped file
+            scores = dict(zip(candidates, np.asarray(self._originals[candidates]) @ query))
+        else:
+            scores = dict(zip(candidates, scores[candidates]))
+
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+    def memory_footprint(self) -> Dict[str, float]:
+        """Report bytes held by the store, compared with a plain float32 index"""
+        code_bytes = 0 if self._codes is None else self._codes.nbytes
+        quantizer_bytes = sum(
+            a.nbytes for a in (self._offset, self._scale, self._codebooks) if a is not None
+        )
+        originals_bytes = 0 if self._originals is None else self._originals.nbytes
+        originals_in_ram = originals_bytes if self.originals_path is None else 0
+        float32_bytes = len(self) * self.dim * 4
+        total = code_bytes + quantizer_bytes + originals_in_ram
+        return {
+            "mode": self.mode,
+            "vectors": len(self),
+            "dim": self.dim,
+            "code_bytes": code_bytes,
+            "quantizer_bytes": quantizer_bytes,
+            "originals_in_ram_bytes": originals_in_ram,
+            "originals_on_disk_bytes": originals_bytes - originals_in_ram,
+            "total_ram_bytes": total,
+            "float32_bytes": float32_bytes,
+            "compression_ratio": round(float32_bytes / total, 2) if total else 0.0,
+        }
+
+    def recall_loss(self, queries: np.ndarray, k: int = 10, rescore: bool = True) -> Dict[str, float]:
+        """Compare search results with exact search on the full-precision vectors
+
+        Returns recall@k against the exact neighbours and the loss (1 - recall).
+        Requires the store to keep its originals.
+        """
+        if not self.keep_originals:
+            raise ValueError("recall_loss needs keep_originals=True to compute the exact neighbours")
+
+        queries = normalize(queries)
+        hits = 0
+        for query in queries:
+            exact = np.argsort(-(np.asarray(self._originals) @ query))[:k]
+            exact_ids = {self.ids[i] for i in exact}
+            found = {doc_id for doc_id, _ in self.search(query, k=k, rescore=rescore)}
+            hits += len(exact_ids & found)
+        recall = hits / (len(queries) * k)
+        return {"recall_at_k": round(recall, 4), "recall_loss": round(1.0 - recall, 4), "k": k}
+
+
+def compare_modes(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    pq_subspaces: int = 8,
+) -> List[Dict]:
+    """Build one store per mode (with and without re-scoring) and report footprint, recall and latency"""
+    ids = [str(i) for i in range(len(embeddings))]
+    report = []
+    for mode in MODES:
+        store = VectorStore(embeddings.shape[1], mode=mode, pq_subspaces=pq_subspaces, keep_originals=True)
+        store.add(ids, embeddings)
+        for rescore in ((False,) if mode == "float32" else (False, True)):
+            start = time.perf_counter()
+            quality = store.recall_loss(queries, k=k, rescore=rescore)
+            elapsed = time.perf_counter() - start
+
+            footprint = store.memory_footprint()
+            if not rescore:
+                # Without re-scoring the originals are not needed at serving time
+                footprint["total_ram_bytes"] -= footprint["originals_in_ram_bytes"]
+                footprint["originals_in_ram_bytes"] = 0
+                total = footprint["total_ram_bytes"]
+                footprint["compression_ratio"] = round(footprint["float32_bytes"] / total, 2) if total else 0.0
+
+            report.append({
+                **footprint,
+                **quality,
+                "rescore": rescore,
+                "ms_per_query": round(1000 * elapsed / len(queries), 3),
+            })
+    return report
+
+
+def main():
+    """Compare the storage modes on random embeddings"""
+    n_vectors = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dim = 256
+    rng = np.random.default_rng(42)
+    # Clustered data is closer to real embeddings than uniform noise
+    centers = rng.normal(size=(64, dim))
+    embeddings = centers[rng.integers(64, size=n_vectors)] + 0.3 * rng.normal(size=(n_vectors, dim))
+    queries = embeddings[rng.choice(n_vectors, 50, replace=False)] + 0.1 * rng.normal(size=(50, dim))
+
+    print(f"\n=== Vector store modes ({n_vectors} vectors, dim {dim}) ===")
+    print(f"{'mode':<8} {'rescore':<8} {'RAM (MB)':>10} {'ratio':>7} {'recall@10':>10} {'loss':>7} {'ms/query':>9}")
+    for row in compare_modes(embeddings, queries, k=10, pq_subspaces=32):
+        print(
+            f"{row['mode']:<8} {str(row['rescore']):<8} {row['total_ram_bytes'] / 1e6:>10.2f} "
+            f"{row['compression_ratio']:>7} {row['recall_at_k']:>10} {row['recall_loss']:>7} {row['ms_per_query']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Batch evaluation of calculator tools in one MCP round trip.
+
+``evaluate_elementwise`` applies one tool to arrays of operands with NumPy.
+``evaluate_calls`` runs a list of heterogeneous tool calls, grouping the
+element-wise ones by tool so they are vectorized too.
+
+Results match calling each tool individually. NumPy is used only where int64 /
+float64 give exactly the same answer as Python's unbounded ints and float
+operations; other elements (possible overflow, huge ints, negative square
+roots, negative exponents) fall back to the scalar kernel. A failing element
+(e.g. division by zero) is reported on its own instead of failing the batch.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
+
+import calculator
+
+# Every calculator tool, by MCP tool name
+SCALAR_TOOLS: Dict[str, Callable] = {
+    "add": calculator.add,
+    "subtract": calculator.subtract,
+    "multiply": calculator.multiply,
+    "divide": calculator.divide,
+    "power": calculator.power,
+    "square_root": calculator.square_root,
+    "absolute_value": calculator.absolute_value,
+    "factorial": calculator.factorial,
+    "fibonacci": calculator.fibonacci,
+    "fibonacci_sequence": calculator.fibonacci_sequence,
+}
+
+BINARY_TOOLS = ("add", "subtract", "multiply", "divide", "power")
+UNARY_TOOLS = ("square_root", "absolute_value")
+# Tools that go to the process pool when they appear in a batch
+HEAVY_TOOLS = ("power", "factorial", "fibonacci", "fibonacci_sequence")
+
+MAX_BATCH_SIZE = 100_000
+
+# Same coercion rules as the ``a: int`` parameters of the single tools
+INT_ARGUMENT = TypeAdapter(int)
+
+INT64_SAFE = 2 ** 62  # |x| below this cannot overflow in add/subtract
+FLOAT_EXACT = 2 ** 53  # ints up to this convert to float64 exactly
+
+
+def _error_message(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def _vector_mask(tool: str, a: np.ndarray, b: Optional[np.ndarray]) -> np.ndarray:
+    """Elements NumPy computes exactly like the scalar tool; the rest use the fallback"""
+    if tool in ("add", "subtract"):
+        return (np.abs(a) < INT64_SAFE) & (np.abs(b) < INT64_SAFE)
+    if tool == "multiply":
+        # |a * b| < 2**62 when both are below 2**31
+        return (np.abs(a) < 2 ** 31) & (np.abs(b) < 2 ** 31)
+    if tool == "divide":
+        # int / int is correctly rounded in Python; matches float64 division only when both convert exactly
+        return (np.abs(a) <= FLOAT_EXACT) & (np.abs(b) <= FLOAT_EXACT) & (b != 0)
+    if tool == "power":
+        # int ** non-negative int stays an int; keep the result well inside int64
+        with np.errstate(divide="ignore"):
+            bits = np.where(np.abs(a) > 1, b * np.log2(np.maximum(np.abs(a), 1)), 0)
+        return (b >= 0) & (bits < 62)
+    if tool == "square_root":
+        # Negative inputs give a complex number in Python
+        return (a >= 0) & (a <= FLOAT_EXACT)
+    if tool == "absolute_value":
+        return np.abs(a) < INT64_SAFE
+    raise ValueError(f"{tool} is not an element-wise tool")
+
+
+def _vectorized(tool: str, a: np.ndarray, b: Optional[np.ndarray]) -> np.ndarray:
+    if tool == "add":
+        return a + b
+    if tool == "subtract":
+        return a - b
+    if tool == "multiply":
+        return a * b
+    if tool == "divide":
+        return a.astype(np.float64) / b.astype(np.float64)
+    if tool == "power":
+        return np.power(a, b)
+    if tool == "square_root":
+        # np.power, not np.sqrt: Python's ** 0.5 calls C pow(), so results match bit for bit
+        return np.power(a.astype(np.float64), 0.5)
+    return np.abs(a)
+
+
+def evaluate_elementwise(tool: str, a: List[int], b: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Apply ``tool`` to each element (pair) of the operand lists
+
+    Returns ``{"results": [...], "errors": {index: message}}``; failed elements
+    are ``None`` in ``results``.
+    """
+    if tool not in BINARY_TOOLS + UNARY_TOOLS:
+        raise ValueError(f"Unknown element-wise tool: {tool}. Use one of {', '.join(BINARY_TOOLS + UNARY_TOOLS)}")
+    if tool in BINARY_TOOLS and (b is None or len(a) != len(b)):
+        raise ValueError(f"{tool} needs two operand lists of the same length")
+    if len(a) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch is too large (maximum is {MAX_BATCH_SIZE} elements)")
+
+    results: List[Any] = [None] * len(a)
+    errors: Dict[int, str] = {}
+    if not a:
+        return {"results": results, "errors": errors}
+
+    # Python ints beyond int64 cannot go into an int64 array at all
+    small = all(abs(x) < 2 ** 63 for x in a) and (b is None or all(abs(x) < 2 ** 63 for x in b))
+    if small:
+        a_arr = np.asarray(a, dtype=np.int64)
+        b_arr = None if b is None else np.asarray(b, dtype=np.int64)
+        mask = _vector_mask(tool, a_arr, b_arr)
+        index = np.flatnonzero(mask)
+        if len(index):
+            values = _vectorized(tool, a_arr[index], None if b_arr is None else b_arr[index]).tolist()
+            for i, value in zip(index.tolist(), values):
+                results[i] = value
+        fallback = np.flatnonzero(~mask).tolist()
+    else:
+        fallback = range(len(a))
+
+    kernel = SCALAR_TOOLS[tool]
+    for i in fallback:
+        try:
+            results[i] = kernel(a[i]) if b is None else kernel(a[i], b[i])
+        except Exception as e:
+            errors[i] = _error_message(e)
+    return {"results": results, "errors": errors}
+
+
+def evaluate_calls(calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run heterogeneous calls ``[{"tool": "add", "arguments": {"a": 1, "b": 2}}, ...]``
+
+    Returns one ``{"result": ...}`` or ``{"error": "..."}`` per call, in order.
+    """
+    if len(calls) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch is too large (maximum is {MAX_BATCH_SIZE} calls)")
+
+    outputs: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+    groups: Dict[str, List[Tuple[int, Dict[str, int]]]] = {}
+    for i, call in enumerate(calls):
+        tool = call.get("tool")
+        if tool not in SCALAR_TOOLS:
+            outputs[i] = {"error": f"Unknown tool: {tool}"}
+            continue
+        try:
+            arguments = _validate_arguments(tool, call.get("arguments") or {})
+        except (ValueError, ValidationError) as e:
+            outputs[i] = {"error": _error_message(e)}
+            continue
+
+        if tool in BINARY_TOOLS + UNARY_TOOLS:
+            groups.setdefault(tool, []).append((i, arguments))
+        else:
+            try:
+                outputs[i] = {"result": SCALAR_TOOLS[tool](*arguments.values())}
+            except Exception as e:
+                outputs[i] = {"error": _error_message(e)}
+
+    for tool, members in groups.items():
+        a = [arguments["a"] for _, arguments in members]
+        b = [arguments["b"] for _, arguments in members] if tool in BINARY_TOOLS else None
+        evaluated = evaluate_elementwise(tool, a, b)
+        for position, (i, _) in enumerate(members):
+            if position in evaluated["errors"]:
+                outputs[i] = {"error": evaluated["errors"][position]}
+            else:
+                outputs[i] = {"result": evaluated["results"][position]}
+    return outputs
+
+
+def _validate_arguments(tool: str, arguments: Dict[str, Any]) -> Dict[str, int]:
+    """Validate arguments the way FastMCP does for the single tools (``a: int``, ``b: int``)"""
+    names = ("a", "b") if tool in BINARY_TOOLS else ("a",)
+    missing = [name for name in names if name not in arguments]
+    if missing:
+        raise ValueError(f"Missing argument(s) for {tool}: {', '.join(missing)}")
+    return {name: INT_ARGUMENT.validate_python(arguments[name]) for name in names}
+
+
+def is_heavy(calls: List[Dict[str, Any]]) -> bool:
+    return any(call.get("tool") in HEAVY_TOOLS for call in calls)
@@ -0,0 +1,95 @@
+"""Batch endpoint benchmark: one MCP round trip per call vs one per batch.
+
+Starts mcp_server.py (SSE on port 8050), then evaluates the same operations
+three ways and checks that all of them return identical results:
+
+- ``call_tool("add", ...)`` once per operation
+- ``batch_calculate`` with the operands as two lists
+- ``batch_call`` with a mixed list of calls
+
+Usage:
+    python bench_batch.py --size 1000
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from bench_utils import running_server
+
+SERVER_URL = "http://localhost:8050/sse"
+
+
+def same(x: Any, y: Any) -> bool:
+    if isinstance(x, float) and isinstance(y, float) and math.isnan(x) and math.isnan(y):
+        return True
+    return x == y and type(x) is type(y)
+
+
+def report(name: str, operations: int, seconds: float) -> None:
+    print(f"{name:<34} {operations:>7} ops {seconds * 1000:10.1f} ms {operations / seconds:12.0f} ops/s")
+
+
+async def individual(session: ClientSession, calls: List[Dict[str, Any]]) -> List[Any]:
+    results = []
+    for call in calls:
+        result = await session.call_tool(call["tool"], arguments=call["arguments"])
+        results.append(None if result.isError else json.loads(result.content[0].text))
+    return results
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(0)
+    a = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(args.size)]
+    b = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(args.size)]
+    tools = ("add", "subtract", "multiply", "divide", "square_root", "absolute_value")
+    mixed = []
+    for x, y in zip(a, b):
+        tool = rng.choice(tools)
+        arguments = {"a": x} if tool in ("square_root", "absolute_value") else {"a": x, "b": y}
+        mixed.append({"tool": tool, "arguments": arguments})
+
+    async with sse_client(SERVER_URL) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+
+            start = time.perf_counter()
+            single_add = await individual(session, [{"tool": "add", "arguments": {"a": x, "b": y}} for x, y in zip(a, b)])
+            report("add, one call per operation", args.size, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            result = await session.call_tool("batch_calculate", arguments={"tool": "add", "a": a, "b": b})
+            batch_add = json.loads(result.content[0].text)["results"]
+            report("batch_calculate(add)", args.size, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            single_mixed = await individual(session, mixed)
+            report("mixed, one call per operation", args.size, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            result = await session.call_tool("batch_call", arguments={"calls": mixed})
+            batch_mixed = [output.get("result") for output in json.loads(result.content[0].text)]
+            report("batch_call(mixed)", args.size, time.perf_counter() - start)
+
+    mismatches = sum(not same(x, y) for x, y in zip(single_add, batch_add))
+    mismatches += sum(not same(x, y) for x, y in zip(single_mixed, batch_mixed))
+    print(f"\nResults differing from the single tools: {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call vs batched tool calls")
+    parser.add_argument("--size", type=int, default=1000, help="Operations per measurement")
+    args = parser.parse_args()
+
+    with running_server():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Client benchmark: connect per call vs the pooled client.
+
+Starts mcp_server.py (SSE on port 8050) and makes the same ``add`` calls
+three ways:
+
+- the pattern of the original mcp_client.py: open ``sse_client`` +
+  ``ClientSession``, ``initialize()``, ``list_tools()``, one ``call_tool``
+- ``MCPClientPool``, one call at a time
+- ``MCPClientPool.call_many``, all calls concurrently (bounded by the pool)
+
+Usage:
+    python bench_client_pool.py --calls 200 --sessions 4
+"""
+import argparse
+import asyncio
+import time
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from bench_utils import running_server
+from client_pool import MCPClientPool
+
+SERVER_URL = "http://localhost:8050/sse"
+
+
+def report(name: str, calls: int, seconds: float) -> None:
+    print(f"{name:<36} {calls:>6} calls {seconds:8.2f} s {calls / seconds:10.1f} calls/s")
+
+
+async def connect_per_call(calls: int) -> None:
+    for i in range(calls):
+        async with sse_client(SERVER_URL) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                await session.list_tools()
+                await session.call_tool("add", arguments={"a": i, "b": 1})
+
+
+async def run(args: argparse.Namespace) -> None:
+    # The slow pattern gets fewer calls so the benchmark stays short
+    slow_calls = max(1, args.calls // 4)
+    start = time.perf_counter()
+    await connect_per_call(slow_calls)
+    report("connect per call", slow_calls, time.perf_counter() - start)
+
+    async with MCPClientPool(SERVER_URL, size=args.sessions, max_concurrency=args.concurrency) as pool:
+        await pool.list_tools()
+
+        start = time.perf_counter()
+        for i in range(args.calls):
+            await pool.call_tool("add", {"a": i, "b": 1})
+        report("pool, sequential", args.calls, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = await pool.call_many([("add", {"a": i, "b": 1}) for i in range(args.calls)])
+        report(f"pool, concurrent (limit {args.concurrency})", args.calls, time.perf_counter() - start)
+
+        wrong = sum(result.content[0].text != str(i + 1) for i, result in enumerate(results))
+        print(f"\nWrong results: {wrong}   pool stats: {pool.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connect-per-call vs pooled MCP client")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=4, help="Sessions kept open by the pool")
+    parser.add_argument("--concurrency", type=int, default=32, help="Most calls in flight")
+    args = parser.parse_args()
+
+    with running_server():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Concurrent-client check: cheap tools must stay fast while heavy tools run.
+
+Starts mcp_server.py (SSE on port 8050), measures the latency of a cheap tool
+(``add``) on its own, then again while several other clients keep calling a
+heavy tool (``factorial``) that runs in the server's process pool. Finally one
+call runs past the pool's deadline (``HEAVY_TOOL_TIMEOUT``).
+
+Every call uses operands no earlier call has used, so the server's result
+cache (``memo.py``) never answers in place of the pool.
+
+The check fails (exit code 1) when the loaded ``add`` p99 exceeds
+``--max-p99-ratio`` times the idle p99, or when the over-deadline call does
+not come back as an error with its worker killed.
+
+Usage:
+    python bench_concurrency.py --heavy-clients 4 --calls 200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterator, List
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from bench_utils import percentile, running_server
+
+SERVER_URL = "http://localhost:8050/sse"
+
+# factorial(a) for this many distinct a in one evaluate call: tens of seconds of work, far past the deadline
+OVERRUN_BINDINGS = 2000
+
+
+async def cheap_client(calls: int, offset: int) -> List[float]:
+    latencies = []
+    async with sse_client(SERVER_URL) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            for i in range(calls):
+                start = time.perf_counter()
+                await session.call_tool("add", arguments={"a": offset + i, "b": 1})
+                latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def heavy_client(operands: Iterator[int], stop: asyncio.Event, done: List[float]) -> None:
+    async with sse_client(SERVER_URL) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            while not stop.is_set():
+                start = time.perf_counter()
+                result = await session.call_tool("factorial", arguments={"a": next(operands)})
+                if not result.isError:
+                    done.append((time.perf_counter() - start) * 1000)
+
+
+async def pool_stats(session: ClientSession) -> Dict[str, Any]:
+    resource = await session.read_resource("stats://heavy-pool")
+    return json.loads(resource.contents[0].text)
+
+
+async def overrun_call(n: int) -> bool:
+    """Run one call past the pool deadline; True when it fails in time and its worker is killed"""
+    bindings = [{"a": n - i} for i in range(OVERRUN_BINDINGS)]
+    async with sse_client(SERVER_URL) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            before = await pool_stats(session)
+            start = time.perf_counter()
+            result = await session.call_tool("evaluate", arguments={"expression": "factorial(a)", "bindings": bindings})
+            elapsed = time.perf_counter() - start
+            after = await pool_stats(session)
+
+    killed = after["workers_killed"] - before["workers_killed"]
+    timed_out = after["timeouts"] - before["timeouts"]
+    print(f"{'over-deadline evaluate':<28} {elapsed * 1000:8.0f} ms  error={result.isError}  "
+          f"timeouts +{timed_out}  workers killed +{killed}  (deadline {after['timeout']:.1f} s)")
+    return result.isError and timed_out == 1 and killed == 1 and elapsed < after["timeout"] + 1.0
+
+
+def summarize(name: str, latencies: List[float]) -> None:
+    p50, p99 = statistics.median(latencies), percentile(latencies, 99)
+    print(f"{name:<28} n={len(latencies):<5} p50={p50:8.2f} ms  p99={p99:8.2f} ms")
+
+
+async def run(args: argparse.Namespace) -> bool:
+    idle = await cheap_client(args.calls, offset=0)
+    summarize("add (idle server)", idle)
+
+    # Counting down: factorial refuses n above its maximum, and each call gets a new n
+    operands = (args.n - i % (args.n // 2) for i in itertools.count())
+    stop = asyncio.Event()
+    heavy_latencies: List[float] = []
+    heavy = [asyncio.create_task(heavy_client(operands, stop, heavy_latencies)) for _ in range(args.heavy_clients)]
+    await asyncio.sleep(1.0)  # let the workers start and the heavy load settle
+    loaded = await cheap_client(args.calls, offset=args.calls)
+    stop.set()
+    await asyncio.gather(*heavy)
+
+    summarize(f"add ({args.heavy_clients} heavy clients)", loaded)
+    summarize(f"factorial(<= {args.n})", heavy_latencies)
+
+    bound = percentile(idle, 99) * args.max_p99_ratio
+    fast = percentile(loaded, 99) <= bound
+    print(f"\nadd p99 under load {percentile(loaded, 99):.2f} ms, bound {bound:.2f} ms "
+          f"({args.max_p99_ratio:g}x idle): {'ok' if fast else 'FAILED'}")
+    killed = await overrun_call(args.n)
+    print(f"over-deadline call failed and its worker was killed: {'ok' if killed else 'FAILED'}")
+    return fast and killed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cheap-tool latency under heavy-tool load")
+    parser.add_argument("--heavy-clients", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=200, help="Cheap calls per measurement")
+    parser.add_argument("--n", type=int, default=50_000, help="Largest factorial argument for the heavy clients")
+    parser.add_argument("--max-p99-ratio", type=float, default=5.0,
+                        help="Fail when the loaded add p99 exceeds this multiple of the idle p99")
+    args = parser.parse_args()
+
+    with running_server():
+        passed = asyncio.run(run(args))
+    if not passed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Micro-benchmark of the calculator kernels for growing n.
+
+Compares the previous recursive implementations (only while they finish in
+reasonable time) with the kernels in calculator.py, including the cost of
+serializing the result the way FastMCP does.
+
+Usage:
+    python bench_numeric.py
+"""
+import sys
+import time
+from typing import Callable
+
+import pydantic_core
+
+import calculator
+
+
+def naive_fibonacci(a: int) -> int:
+    if a < 2:
+        return a
+    return naive_fibonacci(a - 1) + naive_fibonacci(a - 2)
+
+
+def naive_factorial(a: int) -> int:
+    return 1 if a == 0 else a * naive_factorial(a - 1)
+
+
+def best_time(fn: Callable, *args, repeat: int = 3) -> float:
+    """Best wall time in milliseconds over ``repeat`` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def serialized(fn: Callable) -> Callable:
+    return lambda *args: pydantic_core.to_json(fn(*args))
+
+
+def row(name: str, n: int, old: str, new: float, with_json: float) -> None:
+    print(f"{name:<20} {n:>10} {old:>14} {new:>12.3f} {with_json:>14.3f}")
+
+
+def main():
+    print(f"{'kernel':<20} {'n':>10} {'old (ms)':>14} {'new (ms)':>12} {'new+json (ms)':>14}")
+
+    for n in (10, 20, 25, 30, 1_000, 100_000, 1_000_000):
+        old = f"{best_time(naive_fibonacci, n, repeat=1):.3f}" if n <= 30 else "-"
+        row("fibonacci", n, old, best_time(calculator.fibonacci, n), best_time(serialized(calculator.fibonacci), n))
+
+    sys.setrecursionlimit(10_000)
+    for n in (100, 900, 5_000, 20_000, 50_000):
+        old = f"{best_time(naive_factorial, n):.3f}" if n <= 5_000 else "-"
+        row("factorial", n, old, best_time(calculator.factorial, n), best_time(serialized(calculator.factorial), n))
+
+    for n in (100, 1_000, 9_999):
+        new = best_time(calculator.fibonacci_sequence, n)
+        row("fibonacci_sequence", n, "-", new, best_time(serialized(calculator.fibonacci_sequence), n))
+
+    # 3 ** 600_000 is ~951k bits, just under MAX_RESULT_BITS
+    for b in (1_000, 100_000, 600_000):
+        new = best_time(calculator.power, 3, b)
+        row("power(3, b)", b, "-", new, best_time(serialized(calculator.power), 3, b))
+
+
+if __name__ == "__main__":
+    main()
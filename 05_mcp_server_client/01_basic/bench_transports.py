@@ -0,0 +1,99 @@
+"""Transport benchmark: the same tool calls over stdio, SSE and streamable HTTP.
+
+For each transport the server is started with ``--transport``, one client
+session is opened, and ``--calls`` ``add`` calls are made by 1, 4, 16, ...
+concurrent callers sharing that session. Reports session setup time, per-call
+latency percentiles and throughput. Operands keep counting up across the
+warm-up and all levels, so no call is answered from the server's result cache.
+
+stdio suits agents running on the same machine (no network stack, one client
+per server process); the HTTP transports are for remote or shared servers.
+
+Usage:
+    python bench_transports.py --calls 500 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Iterator, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from bench_utils import HERE, SERVER_SCRIPT, percentile, running_server
+
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+URLS = {"sse": "http://localhost:8050/sse", "streamable-http": "http://localhost:8050/mcp"}
+
+
+@asynccontextmanager
+async def open_session(transport: str) -> AsyncIterator[ClientSession]:
+    if transport == "stdio":
+        server = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT, "--transport", "stdio"], cwd=HERE)
+        with open(os.devnull, "w") as errlog:
+            async with stdio_client(server, errlog=errlog) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    yield session
+    else:
+        client = sse_client(URLS[transport]) if transport == "sse" else streamablehttp_client(URLS[transport])
+        async with client as streams:
+            async with ClientSession(streams[0], streams[1]) as session:
+                await session.initialize()
+                yield session
+
+
+async def measure(session: ClientSession, calls: int, concurrency: int, operands: Iterator[int]) -> List[float]:
+    latencies: List[float] = []
+    counter = itertools.islice(operands, calls)
+
+    async def caller():
+        for i in counter:
+            start = time.perf_counter()
+            await session.call_tool("add", arguments={"a": i, "b": 1})
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return latencies
+
+
+async def run_transport(transport: str, args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    async with open_session(transport) as session:
+        setup = (time.perf_counter() - start) * 1000
+        print(f"\n{transport}: session setup {setup:.1f} ms")
+        # One running count per server (each transport starts a fresh one): every call is a cache miss
+        operands = itertools.count()
+        await measure(session, 20, 1, operands)  # warm up
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            latencies = await measure(session, args.calls, concurrency, operands)
+            elapsed = time.perf_counter() - start
+            print(f"  concurrency {concurrency:>4}: p50={statistics.median(latencies):7.2f} ms "
+                  f"p95={percentile(latencies, 95):7.2f} ms p99={percentile(latencies, 99):7.2f} ms "
+                  f"{args.calls / elapsed:9.1f} calls/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool-call latency and throughput per MCP transport")
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--calls", type=int, default=500, help="Calls per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    for transport in args.transports:
+        # stdio starts its own server process through the client
+        server = nullcontext() if transport == "stdio" else running_server(["--transport", transport])
+        with server:
+            asyncio.run(run_transport(transport, args))
+
+
+if __name__ == "__main__":
+    main()
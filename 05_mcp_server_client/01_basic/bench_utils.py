@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmark scripts: start mcp_server.py and wait for it."""
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPT = os.path.join(HERE, "mcp_server.py")
+
+
+def wait_for_port(host: str, port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on {host}:{port}")
+
+
+@contextmanager
+def running_server(args: Optional[List[str]] = None, port: int = 8050) -> Iterator[subprocess.Popen]:
+    """Run mcp_server.py in a subprocess for the duration of the block"""
+    server = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, *(args or [])],
+        cwd=HERE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port("127.0.0.1", port)
+        yield server
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
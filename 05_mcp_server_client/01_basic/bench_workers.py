@@ -0,0 +1,68 @@
+"""Scaling benchmark: throughput of a CPU-bound tool mix for 1, 2, 4... workers.
+
+For each worker count, starts ``mcp_server.py --workers N`` (gateway plus N
+worker processes on one port) and runs a closed loop of ``--clients-per-worker``
+sessions per worker for ``--duration`` seconds. The mix is ``evaluate`` over a
+batch of random bindings, which runs inline on the worker's event loop, so a
+single process is limited to one core. Reports calls/s and the speedup over
+one worker (a single worker runs without the gateway). Expect close to linear
+scaling up to the number of cores.
+
+Usage:
+    python bench_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import List
+
+from bench_utils import running_server
+from client_pool import MCPClientPool
+
+URLS = {"sse": "http://localhost:8050/sse", "streamable-http": "http://localhost:8050/mcp"}
+
+
+async def client(pool: MCPClientPool, seed: int, bindings: int, deadline: float, done: List[int]) -> None:
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        # Fresh random values every call, so the shared result cache never answers
+        values = [{"a": rng.random(), "b": rng.random(), "c": rng.random()} for _ in range(bindings)]
+        result = await pool.call_tool("evaluate", {"expression": "(a + b) * c / (a + 1) - sqrt(b) * abs(c - a)",
+                                                   "bindings": values})
+        if not result.isError:
+            done[0] += 1
+
+
+async def run(workers: int, args: argparse.Namespace) -> float:
+    clients = workers * args.clients_per_worker
+    async with MCPClientPool(URLS[args.transport], size=clients, max_concurrency=clients,
+                             transport=args.transport) as pool:
+        done = [0]
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(client(pool, i, args.bindings, deadline, done) for i in range(clients)))
+        return done[0] / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput scaling with worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients-per-worker", type=int, default=4)
+    parser.add_argument("--bindings", type=int, default=500, help="Bindings per evaluate call")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--transport", choices=list(URLS), default="sse")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    baseline = None
+    for workers in args.workers:
+        with running_server(["--workers", str(workers), "--transport", args.transport]):
+            throughput = asyncio.run(run(workers, args))
+        baseline = baseline or throughput
+        print(f"{workers:>3} workers: {throughput:8.1f} calls/s  speedup {throughput / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
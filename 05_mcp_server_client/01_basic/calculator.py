@@ -0,0 +1,107 @@
+"""Numeric kernels behind the calculator MCP tools.
+
+Kept free of any MCP imports so they can be benchmarked and reused without a
+running server.
+
+Input-size guards keep a single request from pinning a core: every kernel
+rejects inputs whose result would be larger than the limits below. Results are
+sent back as decimal text, and that conversion is quadratic in the number of
+digits, so the limits keep results to a few hundred thousand digits.
+"""
+import math
+from typing import List, Tuple
+
+# fibonacci(1_000_000) has ~209k digits and takes ~50 ms with fast doubling
+MAX_FIBONACCI_N = 1_000_000
+# Each element is returned, so the sequence is kept much shorter
+MAX_SEQUENCE_LENGTH = 10_000
+# factorial(50_000) has ~213k digits
+MAX_FACTORIAL_N = 50_000
+# Upper bound on the size of a power() result, ~301k digits
+MAX_RESULT_BITS = 1_000_000
+
+
+def add(a: float, b: float) -> float:
+    return a + b
+
+
+def subtract(a: float, b: float) -> float:
+    return a - b
+
+
+def multiply(a: float, b: float) -> float:
+    return a * b
+
+
+def divide(a: float, b: float) -> float:
+    return a / b
+
+
+def square_root(a: float) -> float:
+    return a ** 0.5
+
+
+def absolute_value(a: float) -> float:
+    return abs(a)
+
+
+def fibonacci_pair(n: int) -> Tuple[int, int]:
+    """Return (F(n), F(n+1)) using fast doubling, O(log n) big-int multiplications
+
+    F(2k)   = F(k) * (2 * F(k+1) - F(k))
+    F(2k+1) = F(k)^2 + F(k+1)^2
+    """
+    a, b = 0, 1  # F(0), F(1)
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if bit == "1":
+            a, b = d, c + d
+        else:
+            a, b = c, d
+    return a, b
+
+
+def fibonacci(n: int) -> int:
+    """Return the n-th Fibonacci number, F(0) = 0, F(1) = 1"""
+    if n < 0:
+        raise ValueError("Fibonacci is not defined for negative numbers")
+    if n > MAX_FIBONACCI_N:
+        raise ValueError(f"n is too large (maximum is {MAX_FIBONACCI_N})")
+    return fibonacci_pair(n)[0]
+
+
+def fibonacci_sequence(n: int) -> List[int]:
+    """Return the Fibonacci numbers F(0) .. F(n)"""
+    if n < 0:
+        raise ValueError("Fibonacci is not defined for negative numbers")
+    if n >= MAX_SEQUENCE_LENGTH:
+        raise ValueError(f"n is too large (maximum is {MAX_SEQUENCE_LENGTH - 1})")
+    sequence = [0]
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+        sequence.append(a)
+    return sequence
+
+
+def factorial(n: int) -> int:
+    """Return n!
+
+    ``math.factorial`` is CPython's C implementation of the binary-splitting
+    algorithm (products of odd numbers over balanced ranges, then a shift for the
+    powers of two), which beats a pure-Python product tree by a wide margin.
+    """
+    if n < 0:
+        raise ValueError("Factorial is not defined for negative numbers")
+    if n > MAX_FACTORIAL_N:
+        raise ValueError(f"n is too large (maximum is {MAX_FACTORIAL_N})")
+    return math.factorial(n)
+
+
+def power(a: float, b: float) -> float:
+    """Return a ** b, refusing integer results larger than MAX_RESULT_BITS"""
+    if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+        if b * math.log2(abs(a)) > MAX_RESULT_BITS:
+            raise ValueError(f"Result is too large (more than {MAX_RESULT_BITS} bits)")
+    return a ** b
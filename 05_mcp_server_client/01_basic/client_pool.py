@@ -0,0 +1,230 @@
+"""Persistent, pooled MCP client.
+
+Opening an ``sse_client`` + ``ClientSession`` and running ``initialize()`` and
+``list_tools()`` costs several round trips; doing it for every tool call
+dominates short calls. ``MCPClientPool`` keeps a few sessions open and shares
+them:
+
+- ``size`` long-lived sessions, each call goes to the least busy one
+- at most ``max_concurrency`` calls in flight across the pool
+- tool schemas are fetched once and cached until the server sends
+  ``notifications/tools/list_changed``
+- a session whose connection drops is reopened on next use (with a short
+  backoff); calls that were waiting on it fail with ``ConnectionError`` and
+  are retried on a healthy session up to ``retries`` times. A retried call may
+  already have run on the server, so keep retries for idempotent tools.
+
+Example:
+    async with MCPClientPool("http://localhost:8050/sse", size=4) as pool:
+        tools = await pool.list_tools()
+        results = await pool.call_many([("add", {"a": 1, "b": 2}), ("factorial", {"a": 20})])
+"""
+import asyncio
+import itertools
+import time
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mcp import ClientSession, types
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+TRANSPORTS = ("sse", "streamable-http")
+
+
+class _Connection:
+    """One ClientSession, owned by a background task
+
+    The transport and session context managers use anyio cancel scopes, which
+    must be entered and exited by the same task, so a dedicated task opens
+    them and keeps them open until the connection is lost or closed.
+    """
+
+    def __init__(self, pool: "MCPClientPool"):
+        self.pool = pool
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.connects = 0
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        # Set when the connection fails or is closed; releases _run and the waiting calls
+        self._lost = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._retry_at = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self._lost.is_set()
+
+    def _transport(self):
+        if self.pool.transport == "sse":
+            return sse_client(self.pool.url)
+        return streamablehttp_client(self.pool.url)
+
+    async def _message_handler(self, message) -> None:
+        if isinstance(message, Exception):
+            # The transport reports a broken connection as an exception on the read stream
+            self._lost.set()
+        elif isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.pool.invalidate_tools()
+
+    async def _run(self, delay: float) -> None:
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self._transport() as streams:
+                read_stream, write_stream = streams[0], streams[1]
+                async with ClientSession(read_stream, write_stream, message_handler=self._message_handler) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.connects += 1
+                    self._ready.set()
+                    await self._lost.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._lost.set()
+            self._ready.set()
+
+    async def ensure_open(self) -> ClientSession:
+        if self.alive:
+            return self.session
+        if self._task is None or self._task.done():
+            self._ready, self._lost, self._error = asyncio.Event(), asyncio.Event(), None
+            self._task = asyncio.create_task(self._run(self._retry_at - time.monotonic()))
+        await self._ready.wait()
+        if not self.alive:
+            self._retry_at = time.monotonic() + self.pool.reconnect_backoff
+            raise ConnectionError(f"Could not connect to {self.pool.url}: {self._error!r}")
+        return self.session
+
+    def _request(self, session: ClientSession, name: str, arguments: Dict[str, Any], traceparent: Optional[str]):
+        if traceparent is None:
+            return session.call_tool(name, arguments, read_timeout_seconds=self.pool.call_timeout)
+        # ClientSession.call_tool has no way to set _meta, so build the request directly
+        params = types.CallToolRequestParams(name=name, arguments=arguments, _meta={"traceparent": traceparent})
+        request = types.ClientRequest(types.CallToolRequest(method="tools/call", params=params))
+        return session.send_request(request, types.CallToolResult, request_read_timeout_seconds=self.pool.call_timeout)
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any], traceparent: Optional[str] = None) -> types.CallToolResult:
+        session = await self.ensure_open()
+        self.in_flight += 1
+        call = asyncio.ensure_future(self._request(session, name, arguments, traceparent))
+        watch = asyncio.ensure_future(self._lost.wait())
+        try:
+            await asyncio.wait((call, watch), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.in_flight -= 1
+            watch.cancel()
+            if not call.done():
+                call.cancel()
+        if call.cancelled():
+            raise ConnectionError(f"Connection to {self.pool.url} was lost during {name}")
+        return call.result()
+
+    async def close(self) -> None:
+        self._lost.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MCPClientPool:
+    def __init__(self, url: str, size: int = 4, max_concurrency: int = 64, transport: str = "sse",
+                 call_timeout: Optional[float] = 30.0, retries: int = 1, reconnect_backoff: float = 0.5):
+        """Initialize the pool, sessions are opened by ``start()`` or on first use
+
+        Args:
+            url: Server URL, e.g. http://localhost:8050/sse
+            size: Number of sessions kept open
+            max_concurrency: Most calls in flight across all sessions
+            transport: "sse" or "streamable-http"
+            call_timeout: Seconds to wait for a tool result, None to wait forever
+            retries: Times a call is retried on another session after a lost connection
+            reconnect_backoff: Seconds before reconnecting after a failed attempt
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}. Use one of {', '.join(TRANSPORTS)}")
+        self.url = url
+        self.transport = transport
+        self.call_timeout = None if call_timeout is None else timedelta(seconds=call_timeout)
+        self.retries = retries
+        self.reconnect_backoff = reconnect_backoff
+        self.max_concurrency = max_concurrency
+        self._connections = [_Connection(self) for _ in range(size)]
+        self._next = itertools.count()
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._tools: Optional[List[types.Tool]] = None
+        self._stats = {"calls": 0, "retries": 0}
+
+    async def __aenter__(self) -> "MCPClientPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Open every session concurrently"""
+        await asyncio.gather(*(connection.ensure_open() for connection in self._connections))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(connection.close() for connection in self._connections))
+
+    def _pick(self, exclude: Optional[_Connection] = None) -> _Connection:
+        """Least busy live session; dead ones only when nothing else is available"""
+        start = next(self._next)
+        ordered = self._connections[start % len(self._connections):] + self._connections[:start % len(self._connections)]
+        candidates = [c for c in ordered if c is not exclude] or ordered
+        live = [c for c in candidates if c.alive]
+        return min(live or candidates, key=lambda c: c.in_flight)
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None,
+                        traceparent: Optional[str] = None) -> types.CallToolResult:
+        """Call a tool on one of the pooled sessions
+
+        ``traceparent`` (W3C trace context) is sent in the request ``_meta`` so the
+        server's span for this call joins the caller's trace.
+        """
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        self._stats["calls"] += 1
+        connection = None
+        async with self._limit:
+            for attempt in range(self.retries + 1):
+                connection = self._pick(exclude=connection)
+                try:
+                    return await connection.call_tool(name, arguments or {}, traceparent)
+                except ConnectionError:
+                    if attempt == self.retries:
+                        raise
+                    self._stats["retries"] += 1
+
+    async def call_many(self, calls: Iterable[Tuple[str, Dict[str, Any]]],
+                        return_exceptions: bool = False) -> List[Any]:
+        """Run ``(name, arguments)`` calls concurrently, results in the same order"""
+        return await asyncio.gather(*(self.call_tool(name, arguments) for name, arguments in calls),
+                                    return_exceptions=return_exceptions)
+
+    async def list_tools(self, refresh: bool = False) -> List[types.Tool]:
+        """Tool schemas, fetched once and cached"""
+        if self._tools is None or refresh:
+            session = await self._pick().ensure_open()
+            self._tools = (await session.list_tools()).tools
+        return self._tools
+
+    async def tool(self, name: str) -> types.Tool:
+        for tool in await self.list_tools():
+            if tool.name == name:
+                return tool
+        raise KeyError(f"Unknown tool: {name}")
+
+    def invalidate_tools(self) -> None:
+        self._tools = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._stats,
+            "sessions_open": sum(connection.alive for connection in self._connections),
+            "reconnects": sum(max(0, connection.connects - 1) for connection in self._connections),
+        }
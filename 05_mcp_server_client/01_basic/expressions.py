@@ -0,0 +1,175 @@
+"""Safe arithmetic expressions for the ``evaluate`` MCP tool.
+
+An expression such as ``(a + b) * c / d`` is parsed with ``ast`` and checked
+against a whitelist: number literals, variable names, ``+ - * / **``, unary
+minus/plus and calls to a few calculator functions. Nothing is passed to
+``eval``. The tree is compiled once into nested closures and the compiled form
+is cached by source text, so evaluating the same expression for many variable
+bindings only walks the closures.
+
+Every operator calls the same kernel as the corresponding single tool
+(``calculator.add`` for ``+``, ``calculator.power`` for ``**``, ...), so results
+match composing the tools one call at a time.
+"""
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Union
+
+import calculator
+
+Number = Union[int, float]
+Compiled = Callable[[Mapping[str, Number]], Number]
+
+MAX_EXPRESSION_LENGTH = 1_000
+MAX_BINDINGS = 100_000
+
+BINARY_OPERATORS: Dict[type, Callable] = {
+    ast.Add: calculator.add,
+    ast.Sub: calculator.subtract,
+    ast.Mult: calculator.multiply,
+    ast.Div: calculator.divide,
+    ast.Pow: calculator.power,
+}
+
+UNARY_OPERATORS: Dict[type, Callable] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+# Callable functions, by name in the expression; each takes the tool's arguments
+FUNCTIONS: Dict[str, Callable] = {
+    "add": calculator.add,
+    "subtract": calculator.subtract,
+    "multiply": calculator.multiply,
+    "divide": calculator.divide,
+    "power": calculator.power,
+    "pow": calculator.power,
+    "square_root": calculator.square_root,
+    "sqrt": calculator.square_root,
+    "absolute_value": calculator.absolute_value,
+    "abs": calculator.absolute_value,
+    "factorial": calculator.factorial,
+    "fibonacci": calculator.fibonacci,
+}
+
+# Expressions using these can produce big integers and are run in the process pool
+HEAVY_FUNCTIONS = frozenset({"power", "pow", "factorial", "fibonacci"})
+# Past this many bindings, or with operands wider than this, evaluation also goes to the pool
+INLINE_MAX_BINDINGS = 10_000
+INLINE_MAX_OPERAND_BITS = 64
+
+
+class Expression:
+    """A compiled expression, evaluate with ``expression(bindings)``"""
+
+    def __init__(self, source: str, fn: Compiled, variables: FrozenSet[str], heavy: bool):
+        self.source = source
+        self.variables = variables
+        # ** and the big-integer functions need the pool's deadline
+        self.heavy = heavy
+        self._fn = fn
+
+    def __call__(self, bindings: Mapping[str, Number]) -> Number:
+        missing = self.variables.difference(bindings)
+        if missing:
+            raise NameError(f"Missing value for variable(s): {', '.join(sorted(missing))}")
+        return self._fn(bindings)
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+
+class _Compiler:
+    def __init__(self):
+        self.variables = set()
+        self.heavy = False
+
+    def compile(self, node: ast.AST) -> Compiled:
+        if isinstance(node, ast.Constant):
+            value = node.value
+            # bool is an int subclass, but True + 1 is not arithmetic anyone means
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Unsupported literal: {value!r}")
+            return lambda env: value
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            self.variables.add(name)
+            return lambda env: env[name]
+
+        if isinstance(node, ast.BinOp):
+            kernel = BINARY_OPERATORS.get(type(node.op))
+            if kernel is None:
+                raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+            if isinstance(node.op, ast.Pow):
+                self.heavy = True
+            left, right = self.compile(node.left), self.compile(node.right)
+            return lambda env: kernel(left(env), right(env))
+
+        if isinstance(node, ast.UnaryOp):
+            kernel = UNARY_OPERATORS.get(type(node.op))
+            if kernel is None:
+                raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+            operand = self.compile(node.operand)
+            return lambda env: kernel(operand(env))
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ValueError(f"Unsupported function. Use one of {', '.join(sorted(FUNCTIONS))}")
+            if node.keywords:
+                raise ValueError("Keyword arguments are not supported")
+            if node.func.id in HEAVY_FUNCTIONS:
+                self.heavy = True
+            kernel = FUNCTIONS[node.func.id]
+            arguments = [self.compile(argument) for argument in node.args]
+            if len(arguments) == 1:
+                (only,) = arguments
+                return lambda env: kernel(only(env))
+            return lambda env: kernel(*[argument(env) for argument in arguments])
+
+        raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source: str) -> Expression:
+    """Parse, validate and compile ``source``; raises ``ValueError`` when it is not allowed"""
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression is too long (maximum is {MAX_EXPRESSION_LENGTH} characters)")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}") from None
+
+    compiler = _Compiler()
+    fn = compiler.compile(tree.body)
+    return Expression(source, fn, frozenset(compiler.variables), compiler.heavy)
+
+
+def evaluate(source: str, bindings: List[Mapping[str, Number]]) -> Dict[str, Any]:
+    """Evaluate ``source`` once per set of variable bindings
+
+    Returns ``{"results": [...], "errors": {index: message}}`` like
+    ``batch.evaluate_elementwise``; failed evaluations are ``None`` in ``results``.
+    """
+    if len(bindings) > MAX_BINDINGS:
+        raise ValueError(f"Too many bindings (maximum is {MAX_BINDINGS})")
+    expression = compile_expression(source)
+
+    results: List[Any] = [None] * len(bindings)
+    errors: Dict[int, str] = {}
+    for i, env in enumerate(bindings):
+        try:
+            results[i] = expression(env)
+        except Exception as e:
+            errors[i] = f"{type(e).__name__}: {e}"
+    return {"results": results, "errors": errors}
+
+
+def is_heavy(source: str, bindings: List[Mapping[str, Number]]) -> bool:
+    """Whether evaluating in the server process could hold the event loop for long"""
+    if compile_expression(source).heavy or len(bindings) > INLINE_MAX_BINDINGS:
+        return True
+    # A chain of * grows big-integer operands quickly
+    return any(isinstance(value, int) and value.bit_length() > INLINE_MAX_OPERAND_BITS
+               for env in bindings for value in env.values())
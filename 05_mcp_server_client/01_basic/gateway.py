@@ -0,0 +1,282 @@
+"""Multi-worker serving: several mcp_server.py processes behind one port.
+
+A FastMCP process handles protocol messages and inline tools on one core.
+``python mcp_server.py --workers N`` starts N worker processes on the ports
+after ``--port`` and runs this gateway on ``--port`` itself. The gateway is a
+small streaming reverse proxy with session affinity, because MCP sessions
+live inside the worker that created them:
+
+- SSE: ``GET /sse`` goes to the worker with the fewest open sessions; the
+  gateway reads the ``endpoint`` event on that stream to learn the
+  ``session_id`` and sends every ``POST /messages/?session_id=...`` to the
+  same worker. The mapping is dropped when the stream closes.
+- streamable HTTP: a request without ``mcp-session-id`` (``initialize``) goes
+  to the least busy worker; the ``mcp-session-id`` response header is recorded
+  and later requests carrying it go to that worker until ``DELETE``. Clients
+  that go away without a ``DELETE`` are cleaned up: a session is released when
+  its worker answers 404 for it, or after ``session_idle_timeout`` seconds
+  without requests or open streams.
+
+Workers share the tool-result cache through an SQLite file (see
+``memo.SharedResultStore``) and split the cores for their heavy-tool pools.
+``GET /gateway/status`` shows sessions per worker.
+"""
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+import uvicorn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HOP_BY_HOP = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+              b"te", b"trailer", b"transfer-encoding", b"upgrade", b"host"}
+SESSION_HEADER = "mcp-session-id"
+ENDPOINT_SESSION = re.compile(rb"session_id=([0-9a-fA-F-]+)")
+
+
+class Gateway:
+    """ASGI app that forwards requests to the worker owning the session"""
+
+    def __init__(self, upstreams: List[str], sse_path: str = "/sse", message_path: str = "/messages/",
+                 session_idle_timeout: float = 600.0):
+        self.upstreams = upstreams
+        self.sse_path = sse_path
+        self.message_path = message_path
+        self.session_idle_timeout = session_idle_timeout
+        self.sessions: Dict[str, int] = {}  # MCP session id -> worker index
+        self.open_sessions = [0] * len(upstreams)
+        self.requests = [0] * len(upstreams)
+        self.expired_sessions = 0
+        self._last_seen: Dict[str, float] = {}  # session id -> monotonic time of its last request
+        self._streams: Dict[str, int] = {}  # session id -> responses currently streaming
+        self._last_sweep = time.monotonic()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._next = 0
+
+    def _pick(self) -> int:
+        """Worker with the fewest open sessions, rotating between equals"""
+        count = len(self.upstreams)
+        self._next = (self._next + 1) % count
+        return min(range(count), key=lambda i: (self.open_sessions[i], (i - self._next) % count))
+
+    def _bind(self, session_id: str, worker: int, idle_expiry: bool = True) -> None:
+        """Route the session to ``worker``; SSE sessions (no idle expiry) end with their stream"""
+        if session_id not in self.sessions:
+            self.sessions[session_id] = worker
+            self.open_sessions[worker] += 1
+        if idle_expiry:
+            self._last_seen[session_id] = time.monotonic()
+
+    def _unbind(self, session_id: Optional[str]) -> None:
+        worker = self.sessions.pop(session_id, None) if session_id else None
+        if worker is not None:
+            self.open_sessions[worker] -= 1
+            self._last_seen.pop(session_id, None)
+            self._streams.pop(session_id, None)
+
+    def _expire_idle(self) -> None:
+        """Release sessions whose client stopped sending requests without a DELETE"""
+        now = time.monotonic()
+        if now - self._last_sweep < min(60.0, self.session_idle_timeout / 2):
+            return
+        self._last_sweep = now
+        idle = [session_id for session_id, seen in self._last_seen.items()
+                if now - seen > self.session_idle_timeout and not self._streams.get(session_id)]
+        for session_id in idle:
+            self._unbind(session_id)
+        self.expired_sessions += len(idle)
+
+    def _route(self, scope: dict, headers: Dict[str, str]) -> Tuple[Optional[int], Optional[str]]:
+        """(worker, session id) for a request; worker None means unknown session"""
+        if scope["path"] == self.message_path:
+            session_id = parse_qs(scope["query_string"].decode()).get("session_id", [None])[0]
+        else:
+            session_id = headers.get(SESSION_HEADER)
+        if not session_id:
+            return self._pick(), None
+        if session_id in self._last_seen:
+            self._last_seen[session_id] = time.monotonic()
+        return self.sessions.get(session_id), session_id
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == "/gateway/status":
+                await self._status(send)
+            else:
+                await self._proxy(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # No overall timeout: SSE streams stay open for the whole session
+                self._client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(None, connect=5.0),
+                    limits=httpx.Limits(max_connections=None, max_keepalive_connections=200),
+                )
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self._client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _status(self, send) -> None:
+        body = json.dumps({
+            "workers": [
+                {"upstream": upstream, "open_sessions": self.open_sessions[i], "requests": self.requests[i]}
+                for i, upstream in enumerate(self.upstreams)
+            ],
+            "expired_sessions": self.expired_sessions,
+        }).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ConnectionResetError("Client disconnected")
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _proxy(self, scope, receive, send) -> None:
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"] if k not in HOP_BY_HOP}
+        worker, session_id = self._route(scope, headers)
+        self._expire_idle()  # after routing, which refreshed this request's session
+        if worker is None:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Unknown or expired session"})
+            return
+        try:
+            body = await self._read_body(receive)
+        except ConnectionResetError:
+            return
+
+        self.requests[worker] += 1
+        url = self.upstreams[worker] + (scope.get("raw_path") or scope["path"].encode()).decode("latin-1")
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        request = self._client.build_request(scope["method"], url, headers=headers, content=body)
+        try:
+            # Follow the worker's own redirects (/mcp -> /mcp/) here, a client following
+            # the absolute Location would bypass the gateway
+            response = await self._client.send(request, stream=True, follow_redirects=True)
+        except httpx.HTTPError as e:
+            await send({"type": "http.response.start", "status": 502, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": f"Worker {worker} unavailable: {e}".encode()})
+            return
+
+        sse_stream = scope["method"] == "GET" and scope["path"] == self.sse_path
+        new_session = response.headers.get(SESSION_HEADER)
+        if new_session and session_id is None:
+            session_id = new_session
+            self._bind(session_id, worker)
+        if scope["method"] == "DELETE" or response.status_code == 404 and session_id in self.sessions:
+            # A 404 means the worker no longer knows the session (ended or restarted)
+            self._unbind(session_id)
+        # A session with a streaming response open is in use, however long since its last request
+        tracked = session_id if session_id in self.sessions and not sse_stream else None
+        if tracked:
+            self._streams[tracked] = self._streams.get(tracked, 0) + 1
+
+        bound: Dict[str, str] = {}
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.raw if k.lower() not in HOP_BY_HOP],
+            })
+            # Streams (SSE, streamable HTTP responses) can stay open for the whole session;
+            # stop forwarding as soon as the client goes away so the worker sees the disconnect too
+            forward = asyncio.create_task(self._forward(response, send, worker if sse_stream else None, bound))
+            disconnect = asyncio.create_task(self._wait_disconnect(receive))
+            _, pending = await asyncio.wait((forward, disconnect), return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(forward, disconnect, return_exceptions=True)
+        finally:
+            if sse_stream:
+                self._unbind(bound.get("session_id"))
+            if tracked and tracked in self._streams:
+                self._streams[tracked] -= 1
+                self._last_seen[tracked] = time.monotonic()
+            await response.aclose()
+
+    async def _forward(self, response: httpx.Response, send, sse_worker: Optional[int], bound: Dict[str, str]) -> None:
+        """Copy the upstream body; for an SSE stream, bind the session from its endpoint event"""
+        pending = b""
+        async for chunk in response.aiter_raw():
+            if sse_worker is not None and "session_id" not in bound:
+                pending += chunk
+                match = ENDPOINT_SESSION.search(pending)
+                if match:
+                    bound["session_id"] = match.group(1).decode()
+                    self._bind(bound["session_id"], sse_worker, idle_expiry=False)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _wait_disconnect(receive) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+
+def start_workers(workers: int, port: int, transport: str, extra_args: List[str]) -> Tuple[List[subprocess.Popen], str]:
+    """Start the worker servers on port + 1 .. port + workers, sharing one cache file"""
+    cache_path = os.path.join(tempfile.gettempdir(), f"mcp_tool_cache_{port}.sqlite")
+    pool_workers = max(1, (os.cpu_count() or 2) // workers)
+    processes = []
+    for i in range(workers):
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(HERE, "mcp_server.py"),
+            "--transport", transport, "--host", "127.0.0.1", "--port", str(port + 1 + i),
+            "--shared-cache", cache_path, "--pool-workers", str(pool_workers), *extra_args,
+        ], cwd=HERE))
+    return processes, cache_path
+
+
+def wait_for_workers(ports: List[int], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=0.5)
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Worker on port {port} did not start")
+                time.sleep(0.1)
+
+
+def serve(workers: int, host: str, port: int, transport: str, extra_args: Optional[List[str]] = None) -> None:
+    """Run ``workers`` server processes behind a gateway on host:port until interrupted"""
+    if transport not in ("sse", "streamable-http"):
+        raise ValueError("Multiple workers need an HTTP transport (sse or streamable-http)")
+    # uvicorn re-raises SIGTERM after its graceful shutdown; turn it into SystemExit so the workers are stopped
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    processes, cache_path = start_workers(workers, port, transport, extra_args or [])
+    try:
+        wait_for_workers([port + 1 + i for i in range(workers)])
+        gateway = Gateway([f"http://127.0.0.1:{port + 1 + i}" for i in range(workers)])
+        print(f"Gateway on {host}:{port} -> {workers} {transport} workers on ports "
+              f"{port + 1}-{port + workers}, shared cache {cache_path}", file=sys.stderr)
+        uvicorn.run(gateway, host=host, port=port, log_level="warning")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
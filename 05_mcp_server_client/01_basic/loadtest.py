@@ -0,0 +1,293 @@
+"""Load test: how many concurrent agent sessions one server process sustains.
+
+Starts mcp_server.py, then runs one step per client count. In each step, N
+simulated clients open their own session and loop for ``--duration`` seconds:
+pick a tool from the mix, call it, wait a random think time (exponential, mean
+``--think-ms``). Per step it records p50/p95/p99 latency, throughput and the
+error rate, and samples CPU and memory of the server process and its pool
+workers (needs psutil). A client whose session breaks reconnects and keeps
+calling; every failed connection attempt counts as a failed call. Before the
+first step, ``--warmup`` seconds of unmeasured load take the server's cold
+start out of the results.
+
+The capacity estimate is the largest client count whose p95 latency and error
+rate stay within ``--slo-p95-ms`` and ``--max-error-rate``, below the first
+step that misses them.
+
+Usage:
+    python loadtest.py --clients 1 10 25 50 100 --duration 20 --think-ms 100 \\
+        --mix add=60,multiply=20,evaluate=10,factorial=10 --report loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from bench_utils import percentile, running_server
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+URLS = {"sse": "http://localhost:8050/sse", "streamable-http": "http://localhost:8050/mcp"}
+
+# Pause before a broken client reconnects, so a down server does not turn into a busy loop
+RECONNECT_DELAY_MS = 100.0
+
+# Argument generators per tool; ranges are wide so the server's result cache rarely hits
+TOOL_ARGUMENTS: Dict[str, Callable[[random.Random], Dict[str, Any]]] = {
+    "add": lambda rng: {"a": rng.randint(-10 ** 9, 10 ** 9), "b": rng.randint(-10 ** 9, 10 ** 9)},
+    "subtract": lambda rng: {"a": rng.randint(-10 ** 9, 10 ** 9), "b": rng.randint(-10 ** 9, 10 ** 9)},
+    "multiply": lambda rng: {"a": rng.randint(-10 ** 9, 10 ** 9), "b": rng.randint(-10 ** 9, 10 ** 9)},
+    "divide": lambda rng: {"a": rng.randint(-10 ** 9, 10 ** 9), "b": rng.randint(1, 10 ** 6)},
+    "square_root": lambda rng: {"a": rng.randint(0, 10 ** 12)},
+    "power": lambda rng: {"a": rng.randint(2, 1000), "b": rng.randint(10, 2000)},
+    "factorial": lambda rng: {"a": rng.randint(1000, 20_000)},
+    "fibonacci": lambda rng: {"a": rng.randint(1000, 200_000)},
+    "evaluate": lambda rng: {"expression": "(a + b) * c / d", "bindings": [
+        {"a": rng.randint(0, 10 ** 6), "b": rng.randint(0, 10 ** 6), "c": rng.randint(0, 100), "d": rng.randint(1, 100)}
+        for _ in range(10)]},
+}
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """"add=60,factorial=10" -> [("add", 60.0), ("factorial", 10.0)]"""
+    mix = []
+    for part in text.split(","):
+        tool, _, weight = part.partition("=")
+        tool = tool.strip()
+        if tool not in TOOL_ARGUMENTS:
+            raise ValueError(f"Unknown tool in mix: {tool}. Use one of {', '.join(TOOL_ARGUMENTS)}")
+        mix.append((tool, float(weight or 1)))
+    return mix
+
+
+class ResourceMonitor:
+    """Samples CPU % and RSS of the server process tree while a step runs"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.interval = interval
+        self.process = psutil.Process(pid) if psutil else None
+        self.samples: List[Tuple[float, float]] = []  # (cpu %, rss MiB)
+        self._processes: Dict[int, Any] = {}
+
+    def _tree(self) -> List[Any]:
+        try:
+            current = [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return []
+        # Keep the same Process objects across samples so cpu_percent() measures since the last sample
+        for process in current:
+            self._processes.setdefault(process.pid, process)
+        return [self._processes[process.pid] for process in current]
+
+    def _sample(self) -> Tuple[float, float]:
+        cpu = rss = 0.0
+        for process in self._tree():
+            try:
+                cpu += process.cpu_percent(None)
+                rss += process.memory_info().rss / 2 ** 20
+            except psutil.Error:
+                pass
+        return cpu, rss
+
+    async def run(self, stop: asyncio.Event) -> None:
+        if self.process is None:
+            return
+        self._sample()  # first cpu_percent() call only sets the baseline
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.samples.append(self._sample())
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        if not self.samples:
+            return {"cpu_avg": None, "cpu_max": None, "rss_max_mib": None}
+        cpu = [sample[0] for sample in self.samples]
+        return {
+            "cpu_avg": round(statistics.fmean(cpu), 1),
+            "cpu_max": round(max(cpu), 1),
+            "rss_max_mib": round(max(sample[1] for sample in self.samples), 1),
+        }
+
+
+def open_client(transport: str):
+    return sse_client(URLS[transport]) if transport == "sse" else streamablehttp_client(URLS[transport])
+
+
+async def simulated_client(index: int, args: argparse.Namespace, mix: List[Tuple[str, float]],
+                           deadline: float, records: List[Tuple[str, float, bool]]) -> None:
+    rng = random.Random(index)
+    tools, weights = [tool for tool, _ in mix], [weight for _, weight in mix]
+    # Spread the first calls out instead of starting every client at once
+    await asyncio.sleep(rng.random() * args.think_ms / 1000)
+    while time.monotonic() < deadline:
+        try:
+            async with open_client(args.transport) as streams:
+                async with ClientSession(streams[0], streams[1]) as session:
+                    await session.initialize()
+                    while time.monotonic() < deadline:
+                        tool = rng.choices(tools, weights)[0]
+                        start = time.perf_counter()
+                        try:
+                            result = await session.call_tool(tool, arguments=TOOL_ARGUMENTS[tool](rng))
+                            ok = not result.isError
+                        except Exception:
+                            ok = False
+                        records.append((tool, (time.perf_counter() - start) * 1000, ok))
+                        if args.think_ms > 0:
+                            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+        except Exception:
+            # Could not connect, or the session broke: count a failed call, then reconnect
+            records.append(("connect", 0.0, False))
+            await asyncio.sleep(max(args.think_ms, RECONNECT_DELAY_MS) / 1000)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run_step(clients: int, args: argparse.Namespace, mix: List[Tuple[str, float]], server_pid: int) -> Dict[str, Any]:
+    records: List[Tuple[str, float, bool]] = []
+    monitor = ResourceMonitor(server_pid)
+    stop = asyncio.Event()
+    monitoring = asyncio.create_task(monitor.run(stop))
+
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*(simulated_client(i, args, mix, deadline, records) for i in range(clients)))
+    elapsed = time.monotonic() - start
+    stop.set()
+    await monitoring
+
+    ok = [latency for _, latency, success in records if success]
+    step = {
+        "clients": clients,
+        "calls": len(records),
+        "throughput": round(len(records) / elapsed, 1),
+        "error_rate": round(1 - len(ok) / len(records), 4) if records else 1.0,
+        **latency_summary(ok),
+        **monitor.summary(),
+        "tools": {},
+    }
+    for tool, _ in mix:
+        tool_records = [record for record in records if record[0] == tool]
+        tool_ok = [latency for _, latency, success in tool_records if success]
+        step["tools"][tool] = {
+            "calls": len(tool_records),
+            "errors": len(tool_records) - len(tool_ok),
+            **latency_summary(tool_ok),
+        }
+    return step
+
+
+async def warm_up(clients: int, args: argparse.Namespace, mix: List[Tuple[str, float]]) -> None:
+    """Run the load for ``--warmup`` seconds and discard the records (imports, pool start, first connections)"""
+    deadline = time.monotonic() + args.warmup
+    await asyncio.gather(*(simulated_client(i, args, mix, deadline, []) for i in range(clients)))
+
+
+async def read_cache_stats(transport: str) -> Optional[Dict[str, Any]]:
+    try:
+        async with open_client(transport) as streams:
+            async with ClientSession(streams[0], streams[1]) as session:
+                await session.initialize()
+                resource = await session.read_resource("stats://tool-cache")
+                return json.loads(resource.contents[0].text)
+    except Exception:
+        return None
+
+
+def capacity(steps: List[Dict[str, Any]], slo_p95_ms: float, max_error_rate: float) -> Optional[int]:
+    best = None
+    for step in sorted(steps, key=lambda step: step["clients"]):
+        if step["p95_ms"] > slo_p95_ms or step["error_rate"] > max_error_rate:
+            # A larger step that passes again after a failure is noise, not headroom
+            break
+        best = step["clients"]
+    return best
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'clients':>8} {'calls':>8} {'calls/s':>9} {'errors':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu avg':>8} {'cpu max':>8} {'rss MiB':>8}")
+    for step in report["steps"]:
+        cpu_avg, cpu_max, rss = (step[key] if step[key] is not None else float("nan")
+                                 for key in ("cpu_avg", "cpu_max", "rss_max_mib"))
+        print(f"{step['clients']:>8} {step['calls']:>8} {step['throughput']:>9.1f} {step['error_rate']:>8.2%} "
+              f"{step['p50_ms']:>8.2f} {step['p95_ms']:>8.2f} {step['p99_ms']:>8.2f} "
+              f"{cpu_avg:>8.1f} {cpu_max:>8.1f} {rss:>8.1f}")
+    slo = report["slo"]
+    if report["capacity_clients"] is None:
+        print(f"\nNo step met p95 <= {slo['p95_ms']} ms with error rate <= {slo['max_error_rate']:.1%}")
+    else:
+        print(f"\nCapacity: {report['capacity_clients']} concurrent sessions within p95 <= {slo['p95_ms']} ms "
+              f"and error rate <= {slo['max_error_rate']:.1%}")
+    if psutil is None:
+        print("(install psutil to record server CPU and memory)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the calculator MCP server")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 25, 50, 100],
+                        help="Concurrent sessions per step")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of unmeasured load before the first step")
+    parser.add_argument("--think-ms", type=float, default=100.0, help="Mean pause between a client's calls")
+    parser.add_argument("--mix", default="add=60,multiply=20,evaluate=10,factorial=10",
+                        help="Tool weights, e.g. add=60,factorial=10")
+    parser.add_argument("--transport", choices=list(URLS), default="sse")
+    parser.add_argument("--slo-p95-ms", type=float, default=50.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--report", help="Write the full report as JSON to this path")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    steps = []
+    with running_server(["--transport", args.transport]) as server:
+        if args.warmup > 0:
+            print(f"Warming up with {args.clients[0]} clients for {args.warmup:.0f} s...")
+            asyncio.run(warm_up(args.clients[0], args, mix))
+        for clients in args.clients:
+            print(f"Running {clients} clients for {args.duration:.0f} s...")
+            steps.append(asyncio.run(run_step(clients, args, mix, server.pid)))
+        cache_stats = asyncio.run(read_cache_stats(args.transport))
+
+    report = {
+        "config": {
+            "transport": args.transport,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "think_ms": args.think_ms,
+            "mix": dict(mix),
+        },
+        "slo": {"p95_ms": args.slo_p95_ms, "max_error_rate": args.max_error_rate},
+        "steps": steps,
+        "capacity_clients": capacity(steps, args.slo_p95_ms, args.max_error_rate),
+        "server_cache": cache_stats,
+    }
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,6 @@
 import asyncio
-import nest_asyncio
-from mcp import ClientSession
-from mcp.client.sse import sse_client
 
-nest_asyncio.apply()  # Needed to run interactive python
+from client_pool import MCPClientPool
 
 """
 Make sure:
@@ -13,26 +10,29 @@ Make sure:
 
 To run the server:
 uv run server.py
+
+The pooled client keeps its sessions open, so an agent can reuse one
+MCPClientPool for all of its tool calls instead of reconnecting each time.
 """
 
 
 async def main():
     # Connect to the server using SSE
-    async with sse_client("http://localhost:8050/sse") as (read_stream, write_stream):
-        async with ClientSession(read_stream, write_stream) as session:
-            # Initialize the connection
-            await session.initialize()
+    async with MCPClientPool("http://localhost:8050/sse", size=2) as pool:
+        # List available tools (cached after the first call)
+        tools = await pool.list_tools()
+        print("Available tools:")
+        for tool in tools:
+            print(f"  - {tool.name}: {tool.description}")
 
-            # List available tools
-            tools_result = await session.list_tools()
-            print("Available tools:")
-            for tool in tools_result.tools:
-                print(f"  - {tool.name}: {tool.description}")
+        # Call our calculator tool
+        result = await pool.call_tool("add", arguments={"a": 2, "b": 3})
+        print(f"2 + 3 = {result.content[0].text}")
 
-            # Call our calculator tool
-            result = await session.call_tool("add", arguments={"a": 2, "b": 3})
-            print(f"2 + 3 = {result.content[0].text}")
+        # Independent calls run concurrently over the pooled sessions
+        products = await pool.call_many([("multiply", {"a": a, "b": a}) for a in range(1, 6)])
+        print("Squares:", [product.content[0].text for product in products])
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
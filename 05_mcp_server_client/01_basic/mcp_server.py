@@ -1,97 +1,214 @@
-from mcp.server.fastmcp import FastMCP
-from typing import List
-
-
-# Create an MCP server
-mcp = FastMCP(
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from typing import Any, Dict, List, Optional, Union
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import batch
+import calculator
+import expressions
+from memo import SharedResultStore, ToolCache, warm
+from metrics import InstrumentedFastMCP
+from offload import ProcessPool, render_json
+
+
+# Create an MCP server; every tool call is measured and traced (see metrics.py)
+mcp = InstrumentedFastMCP(
     name="Calculator",
-    host="127.0.0.1",  # only used for SSE transport (localhost)
-    port=8050,  # only used for SSE transport (set this to any port)
+    host="127.0.0.1",  # only used for the HTTP transports (localhost)
+    port=8050,  # only used for the HTTP transports (set this to any port)
 )
 
+# Cheap tools run inline on the event loop. Heavy tools (big-integer results)
+# run in a bounded pool of worker processes with a per-call deadline, so they
+# cannot freeze the transport for other clients; a worker is killed when its
+# call times out or the client cancels or disconnects. Results are serialized
+# to JSON text in the worker as well.
+HEAVY_TOOL_TIMEOUT = 5.0  # seconds
+heavy_pool = ProcessPool(timeout=HEAVY_TOOL_TIMEOUT)
+
+# Every calculator tool is pure, so tools marked @tool_cache.pure answer
+# repeated calls from a bounded LRU cache; results over 256 KiB (the largest
+# factorials and powers) are not kept.
+tool_cache = ToolCache(max_entries=4096, max_bytes=64 * 1024 * 1024, max_result_bytes=256 * 1024)
+
 
 # Add a simple calculator tool
 @mcp.tool()
+@tool_cache.pure
 def add(a: int, b: int) -> int:
     """Add two numbers together"""
-    return a + b
+    return calculator.add(a, b)
 
 @mcp.tool()
+@tool_cache.pure
 def subtract(a: int, b: int) -> int:
     """Subtract two numbers"""
-    return a - b
+    return calculator.subtract(a, b)
 
 @mcp.tool()
+@tool_cache.pure
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    return a * b
+    return calculator.multiply(a, b)
 
 @mcp.tool()
+@tool_cache.pure
 def divide(a: int, b: int) -> int:
     """Divide two numbers"""
-    return a / b
+    return calculator.divide(a, b)
 
 
 @mcp.tool()
-def power(a: int, b: int) -> int:
+@tool_cache.pure
+async def power(a: int, b: int) -> str:
     """Raise a number to a power"""
-    return a ** b
+    return await heavy_pool.run(render_json, calculator.power, a, b)
 
 
 @mcp.tool()
+@tool_cache.pure
 def square_root(a: int) -> int:
     """Calculate the square root of a number"""
-    return a ** 0.5
+    return calculator.square_root(a)
 
 
 @mcp.tool()
+@tool_cache.pure
 def absolute_value(a: int) -> int:
     """Calculate the absolute value of a number"""
-    return abs(a)
+    return calculator.absolute_value(a)
 
 @mcp.tool()
-def factorial(a: int) -> int:
+@tool_cache.pure
+async def factorial(a: int) -> str:
     """Calculate the factorial of a number"""
-    if a < 0:
-        raise ValueError("Factorial is not defined for negative numbers")
-    elif a == 0:
-        return 1
-    else:
-        return a * factorial(a - 1)
+    return await heavy_pool.run(render_json, calculator.factorial, a)
+
+@mcp.tool()
+@tool_cache.pure
+async def fibonacci(a: int) -> str:
+    """Calculate the a-th Fibonacci number"""
+    return await heavy_pool.run(render_json, calculator.fibonacci, a)
+
+@mcp.tool()
+@tool_cache.pure
+async def fibonacci_sequence(a: int) -> str:
+    """Calculate the Fibonacci sequence from F(0) up to F(a), as a JSON list"""
+    return await heavy_pool.run(render_json, calculator.fibonacci_sequence, a)
+
+
+@mcp.tool()
+async def batch_calculate(tool: str, a: List[int], b: Optional[List[int]] = None) -> str:
+    """Apply one calculator tool element-wise to lists of operands in a single call.
+
+    tool is one of add, subtract, multiply, divide, power, square_root, absolute_value;
+    b is required for the two-operand tools. Returns {"results": [...], "errors": {index: message}}.
+    """
+    if tool in batch.HEAVY_TOOLS:
+        return await heavy_pool.run(render_json, batch.evaluate_elementwise, tool, a, b)
+    return render_json(batch.evaluate_elementwise, tool, a, b)
 
 @mcp.tool()
-def fibonacci(a: int) -> int:
-    """Calculate the Fibonacci sequence up to a number"""
-    if a < 0:
-        raise ValueError("Fibonacci is not defined for negative numbers")
-    elif a == 0:
-        return 0
-    elif a == 1:
-        return 1
-    else:
-        return fibonacci(a - 1) + fibonacci(a - 2)
+async def batch_call(calls: List[Dict[str, Any]]) -> str:
+    """Run many calculator tool calls in a single call.
+
+    calls is a list of {"tool": name, "arguments": {...}}. Returns a list with one
+    {"result": value} or {"error": message} per call, in order.
+    """
+    if batch.is_heavy(calls):
+        return await heavy_pool.run(render_json, batch.evaluate_calls, calls)
+    return render_json(batch.evaluate_calls, calls)
 
 @mcp.tool()
-def fibonacci_sequence(a: int) -> int:
-    """Calculate the Fibonacci sequence up to a number"""
-    if a < 0:
-        raise ValueError("Fibonacci is not defined for negative numbers")
-    elif a == 0:
-        return 0
-    elif a == 1:
-        return 1
-    else:
-        return fibonacci_sequence(a - 1) + fibonacci_sequence(a - 2)
+@tool_cache.pure
+async def evaluate(expression: str, bindings: Optional[List[Dict[str, Union[int, float]]]] = None) -> str:
+    """Evaluate an arithmetic expression such as "(a + b) * c / d" for one or more sets of variable values.
+
+    Supports numbers, variables, + - * / **, unary minus and the functions sqrt, abs, power,
+    factorial and fibonacci (plus the other calculator tool names). bindings is a list of
+    {variable: value} objects; omit it for an expression without variables.
+    Returns {"results": [...], "errors": {index: message}}, one result per binding.
+    """
+    bindings = bindings or [{}]
+    # Compiles in this process too, so a syntax error is reported without a pool round trip
+    if expressions.is_heavy(expression, bindings):
+        return await heavy_pool.run(render_json, expressions.evaluate, expression, bindings)
+    return render_json(expressions.evaluate, expression, bindings)
+
+
+@mcp.resource("stats://tool-cache", mime_type="application/json")
+def tool_cache_stats() -> str:
+    """Hit/miss statistics of the tool result cache, per tool"""
+    return json.dumps(tool_cache.stats())
+
+
+@mcp.resource("stats://heavy-pool", mime_type="application/json")
+def heavy_pool_stats() -> str:
+    """Calls, timeouts and killed workers of the heavy-tool process pool"""
+    return json.dumps({**heavy_pool.stats, "max_workers": heavy_pool.max_workers, "timeout": heavy_pool.timeout})
+
+
+@mcp.resource("metrics://tools", mime_type="application/json")
+def tool_metrics() -> str:
+    """Calls, errors and latency / argument-size / result-size histograms, per tool"""
+    return json.dumps(mcp.tool_metrics.snapshot())
+
+
+@mcp.resource("traces://recent", mime_type="application/json")
+def recent_traces() -> str:
+    """The most recent tool-call spans, with trace ids from the client's traceparent"""
+    return json.dumps(mcp.tracer.recent())
+
+
+# Prometheus scrape endpoint, served next to /sse and /mcp by the HTTP transports
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(mcp.tool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 # Run the server
 if __name__ == "__main__":
-    transport = "sse"
-    if transport == "stdio":
-        print("Running server with stdio transport")
-        mcp.run(transport="stdio")
-    elif transport == "sse":
-        print("Running server with SSE transport")
-        mcp.run(transport="sse")
-    else:
-        raise ValueError(f"Unknown transport: {transport}")
\ No newline at end of file
+    # stdio: the client starts this script as a subprocess, lowest latency for co-located agents.
+    # sse / streamable-http: network transports for remote agents, SSE on /sse, streamable HTTP on /mcp.
+    parser = argparse.ArgumentParser(description="Calculator MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"],
+                        default=os.getenv("MCP_TRANSPORT", "sse"))
+    parser.add_argument("--host", default=mcp.settings.host, help="Bind address for the HTTP transports")
+    parser.add_argument("--port", type=int, default=mcp.settings.port, help="Port for the HTTP transports")
+    parser.add_argument("--warm-cache", metavar="PATH",
+                        help='JSON lines of {"tool": ..., "arguments": {...}} to compute before serving')
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes behind one port (HTTP transports), see gateway.py")
+    parser.add_argument("--shared-cache", metavar="PATH", help="SQLite file sharing cached results between processes")
+    parser.add_argument("--pool-workers", type=int, help="Processes in the heavy-tool pool")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        import gateway
+
+        # Workers get the remaining options; the gateway picks their ports, cache file and pool size
+        extra_args = ["--warm-cache", args.warm_cache] if args.warm_cache else []
+        gateway.serve(args.workers, args.host, args.port, args.transport, extra_args)
+        sys.exit(0)
+
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    if args.pool_workers:
+        heavy_pool.max_workers = args.pool_workers
+    if args.shared_cache:
+        tool_cache.attach_shared(SharedResultStore(args.shared_cache))
+
+    # Status goes to stderr: with stdio, stdout carries the protocol
+    if args.warm_cache:
+        counts = asyncio.run(warm(mcp, args.warm_cache))
+        # The pool's queue belongs to the warm-up event loop; start fresh under the server's loop
+        heavy_pool.close()
+        print(f"Warmed tool cache: {counts['warmed']} calls ({counts['failed']} failed)", file=sys.stderr)
+
+    print(f"Running server with {args.transport} transport", file=sys.stderr)
+    mcp.run(transport=args.transport)
@@ -0,0 +1,307 @@
+"""Memoization for pure MCP tools.
+
+A tool whose result depends only on its arguments is marked with
+``@tool_cache.pure`` under ``@mcp.tool()``; identical calls are then answered
+from a bounded LRU cache instead of being recomputed:
+
+    @mcp.tool()
+    @tool_cache.pure
+    def add(a: int, b: int) -> int:
+        ...
+
+- the cache is bounded both by number of entries and by total size; results
+  larger than ``max_result_bytes`` (the biggest factorials and powers) are
+  returned but never stored
+- concurrent identical calls to an async tool share one computation
+- failed calls are not cached
+- per-tool hits, misses, coalesced in-flight calls, evictions and skipped
+  results are kept in ``stats()``
+- with ``attach_shared()``, an SQLite file (``SharedResultStore``) backs the
+  in-memory cache, so worker processes serving the same port share results
+
+The wrapper keeps the tool's signature (``functools.wraps``), so FastMCP builds
+the same input schema and validates arguments before the cache sees them.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pydantic_core
+
+
+def result_size(value: Any) -> int:
+    """Approximate size of a result in bytes, without formatting big ints as text"""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, int):
+        return value.bit_length() // 8 + 1
+    if isinstance(value, float):
+        return 8
+    return len(pydantic_core.to_json(value, fallback=str))
+
+
+class SharedResultStore:
+    """Second-level result cache shared by worker processes, an SQLite file in WAL mode
+
+    WAL lets every worker read while one writes. Values are stored as JSON,
+    except ints, which are stored as hex so big results need no decimal
+    conversion and come back as ints. The table is trimmed to ``max_entries``
+    (oldest first) every ``PRUNE_EVERY`` writes.
+
+    ``get`` and ``put`` block on the file lock, so ``ToolCache`` calls them
+    through ``asyncio.to_thread``; each thread gets its own connection.
+    """
+
+    PRUNE_EVERY = 1000
+    MAX_KEY_BYTES = 4096  # larger keys (big batches) are only cached in memory
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS tool_results "
+                     "(key TEXT PRIMARY KEY, encoding TEXT, value TEXT, created REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _encode(value: Any) -> Tuple[str, str]:
+        if type(value) is int:
+            return "hex", format(value, "x")
+        return "json", pydantic_core.to_json(value).decode()
+
+    @staticmethod
+    def _decode(encoding: str, text: str) -> Any:
+        return int(text, 16) if encoding == "hex" else pydantic_core.from_json(text)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        if len(key) > self.MAX_KEY_BYTES:
+            return False, None
+        try:
+            row = self._conn().execute("SELECT encoding, value FROM tool_results WHERE key = ?", (key,)).fetchone()
+            return (False, None) if row is None else (True, self._decode(*row))
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Shared cache read failed: {e}", file=sys.stderr)
+            return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        if len(key) > self.MAX_KEY_BYTES:
+            return
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?, ?)",
+                         (key, *self._encode(value), time.time()))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.PRUNE_EVERY == 0
+            if prune:
+                conn.execute(
+                    "DELETE FROM tool_results WHERE key IN "
+                    "(SELECT key FROM tool_results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,))
+        except (sqlite3.Error, ValueError) as e:
+            # Another worker holding the write lock for too long only costs a cache miss
+            print(f"Shared cache write failed: {e}", file=sys.stderr)
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tool_results").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class ToolCache:
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024,
+                 max_result_bytes: int = 256 * 1024):
+        """Initialize the cache
+
+        Args:
+            max_entries: Most results kept across all tools
+            max_bytes: Most bytes of keys and results kept across all tools
+            max_result_bytes: Larger results are not cached
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_result_bytes = max_result_bytes
+        self._entries: "OrderedDict[str, Tuple[str, Any, int]]" = OrderedDict()  # key -> (tool, result, size)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.shared: Optional[SharedResultStore] = None
+        self._shared_writes: set = set()
+
+    def attach_shared(self, store: SharedResultStore) -> None:
+        """Back the in-memory cache with a store shared by other processes"""
+        self.shared = store
+
+    def _tool_stats(self, tool: str) -> Dict[str, int]:
+        return self._stats.setdefault(
+            tool, {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "too_large": 0})
+
+    async def lookup(self, tool: str, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            if self.shared is not None:
+                found, value = await asyncio.to_thread(self.shared.get, key)
+                if found:
+                    self._tool_stats(tool)["shared_hits"] += 1
+                    self._insert(tool, key, value, result_size(value) + len(key))
+                    return True, value
+            return False, None
+        self._entries.move_to_end(key)
+        self._tool_stats(tool)["hits"] += 1
+        return True, entry[1]
+
+    def store(self, tool: str, key: str, value: Any) -> None:
+        size = result_size(value)
+        if size > self.max_result_bytes:
+            self._tool_stats(tool)["too_large"] += 1
+            return
+        self._insert(tool, key, value, size + len(key))
+        if self.shared is not None:
+            # Written in the background; the caller already has its result
+            write = asyncio.ensure_future(asyncio.to_thread(self.shared.put, key, value))
+            self._shared_writes.add(write)
+            write.add_done_callback(self._shared_writes.discard)
+
+    def _insert(self, tool: str, key: str, value: Any, size: int) -> None:
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (tool, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted_tool, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._tool_stats(evicted_tool)["evictions"] += 1
+
+    def pure(self, fn: Callable) -> Callable:
+        """Decorator marking ``fn`` as a pure tool whose results can be cached"""
+        tool = fn.__name__
+        signature = inspect.signature(fn)
+
+        def make_key(args: tuple, kwargs: dict) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            # JSON keeps 1 and 1.0 apart, like the tools' own results do
+            return tool + pydantic_core.to_json(bound.arguments, fallback=str).decode()
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def cached_async(*args, **kwargs):
+                key = make_key(args, kwargs)
+                found, value = await self.lookup(tool, key)
+                if found:
+                    return value
+                while key in self._inflight:
+                    owner = self._inflight[key]
+                    try:
+                        value = await asyncio.shield(owner)
+                        self._tool_stats(tool)["coalesced"] += 1
+                        return value
+                    except asyncio.CancelledError:
+                        # The call computing it was cancelled, not this one: compute it here
+                        if not owner.cancelled() or asyncio.current_task().cancelling():
+                            raise
+
+                self._tool_stats(tool)["misses"] += 1
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    value = await fn(*args, **kwargs)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                    future.exception()  # waiters re-raise it; don't log it as never retrieved
+                    raise
+                finally:
+                    del self._inflight[key]
+                self.store(tool, key, value)
+                future.set_result(value)
+                return value
+
+            cached_async.__pure__ = True
+            return cached_async
+
+        # Async as well, so the shared-store lookup can wait off the event loop. FastMCP runs
+        # sync tools on the event loop anyway, so the tool itself still runs inline.
+        @functools.wraps(fn)
+        async def cached(*args, **kwargs):
+            key = make_key(args, kwargs)
+            found, value = await self.lookup(tool, key)
+            if found:
+                return value
+            self._tool_stats(tool)["misses"] += 1
+            value = fn(*args, **kwargs)
+            self.store(tool, key, value)
+            return value
+
+        cached.__pure__ = True
+        return cached
+
+    def stats(self) -> Dict[str, Any]:
+        tools = {}
+        for tool, counts in sorted(self._stats.items()):
+            hits = counts["hits"] + counts["shared_hits"]
+            calls = hits + counts["misses"] + counts["coalesced"]
+            tools[tool] = {**counts, "hit_rate": round(hits / calls, 4) if calls else 0.0}
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "max_result_bytes": self.max_result_bytes,
+            "shared_store": self.shared.path if self.shared is not None else None,
+            "tools": tools,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+async def warm(mcp, path: str) -> Dict[str, int]:
+    """Pre-warm the cache by calling the tools listed in ``path``
+
+    The file has one JSON object per line, ``{"tool": "factorial", "arguments": {"a": 1000}}``.
+    Calls go through ``mcp.call_tool`` so arguments are validated exactly like
+    client calls and produce the same cache keys. Returns counts of warmed and
+    failed calls.
+    """
+    counts = {"warmed": 0, "failed": 0}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                call = json.loads(line)
+                await mcp.call_tool(call["tool"], call.get("arguments") or {})
+                counts["warmed"] += 1
+            except Exception as e:
+                print(f"Cache warm-up: line {line_number} failed: {e}", file=sys.stderr)
+                counts["failed"] += 1
+    return counts
@@ -0,0 +1,213 @@
+"""Per-tool metrics and tracing for the MCP server.
+
+``InstrumentedFastMCP`` is a drop-in ``FastMCP`` subclass that measures every
+tool call at the single place they all pass through, ``call_tool``, so each
+``@mcp.tool()`` is covered without touching the tool functions:
+
+- calls and errors (by exception type) per tool
+- latency, argument-size and result-size histograms per tool
+- one span per call; when the client sends a W3C ``traceparent`` in the
+  request ``_meta``, the span joins the client's trace
+
+``ToolMetrics.snapshot()`` returns the numbers as a dict (for an MCP resource)
+and ``render_prometheus()`` in the Prometheus text format (for ``/metrics``).
+Latency covers argument validation, the tool itself and result conversion, not
+the transport.
+"""
+import json
+import os
+import re
+import secrets
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import pydantic_core
+from mcp.server.fastmcp import FastMCP
+from mcp.types import TextContent
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+# Calls to tools that do not exist share one label, so clients cannot grow the metric set
+UNKNOWN_TOOL = "_unknown"
+
+TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, cumulative count) pairs as Prometheus expects them"""
+        pairs, total = [], 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            pairs.append((str(bound), total))
+        return pairs
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": dict(self.cumulative())}
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.argument_bytes = Histogram(SIZE_BUCKETS)
+        self.result_bytes = Histogram(SIZE_BUCKETS)
+
+
+class ToolMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self._tools: Dict[str, _ToolStats] = {}
+
+    def record(self, tool: str, seconds: float, argument_bytes: int,
+               result_bytes: Optional[int], error: Optional[str] = None) -> None:
+        stats = self._tools.get(tool)
+        if stats is None:
+            stats = self._tools[tool] = _ToolStats()
+        stats.calls += 1
+        stats.latency.observe(seconds)
+        stats.argument_bytes.observe(argument_bytes)
+        if error is None:
+            stats.result_bytes.observe(result_bytes)
+        else:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "tools": {
+                tool: {
+                    "calls": stats.calls,
+                    "errors": dict(stats.errors),
+                    "latency_s": stats.latency.snapshot(),
+                    "argument_bytes": stats.argument_bytes.snapshot(),
+                    "result_bytes": stats.result_bytes.snapshot(),
+                }
+                for tool, stats in sorted(self._tools.items())
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP mcp_tool_calls_total Tool calls, including failed ones",
+            "# TYPE mcp_tool_calls_total counter",
+        ]
+        for tool, stats in sorted(self._tools.items()):
+            lines.append(f'mcp_tool_calls_total{{tool="{tool}"}} {stats.calls}')
+
+        lines += ["# HELP mcp_tool_errors_total Failed tool calls by error type",
+                  "# TYPE mcp_tool_errors_total counter"]
+        for tool, stats in sorted(self._tools.items()):
+            for error, count in sorted(stats.errors.items()):
+                lines.append(f'mcp_tool_errors_total{{tool="{tool}",error="{error}"}} {count}')
+
+        for metric, attribute, help_text in (
+            ("mcp_tool_latency_seconds", "latency", "Tool call latency in the server"),
+            ("mcp_tool_argument_bytes", "argument_bytes", "Size of the JSON arguments"),
+            ("mcp_tool_result_bytes", "result_bytes", "Size of the returned content"),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for tool, stats in sorted(self._tools.items()):
+                histogram: Histogram = getattr(stats, attribute)
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{tool="{tool}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_sum{{tool="{tool}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{tool="{tool}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """Keeps the most recent tool-call spans, optionally appending them to a JSON-lines file"""
+
+    def __init__(self, keep: int = 1000, path: Optional[str] = None):
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.path = path
+
+    def start(self, tool: str, traceparent: Optional[str]) -> Dict[str, Any]:
+        match = TRACEPARENT.match(traceparent or "")
+        if match and match.group(2) != "0" * 32:
+            trace_id, parent_id, flags = match.group(2), match.group(3), match.group(4)
+        else:
+            trace_id, parent_id, flags = secrets.token_hex(16), None, "01"
+        return {
+            "name": f"tools/call {tool}",
+            "tool": tool,
+            "trace_id": trace_id,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": parent_id,
+            "flags": flags,
+            "start_time": time.time(),
+        }
+
+    def end(self, span: Dict[str, Any], seconds: float, error: Optional[str]) -> None:
+        span["duration_ms"] = round(seconds * 1000, 3)
+        span["status"] = "error" if error else "ok"
+        if error:
+            span["error"] = error
+        self.spans.append(span)
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span) + "\n")
+            except OSError as e:
+                print(f"Could not write trace span: {e}", file=sys.stderr)
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return list(self.spans)[-limit:]
+
+
+def _content_size(content: Sequence[Any]) -> int:
+    return sum(len(item.text) if isinstance(item, TextContent) else len(pydantic_core.to_json(item))
+               for item in content)
+
+
+class InstrumentedFastMCP(FastMCP):
+    """FastMCP that records metrics and a span for every tool call"""
+
+    def __init__(self, *args: Any, trace_file: Optional[str] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.tool_metrics = ToolMetrics()
+        self.tracer = Tracer(path=trace_file or os.getenv("MCP_TRACE_FILE"))
+
+    def _traceparent(self) -> Optional[str]:
+        """``traceparent`` from the request's ``_meta``, if the client sent one"""
+        try:
+            meta = self._mcp_server.request_context.meta
+        except LookupError:
+            return None  # called outside a request, e.g. cache warm-up
+        return getattr(meta, "traceparent", None) if meta is not None else None
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Sequence[Any]:
+        tool = name if self._tool_manager.get_tool(name) is not None else UNKNOWN_TOOL
+        argument_bytes = len(pydantic_core.to_json(arguments, fallback=str))
+        span = self.tracer.start(tool, self._traceparent())
+        start = time.perf_counter()
+        error = None
+        try:
+            content = await super().call_tool(name, arguments)
+            return content
+        except BaseException as e:
+            # FastMCP wraps tool failures in ToolError; report the original type
+            error = type(e.__cause__ or e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.tool_metrics.record(tool, seconds, argument_bytes,
+                                     _content_size(content) if error is None else None, error)
+            self.tracer.end(span, seconds, error)
@@ -0,0 +1,141 @@
+"""Bounded process pool for CPU-heavy MCP tools.
+
+Tools run inside the server's event loop, so a long ``factorial`` or ``power``
+call would stall the SSE transport for every connected client. Heavy tools
+hand their kernel to this pool instead:
+
+- at most ``max_workers`` worker processes, started on demand and reused
+- every call has a deadline that covers queueing and execution
+- when the deadline passes, or the request is cancelled (the client sent
+  ``notifications/cancelled`` or disconnected), the worker running the call is
+  killed, so the work really stops, and replaced with a fresh one
+
+``concurrent.futures.ProcessPoolExecutor`` is not used because it cannot stop
+a task that is already running.
+"""
+import asyncio
+import atexit
+import multiprocessing
+import os
+from typing import Any, Callable, List, Optional
+
+import pydantic_core
+
+
+def render_json(fn: Callable, *args: Any) -> str:
+    """Call ``fn`` and serialize its result to JSON text, all inside the worker
+
+    Converting a big integer to decimal text is quadratic in its size, for the
+    largest results it costs more than computing them, so it must not happen on
+    the server's event loop either.
+    """
+    return pydantic_core.to_json(fn(*args), fallback=str).decode()
+
+
+def _worker_main(conn) -> None:
+    """Worker process loop: receive (fn, args), send back (ok, result or exception)"""
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, fn: Callable, args: tuple):
+        """Blocking round trip, run in a thread so the event loop stays free"""
+        self.conn.send((fn, args))
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ProcessPool:
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 5.0):
+        """Initialize the pool
+
+        Args:
+            max_workers: Worker processes, defaults to one less than the number of cores
+            timeout: Default per-call deadline in seconds
+        """
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        # spawn, not fork: the server process runs threads (uvicorn, asyncio.to_thread)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+        self.stats = {"calls": 0, "completed": 0, "errors": 0, "timeouts": 0, "cancelled": 0, "workers_killed": 0}
+        atexit.register(self.close)
+
+    async def _acquire(self) -> _Worker:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and len(self._workers) < self.max_workers:
+            worker = _Worker(self._ctx)
+            self._workers.append(worker)
+            return worker
+        return await self._idle.get()
+
+    def _discard(self, worker: _Worker) -> None:
+        worker.kill()
+        self._workers.remove(worker)
+        self.stats["workers_killed"] += 1
+        # Replace it right away, other calls may be queued waiting for an idle worker
+        replacement = _Worker(self._ctx)
+        self._workers.append(replacement)
+        self._idle.put_nowait(replacement)
+
+    async def run(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run ``fn(*args)`` in a worker process and return its result
+
+        ``fn`` and its arguments must be picklable (module-level functions).
+        Raises ``TimeoutError`` when the deadline passes.
+        """
+        self.stats["calls"] += 1
+        timeout = self.timeout if timeout is None else timeout
+        worker = None
+        try:
+            async with asyncio.timeout(timeout):
+                worker = await self._acquire()
+                ok, value = await asyncio.to_thread(worker.call, fn, args)
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            if worker is not None:
+                self._discard(worker)
+            raise TimeoutError(f"{fn.__name__} did not finish within {timeout} seconds")
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            if worker is not None:
+                self._discard(worker)
+            raise
+        except (EOFError, OSError):
+            # The worker died on its own (e.g. out of memory)
+            self.stats["errors"] += 1
+            self._discard(worker)
+            raise RuntimeError(f"Worker process crashed while running {fn.__name__}")
+
+        self._idle.put_nowait(worker)
+        if not ok:
+            self.stats["errors"] += 1
+            raise value
+        self.stats["completed"] += 1
+        return value
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.kill()
+        self._workers.clear()
+        self._idle = None